@@ -15,18 +15,62 @@ class module_name:
         # required, output can be the BINARY, STATIC_LIB, DYNAMIC_LIB
         self.output = config.Output.BINARY
 
-        # optional, dependencies contains the dependency of this module
+        # optional, dependencies contains the dependency of this module. They are public, the modules depending on
+        # this module can include their headers, and link them too.
         self.dependencies = ['other_module']
 
-        # optional, define the third parties, must located at the folder third_parties/
+        # optional, private dependencies are only used by the sources of this module, they are not propagated to the
+        # modules depending on this module, whose compile lines are shorter.
+        self.private_dependencies = ['internal_module']
+
+        # optional, define the third parties, must located at the folder third_parties/. They are public too.
         self.third_parties = ['third_party']
 
+        # optional, private third parties, only used by the sources of this module.
+        self.private_third_parties = ['internal_third_party']
+
+        # optional, include dirs relative to the module dir. The module dir is always a public include dir.
+        self.include_dirs = ['include']
+
+        # optional, include dirs only used by the sources of this module, relative to the module dir.
+        self.private_include_dirs = ['internal']
+
         # optional, define the system libs here, contains the system lib.
         self.system_libs = ['socket']
 
         # optional, only set it if the output value is BINARY and enable the unit test generation.
         self.main_file = 'main.cpp'
 
+        # optional, seconds each unit test can run when it is run by ctest.
+        self.unittest_timeout = 60
+
+        # optional, cost hints of unit tests for ctest, costly tests are started first. The key is the path
+        # of unit test file relative to the module dir.
+        self.unittest_costs = {'slow_test.cpp' : 10}
+
+        # optional, set it False if the sources of module can not be compiled in unity batches with --unity.
+        self.unity_build = True
+
+        # optional, sources which can not be compiled in unity batches, relative to the module dir.
+        self.unity_exclude = ['conflict_names.cpp']
+
+        # optional, number of sources in a unity batch, overrides --unity_batch_size.
+        self.unity_batch_size = 4
+
+        # optional, headers to precompile with --pch, such as ['<vector>', 'module/header.h']. If it is not set, the
+        # headers included by most sources are precompiled. Set it to [] to disable precompiled headers of module.
+        self.precompile_headers = ['<vector>']
+
+        # optional, compiler launcher of the module, overrides --compiler_launcher. Set it to 'none' to disable it.
+        self.compiler_launcher = 'ccache'
+
+        # optional, compile the sources of module in the heavy compile pool of ninja, which runs at most
+        # --heavy_compile_jobs jobs at the same time. Set it for modules which need lots of memory to compile.
+        self.heavy_compile = True
+
+        # optional, link all unit tests of the module into a single binary, overrides --single_test_binary.
+        self.single_test_binary = True
+
     # define the pre build event
     def pre_build(self):
         pass
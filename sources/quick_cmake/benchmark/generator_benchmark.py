@@ -0,0 +1,160 @@
+''' Benchmark of generating cmake files for a synthetic workspace, each phase is timed separately:
+    path_manager: discover modules and third parties
+    build_model_import: run build files of modules and third parties
+    build_model_parse: compute the dependencies of modules
+    parse_cmake_info: scan sources and merge configs into cmake modules
+    emission: generate and write cmake files
+
+Results are written as JSON, and compared with the result of a previous run if --baseline is given.
+
+Usage:
+    python generator_benchmark.py --modules 1000 --output result.json
+    python generator_benchmark.py --modules 1000 --baseline result.json
+'''
+import json
+import os
+from os import path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import click
+import glog
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from build_model import BuildModel
+from build_script_loader import BuildScriptLoader
+from cmake_generator import CMakeGenerator
+import config
+from gconfig import GConfig
+from path_manager import PathManager
+from workspace_generator import generate_workspace
+
+PHASES = ['path_manager', 'build_model_import', 'build_model_parse', 'parse_cmake_info', 'emission']
+
+def get_configs():
+    configs = []
+    for configuration in ['DEBUG', 'RELEASE']:
+        v_config = config.Config()
+        v_config.configuration = getattr(v_config.Configuration, configuration)
+        configs.append(v_config)
+    return configs
+
+def run_once(use_cache):
+    ''' Generate the workspace in the current dir once.
+    Args:
+        use_cache: use the directory index and the bytecode cache of build files kept by previous runs
+    Return:
+        map {phase --> seconds}
+    '''
+    timings = {}
+    configs = get_configs()
+
+    begin = time.perf_counter()
+    pmg = PathManager('.', use_directory_index=use_cache)
+    timings['path_manager'] = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    loader = BuildScriptLoader(path.join(pmg.cache_dir(), 'build_scripts') if use_cache else None)
+    build_model = BuildModel(configs, loader)
+    build_model.import_modules(pmg.module_map)
+    build_model.import_third_parties(pmg.third_party_map)
+    build_model.import_default_third_parties(pmg.default_third_party_map)
+    timings['build_model_import'] = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    build_model.parse()
+    timings['build_model_parse'] = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    cmake_generator = CMakeGenerator(configs, build_model, pmg)
+    cmake_generator._parse_cmake_info()
+    timings['parse_cmake_info'] = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    cmake_generator._generate_cmake_files()
+    timings['emission'] = time.perf_counter() - begin
+
+    if use_cache:
+        pmg.directory_index().save()
+    return timings
+
+def print_result(result, baseline):
+    if baseline is None:
+        print('{:<20}{:>12}'.format('phase', 'time(s)'))
+        for phase in PHASES + ['total']:
+            print('{:<20}{:>12.4f}'.format(phase, result['timings'][phase]))
+        return
+    if baseline['workspace'] != result['workspace']:
+        glog.warn('Workspaces are different, baseline: %s, current: %s', baseline['workspace'], result['workspace'])
+    print('{:<20}{:>12}{:>12}{:>10}'.format('phase', 'baseline(s)', 'time(s)', 'ratio'))
+    for phase in PHASES + ['total']:
+        base_time = baseline['timings'].get(phase)
+        cur_time = result['timings'][phase]
+        if not base_time:
+            print('{:<20}{:>12}{:>12.4f}{:>10}'.format(phase, '-', cur_time, '-'))
+        else:
+            print('{:<20}{:>12.4f}{:>12.4f}{:>9.2f}x'.format(phase, base_time, cur_time, cur_time / base_time))
+
+@click.command()
+@click.option('--modules', default=500, help='Number of modules')
+@click.option('--files', default=10, help='Files in each dir of module')
+@click.option('--depth', default=2, help='Dir depth of each module')
+@click.option('--fan_out', default=4, help='Max direct dependencies of each module')
+@click.option('--third_parties', default=10, help='Number of third parties')
+@click.option('--seed', default=0, help='Random seed')
+@click.option('--repeat', default=3, help='Repeat times, report the best time of each phase')
+@click.option('--use_cache', is_flag=True, help='Keep the directory index and bytecode cache between repeats')
+@click.option('--jobs', default=1, help='Number of processes to run build files')
+@click.option('--scan_jobs', default=0, help='Number of threads to scan module sources')
+@click.option('--workspace', default='', help='Benchmark an existing workspace instead of generating one')
+@click.option('--output', default='', help='Write the result to this JSON file')
+@click.option('--baseline', default='', help='JSON file of a previous result to compare with')
+def main(modules, files, depth, fan_out, third_parties, seed, repeat, use_cache, jobs, scan_jobs, workspace,
+         output, baseline):
+    glog.setLevel('WARNING')
+    GConfig.JOBS = jobs
+    GConfig.SCAN_JOBS = scan_jobs
+    workspace_params = { 'modules' : modules, 'files' : files, 'depth' : depth, 'fan_out' : fan_out,
+                         'third_parties' : third_parties, 'seed' : seed }
+    if workspace:
+        workspace_params = { 'path' : path.abspath(workspace) }
+    baseline_result = None
+    if baseline:
+        with open(baseline, 'r') as f:
+            baseline_result = json.load(f)
+
+    cwd = os.getcwd()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        if not workspace:
+            workspace = path.join(temp_dir, 'workspace')
+            generate_workspace(workspace, modules, files, depth, fan_out, third_parties, seed)
+        # paths of third party binaries are relative to the workspace, run in it like main.py
+        os.chdir(workspace)
+        GConfig.OUTPUT_DIR = path.join(temp_dir, 'project_files')
+        best = {}
+        for i in range(repeat):
+            for phase, cost in run_once(use_cache).items():
+                best[phase] = cost if phase not in best else min(best[phase], cost)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(temp_dir)
+
+    best['total'] = sum(best.values())
+    result = {
+        'workspace' : workspace_params,
+        'options' : { 'repeat' : repeat, 'use_cache' : use_cache, 'jobs' : jobs, 'scan_jobs' : scan_jobs },
+        'python' : platform.python_version(),
+        'platform' : platform.platform(),
+        'timings' : best,
+    }
+    print_result(result, baseline_result)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+''' Benchmark of module graphs. Compares graph.post_order with the traversal used by BuildModel and
+    CMakeGenerator before, and the bitset closure of BuildModel._parse with merging sets of names.
+
+Usage:
+    python graph_benchmark.py --modules 1000,5000,10000 --edges 5 --chain
+'''
+import random
+import sys
+import time
+from os import path
+
+import click
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from build_model import BuildModel, ModuleNode
+import graph as graph_utils
+
+def create_graph(modules, edges, chain, seed):
+    ''' Create a random DAG, each module depends on at most edges modules created before it.
+        If chain is True, each module also depends on the previous one, so the graph is as deep as possible.
+    '''
+    rand = random.Random(seed)
+    graph = {}
+    names = []
+    for m in range(modules):
+        name = 'module_{}'.format(m)
+        graph[name] = set(rand.sample(names, min(edges, len(names))))
+        if chain and names:
+            graph[name].add(names[-1])
+        names.append(name)
+    return graph
+
+def create_modules(graph):
+    modules = {}
+    for name, childs in graph.items():
+        module = ModuleNode()
+        module.module_name = name
+        module.childs = set(childs)
+        module.direct_third_parties = {'third_party_{}'.format(len(modules) % 10)}
+        modules[name] = module
+    return modules
+
+def legacy_closure(modules):
+    ''' The closure of BuildModel._parse before bitsets, merging sets of names '''
+    for m in graph_utils.post_order({ k : v.childs for k, v in modules.items() }):
+        cur_module = modules[m]
+        cur_module.dependencies = set(cur_module.childs)
+        cur_module.third_parties = set(cur_module.direct_third_parties)
+        for child in cur_module.childs:
+            cur_module.dependencies.update(modules[child].dependencies)
+            cur_module.third_parties.update(modules[child].third_parties)
+    return modules
+
+def bitset_closure(modules):
+    BuildModel([])._parse(modules)
+    return modules
+
+def legacy_post_order(graph):
+    ''' The traversal of CMakeGenerator._get_post_order before graph.post_order '''
+    module_to_dep = { k : sorted(v) for k, v in graph.items() }
+    result = []
+    for name, deps in module_to_dep.items():
+        if name in result:
+            continue
+        if not deps:
+            result.append(name)
+            continue
+        cur = name
+        stack = []
+        while cur or stack:
+            if module_to_dep[cur] and cur not in result:
+                stack.append(cur)
+                cur = module_to_dep[cur][0]
+            else:
+                if cur not in result:
+                    result.append(cur)
+                while stack:
+                    parent = stack[-1]
+                    index = module_to_dep[parent].index(cur)
+                    if index+1 < len(module_to_dep[parent]):
+                        cur = module_to_dep[parent][index+1]
+                        break
+                    else:
+                        cur = stack.pop()
+                        if cur not in result:
+                            result.append(cur)
+                if not stack:
+                    break
+    return result
+
+def measure(func, graph, repeat):
+    best_time = None
+    for i in range(repeat):
+        begin = time.perf_counter()
+        result = func(graph)
+        cost = time.perf_counter() - begin
+        best_time = cost if best_time is None else min(best_time, cost)
+    return result, best_time
+
+@click.command()
+@click.option('--modules', default='1000,5000,10000', help='Numbers of modules, split by comma')
+@click.option('--edges', default=5, help='Max dependencies of each module')
+@click.option('--repeat', default=3, help='Repeat times, report the best time')
+@click.option('--chain', is_flag=True, help='Each module also depends on the previous one')
+@click.option('--legacy_limit', default=5000, help='Skip the legacy traversal for graphs larger than it')
+@click.option('--seed', default=0, help='Random seed')
+def main(modules, edges, chain, repeat, legacy_limit, seed):
+    sizes = [ int(x) for x in modules.split(',') ]
+    print('post order')
+    print('{:>10}{:>12}{:>12}{:>10}'.format('modules', 'legacy(s)', 'graph(s)', 'speed up'))
+    for size in sizes:
+        graph = create_graph(size, edges, chain, seed)
+        result, graph_time = measure(graph_utils.post_order, graph, repeat)
+        if size > legacy_limit:
+            print('{:>10}{:>12}{:>12.4f}{:>10}'.format(size, '-', graph_time, '-'))
+            continue
+        legacy_result, legacy_time = measure(legacy_post_order, graph, 1)
+        assert result == legacy_result, 'Post orders are different!'
+        print('{:>10}{:>12.4f}{:>12.4f}{:>9.1f}x'.format(size, legacy_time, graph_time, legacy_time / graph_time))
+
+    print('closure')
+    print('{:>10}{:>12}{:>12}{:>10}'.format('modules', 'sets(s)', 'bitsets(s)', 'speed up'))
+    for size in sizes:
+        graph = create_graph(size, edges, chain, seed)
+        result, bitset_time = measure(bitset_closure, create_modules(graph), repeat)
+        result = { k : (v.dependencies, v.third_parties) for k, v in result.items() }
+        legacy_result, legacy_time = measure(legacy_closure, create_modules(graph), repeat)
+        assert result == { k : (v.dependencies, v.third_parties) for k, v in legacy_result.items() }, \
+            'Closures are different!'
+        del result, legacy_result
+        print('{:>10}{:>12.4f}{:>12.4f}{:>9.1f}x'.format(size, legacy_time, bitset_time, legacy_time / bitset_time))
+
+if __name__ == '__main__':
+    main()
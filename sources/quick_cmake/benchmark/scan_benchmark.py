@@ -0,0 +1,101 @@
+''' Benchmark of scanning module sources, compares SourceScanner with globing each filter per dir.
+
+Usage:
+    python scan_benchmark.py --modules 200 --depth 3 --files 20
+'''
+import glob
+import os
+from os import path
+import shutil
+import sys
+import tempfile
+import time
+
+import click
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from gconfig import GConfig
+from source_scanner import SourceScanner
+import utils
+
+class ScandirCounter:
+    ''' Count os.scandir calls, glob also lists dirs by os.scandir '''
+    def __init__(self):
+        self.count = 0
+        self._scandir = os.scandir
+
+    def __enter__(self):
+        def counted_scandir(*args, **kwargs):
+            self.count += 1
+            return self._scandir(*args, **kwargs)
+        os.scandir = counted_scandir
+        return self
+
+    def __exit__(self, *args):
+        os.scandir = self._scandir
+
+def create_tree(root, modules, depth, files):
+    ''' Create modules, each module has a dir chain of depth, each dir contains files '''
+    extensions = ['.h', '.cc', '_test.cc', '.cpp', '.txt']
+    for m in range(modules):
+        cur_dir = path.join(root, 'module_{}'.format(m))
+        for d in range(depth):
+            for f in range(files):
+                utils.write_text('', path.join(cur_dir, 'file_{}{}'.format(f, extensions[f % len(extensions)])))
+            cur_dir = path.join(cur_dir, 'dir_{}'.format(d))
+
+def glob_scan(module_dir, sources_dir):
+    ''' Scan the same as CMakeGenerator._parse_file_infos before SourceScanner '''
+    result = []
+    for subdir, dirs, files in os.walk(module_dir):
+        for extension in GConfig.SOURCES_FILTER:
+            for file in [path.relpath(f, sources_dir) for f in glob.glob(path.join(subdir, extension))]:
+                if not path.splitext(file)[0].endswith('_test'):
+                    result.append(file)
+        for extension in GConfig.UNITTEST_SOURCES_FILTTER:
+            result.extend([path.relpath(f, sources_dir) for f in glob.glob(path.join(subdir, extension))])
+    return result
+
+def scanner_scan(module_dir, sources_dir):
+    result = []
+    scanner = SourceScanner()
+    for subdir, entries in scanner.walk(module_dir):
+        rel_dir = path.relpath(subdir, sources_dir)
+        result.extend([ path.join(rel_dir, f) for f in entries.sources ])
+        result.extend([ path.join(rel_dir, f) for f in entries.unittests ])
+    return result
+
+def run(scan_func, sources_dir, repeat):
+    best_time = None
+    for i in range(repeat):
+        with ScandirCounter() as counter:
+            begin = time.perf_counter()
+            result = []
+            for module in sorted(os.listdir(sources_dir)):
+                result.extend(scan_func(path.join(sources_dir, module), sources_dir))
+            cost = time.perf_counter() - begin
+        best_time = cost if best_time is None else min(best_time, cost)
+    return result, counter.count, best_time
+
+@click.command()
+@click.option('--modules', default=200, help='Number of modules')
+@click.option('--depth', default=3, help='Dir depth of each module')
+@click.option('--files', default=20, help='Files in each dir')
+@click.option('--repeat', default=3, help='Repeat times, report the best time')
+def main(modules, depth, files, repeat):
+    root = tempfile.mkdtemp()
+    try:
+        create_tree(root, modules, depth, files)
+        glob_result, glob_scandirs, glob_time = run(glob_scan, root, repeat)
+        scanner_result, scanner_scandirs, scanner_time = run(scanner_scan, root, repeat)
+        assert glob_result == scanner_result, 'Scan results are different!'
+        print('dirs: {}, files: {}'.format(modules * depth, modules * depth * files))
+        print('{:<10}{:>12}{:>12}'.format('', 'scandir', 'time(s)'))
+        print('{:<10}{:>12}{:>12.4f}'.format('glob', glob_scandirs, glob_time))
+        print('{:<10}{:>12}{:>12.4f}'.format('scanner', scanner_scandirs, scanner_time))
+        print('speed up: {:.2f}x'.format(glob_time / scanner_time))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
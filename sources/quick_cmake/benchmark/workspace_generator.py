@@ -0,0 +1,110 @@
+''' Generate a synthetic workspace to see how quick cmake scales.
+
+Modules are named module_<index>, each module depends on at most fan_out modules with smaller indexes, so the
+dependency graph is acyclic. Every tenth module is a binary, binaries are never depended on.
+
+Usage:
+    python workspace_generator.py --output /tmp/workspace --modules 500 --files 10 --depth 2 --fan_out 4
+'''
+from os import path
+import random
+import shutil
+import sys
+
+import click
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+import utils
+
+MODULE_BUILD_FILE = \
+'''class {name}:
+    def __init__(self, config):
+        self.output = config.Output.{output}
+        self.dependencies = {dependencies}
+        self.third_parties = {third_parties}
+{main_file}'''
+
+THIRD_PARTY_BUILD_FILE = \
+'''class {name}:
+    def __init__(self, config):
+        self.include_dirs = ['include']
+        self.system_libs = []
+'''
+
+def module_name(index):
+    return 'module_{:05d}'.format(index)
+
+def third_party_name(index):
+    return 'third_party_{:03d}'.format(index)
+
+def _write_module_sources(module_dir, name, dependencies, third_parties, files, depth):
+    ''' Write files into a dir chain of depth, each dir has a header, a source and a unit test in turn. '''
+    includes = [ '#include "{0}/{0}_0.h"'.format(d) for d in dependencies ]
+    includes.extend([ '#include "{}.h"'.format(t) for t in third_parties ])
+    cur_dir = module_dir
+    for d in range(depth):
+        for f in range(files):
+            stem = '{}_{}'.format(name, d * files + f)
+            kind = f % 3
+            if kind == 0:
+                content = ['#pragma once', 'int {}();'.format(stem)]
+                utils.write_text('\n'.join(content) + '\n', path.join(cur_dir, stem + '.h'))
+            elif kind == 1:
+                content = includes + ['int {}() {{ return 0; }}'.format(stem)]
+                utils.write_text('\n'.join(content) + '\n', path.join(cur_dir, stem + '.cc'))
+            else:
+                content = ['#include "{}/{}_0.h"'.format(name, name), 'int main() { return 0; }']
+                utils.write_text('\n'.join(content) + '\n', path.join(cur_dir, stem + '_test.cc'))
+        cur_dir = path.join(cur_dir, 'dir_{}'.format(d))
+
+def generate_workspace(output, modules, files, depth, fan_out, third_parties, seed = 0):
+    ''' Generate a workspace under output, output is removed first if it exists.
+    Args:
+        modules: number of modules
+        files: number of files in each dir of module
+        depth: number of nested dirs of each module
+        fan_out: max number of modules each module depends on directly
+        third_parties: number of third parties, each module uses at most 2 of them
+    '''
+    if path.exists(output):
+        shutil.rmtree(output)
+    rand = random.Random(seed)
+    third_party_names = [ third_party_name(i) for i in range(third_parties) ]
+    for name in third_party_names:
+        third_party_dir = path.join(output, 'third_parties', name)
+        utils.write_text(THIRD_PARTY_BUILD_FILE.format(name=name), path.join(third_party_dir, 'build.py'))
+        utils.write_text('#pragma once\n', path.join(third_party_dir, 'include', name + '.h'))
+
+    libs = []
+    for i in range(modules):
+        name = module_name(i)
+        is_binary = i % 10 == 9
+        dependencies = sorted(rand.sample(libs, min(fan_out, len(libs))))
+        module_third_parties = sorted(rand.sample(third_party_names, min(2, len(third_party_names))))
+        module_dir = path.join(output, 'sources', name)
+        main_file = ''
+        if is_binary:
+            main_file = "        self.main_file = 'main.cc'\n"
+            utils.write_text('int main() { return 0; }\n', path.join(module_dir, 'main.cc'))
+        else:
+            libs.append(name)
+        utils.write_text(MODULE_BUILD_FILE.format(name=name, output='BINARY' if is_binary else 'STATIC_LIB',
+                                                  dependencies=dependencies, third_parties=module_third_parties,
+                                                  main_file=main_file),
+                         path.join(module_dir, 'build.py'))
+        _write_module_sources(module_dir, name, dependencies, module_third_parties, files, depth)
+
+@click.command()
+@click.option('--output', required=True, help='Dir of the workspace, it is removed first if it exists')
+@click.option('--modules', default=500, help='Number of modules')
+@click.option('--files', default=10, help='Files in each dir of module')
+@click.option('--depth', default=2, help='Dir depth of each module')
+@click.option('--fan_out', default=4, help='Max direct dependencies of each module')
+@click.option('--third_parties', default=10, help='Number of third parties')
+@click.option('--seed', default=0, help='Random seed')
+def main(output, modules, files, depth, fan_out, third_parties, seed):
+    generate_workspace(output, modules, files, depth, fan_out, third_parties, seed)
+    print('Generate workspace {} with {} modules'.format(output, modules))
+
+if __name__ == '__main__':
+    main()
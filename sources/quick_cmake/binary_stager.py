@@ -0,0 +1,192 @@
+from concurrent import futures
+import glog
+import hashlib
+import json
+import os
+from os import path
+import shutil
+
+import utils
+
+STAGE_MODES = ['copy', 'hardlink', 'symlink']
+CHECK_MODES = ['size', 'mtime', 'hash']
+
+# files to stage written by write_plan, and the record of staged files next to it
+PLAN_FILE_NAME = 'binaries_to_stage.json'
+RECORD_FILE_NAME = 'staged_binaries.json'
+
+# staging of fewer files is not worth a thread pool
+_PARALLEL_MIN_FILES = 8
+
+class StageResult:
+    ''' Result of staging files
+    Attributes:
+        staged: dist files which are created or replaced
+        up_to_date: number of dist files which are not touched
+        removed: dist files which were staged by the last run but are not staged anymore
+        copied_instead: dist files which are copied since they can not be linked
+    '''
+    def __init__(self):
+        self.staged = []
+        self.up_to_date = 0
+        self.removed = []
+        self.copied_instead = []
+
+    def summary(self):
+        return 'Stage binaries: {} staged, {} up to date, {} removed'.format(
+            len(self.staged), self.up_to_date, len(self.removed))
+
+class BinaryStager:
+    ''' Stage files into dirs by hardlink, symlink or copy. A staged file is only replaced if it is stale, and the
+        files staged by the last run which are not staged anymore are removed, so the dirs can be shared with other
+        outputs, such as the binaries built by cmake.
+    Args:
+        mode: one of STAGE_MODES, files are copied if they can not be linked, such as on another device
+        check: one of CHECK_MODES, how a staged file is compared with its source if it is not linked to the source.
+            size compares sizes, mtime compares sizes and mtimes, hash compares sizes and contents
+        record_file: json file of the files staged by the last run
+        jobs: number of threads to stage files, 0 means decided by the thread pool
+    '''
+    def __init__(self, record_file, mode = 'copy', check = 'mtime', jobs = 0):
+        glog.check(mode in STAGE_MODES, 'Stage mode should be one of {}: {}'.format(STAGE_MODES, mode))
+        glog.check(check in CHECK_MODES, 'Stage check should be one of {}: {}'.format(CHECK_MODES, check))
+        self._record_file = record_file
+        self._mode = mode
+        self._check = check
+        self._jobs = jobs
+
+    def stage(self, dir_files):
+        ''' Stage files into dirs
+        Args:
+            dir_files: map {dist dir --> list of source files}, files are staged with their base names
+        Return:
+            StageResult
+        '''
+        result = StageResult()
+        tasks = []
+        staged_names = {}
+        for dist_dir, files in sorted(dir_files.items()):
+            dist_dir = path.abspath(dist_dir)
+            names = {}
+            for source_file in sorted(files):
+                name = path.basename(source_file)
+                if name in names:
+                    glog.warn('{} and {} are staged to the same file in {}, skip the latter'.format(
+                        names[name], source_file, dist_dir))
+                    continue
+                names[name] = source_file
+                tasks.append((path.abspath(source_file), path.join(dist_dir, name)))
+            staged_names[dist_dir] = sorted(names)
+            if names and not path.isdir(dist_dir):
+                os.makedirs(dist_dir)
+
+        if len(tasks) < _PARALLEL_MIN_FILES or self._jobs == 1:
+            actions = [ self._stage_file(source_file, dist_file) for source_file, dist_file in tasks ]
+        else:
+            max_workers = self._jobs if self._jobs > 0 else None
+            with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                actions = list(executor.map(lambda x: self._stage_file(*x), tasks))
+        for (source_file, dist_file), action in zip(tasks, actions):
+            if action is None:
+                result.up_to_date += 1
+                continue
+            result.staged.append(dist_file)
+            if action == 'copy' and self._mode != 'copy':
+                result.copied_instead.append(dist_file)
+        if result.copied_instead:
+            glog.warn('{} files can not be linked by {}, they are copied, such as {}'.format(
+                len(result.copied_instead), self._mode, result.copied_instead[0]))
+
+        result.removed = self._remove_orphans(staged_names)
+        utils.write_text_if_changed(json.dumps(staged_names, indent=1, sort_keys=True), self._record_file)
+        return result
+
+    def _stage_file(self, source_file, dist_file):
+        ''' Return the way dist_file is staged, None if it is up to date '''
+        if not self._is_stale(source_file, dist_file):
+            return None
+        glog.info('Stage file {} --> {}'.format(source_file, dist_file))
+        # stage to a temporary file and replace, so that dist_file is never partially written
+        temp_file = '{}.{}.staging'.format(dist_file, os.getpid())
+        action = self._mode
+        try:
+            if self._mode == 'hardlink':
+                os.link(source_file, temp_file)
+            elif self._mode == 'symlink':
+                os.symlink(source_file, temp_file)
+            else:
+                shutil.copy2(source_file, temp_file)
+        except OSError:
+            if self._mode == 'copy':
+                raise
+            action = 'copy'
+            shutil.copy2(source_file, temp_file)
+        os.replace(temp_file, dist_file)
+        return action
+
+    def _is_stale(self, source_file, dist_file):
+        if path.islink(dist_file):
+            # a link to the source is always up to date, a link to another file is stale
+            return os.readlink(dist_file) != source_file
+        if not path.isfile(dist_file):
+            return True
+        if path.samefile(source_file, dist_file):
+            return False
+        source_stat = os.stat(source_file)
+        dist_stat = os.stat(dist_file)
+        if source_stat.st_size != dist_stat.st_size:
+            return True
+        if self._check == 'mtime':
+            # copy2 keeps the mtime of source
+            return source_stat.st_mtime_ns != dist_stat.st_mtime_ns
+        if self._check == 'hash':
+            return _hash_file(source_file) != _hash_file(dist_file)
+        return False
+
+    def _remove_orphans(self, staged_names):
+        ''' Remove files staged by the last run which are not in staged_names, return the removed files '''
+        removed = []
+        for dist_dir, names in sorted(self._load_record().items()):
+            names = set(names) - set(staged_names.get(dist_dir, []))
+            for name in sorted(names):
+                dist_file = path.join(dist_dir, name)
+                if path.isfile(dist_file) or path.islink(dist_file):
+                    glog.info('Remove staged file ' + dist_file)
+                    os.remove(dist_file)
+                    removed.append(dist_file)
+        return removed
+
+    def _load_record(self):
+        if not path.isfile(self._record_file):
+            return {}
+        try:
+            with open(self._record_file, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            glog.warn('Record of staged files is broken, ignore it: %s', self._record_file)
+            return {}
+
+def _hash_file(file_path):
+    hash_object = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hash_object.update(chunk)
+    return hash_object.hexdigest()
+
+def write_plan(dir_files, plan_file):
+    ''' Write the files to stage, so that they can be staged by a build step. Return if the file is written '''
+    dir_files = { path.abspath(k) : sorted([ path.abspath(f) for f in v ]) for k, v in dir_files.items() }
+    return utils.write_text_if_changed(json.dumps(dir_files, indent=1, sort_keys=True), plan_file)
+
+def read_plan(plan_file):
+    ''' Return map {dist dir --> list of source files} written by write_plan '''
+    with open(plan_file, 'r') as f:
+        return json.load(f)
+
+def stage_plan(plan_file, mode, check):
+    ''' Stage the files in plan_file written by write_plan, the record of staged files is next to plan_file
+    Return:
+        StageResult
+    '''
+    stager = BinaryStager(path.join(path.dirname(plan_file), RECORD_FILE_NAME), mode, check)
+    return stager.stage(read_plan(plan_file))
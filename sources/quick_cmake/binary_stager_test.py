@@ -0,0 +1,111 @@
+import os
+from os import path
+import tempfile
+import unittest
+
+import binary_stager
+from binary_stager import BinaryStager
+import utils
+
+class TestBinaryStager(unittest.TestCase):
+    def _read(self, file_path):
+        with open(file_path, 'r') as f:
+            return f.read()
+
+    def test_stage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            record_file = path.join(temp_dir, 'record.json')
+            source_a = path.join(temp_dir, 'third_party', 'a.dll')
+            source_b = path.join(temp_dir, 'third_party', 'b.dll')
+            utils.write_text('a', source_a)
+            utils.write_text('b', source_b)
+            dist_dir = path.join(temp_dir, 'bin', 'Debug')
+            dist_a = path.join(dist_dir, 'a.dll')
+            dist_b = path.join(dist_dir, 'b.dll')
+
+            stager = BinaryStager(record_file, 'copy', 'mtime')
+            result = stager.stage({ dist_dir : [source_a, source_b] })
+            self.assertListEqual([dist_a, dist_b], result.staged)
+            self.assertEqual('a', self._read(dist_a))
+
+            # unchanged files are not touched
+            os.utime(dist_a, ns=(os.stat(source_a).st_atime_ns, os.stat(source_a).st_mtime_ns))
+            result = stager.stage({ dist_dir : [source_a, source_b] })
+            self.assertListEqual([], result.staged)
+            self.assertEqual(2, result.up_to_date)
+
+            # updated source is staged again, even if its size is the same
+            utils.write_text('c', source_a)
+            os.utime(source_a, ns=(0, 0))
+            result = stager.stage({ dist_dir : [source_a, source_b] })
+            self.assertListEqual([dist_a], result.staged)
+            self.assertEqual('c', self._read(dist_a))
+
+            # files staged by the last run are removed, other files in the dir are kept
+            utils.write_text('output', path.join(dist_dir, 'built.exe'))
+            result = stager.stage({ dist_dir : [source_b] })
+            self.assertListEqual([dist_a], result.removed)
+            self.assertFalse(path.exists(dist_a))
+            self.assertTrue(path.exists(path.join(dist_dir, 'built.exe')))
+
+    def test_check(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = path.join(temp_dir, 'third_party', 'a.dll')
+            dist_dir = path.join(temp_dir, 'bin')
+            dist = path.join(dist_dir, 'a.dll')
+            utils.write_text('a', source)
+            utils.write_text('b', dist)
+            self.assertFalse(BinaryStager(path.join(temp_dir, 'record.json'), 'copy', 'size')._is_stale(source, dist))
+            self.assertTrue(BinaryStager(path.join(temp_dir, 'record.json'), 'copy', 'hash')._is_stale(source, dist))
+            utils.write_text('a', dist)
+            self.assertFalse(BinaryStager(path.join(temp_dir, 'record.json'), 'copy', 'hash')._is_stale(source, dist))
+            with self.assertRaises(AssertionError):
+                BinaryStager(path.join(temp_dir, 'record.json'), 'copy', 'unknown')
+
+    def test_link(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = path.join(temp_dir, 'third_party', 'a.dll')
+            utils.write_text('a', source)
+            for mode in ['hardlink', 'symlink']:
+                dist_dir = path.join(temp_dir, mode)
+                stager = BinaryStager(path.join(temp_dir, mode + '.json'), mode)
+                result = stager.stage({ dist_dir : [source] })
+                self.assertEqual(1, len(result.staged))
+                # it may be copied if the file system does not support links
+                if not result.copied_instead:
+                    self.assertTrue(path.samefile(source, path.join(dist_dir, 'a.dll')))
+                self.assertEqual(1, stager.stage({ dist_dir : [source] }).up_to_date)
+
+    def test_parallel_stage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sources = [ path.join(temp_dir, 'third_party', '{}.dll'.format(i)) for i in range(20) ]
+            for source in sources:
+                utils.write_text(path.basename(source), source)
+            plan_file = path.join(temp_dir, binary_stager.PLAN_FILE_NAME)
+            dist_dir = path.join(temp_dir, 'bin')
+            self.assertTrue(binary_stager.write_plan({ dist_dir : sources }, plan_file))
+            self.assertFalse(binary_stager.write_plan({ dist_dir : sources }, plan_file))
+            result = BinaryStager(path.join(temp_dir, 'record.json'), 'copy').stage(binary_stager.read_plan(plan_file))
+            self.assertEqual(20, len(result.staged))
+            self.assertEqual('7.dll', self._read(path.join(dist_dir, '7.dll')))
+
+    def test_stage_plan(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = path.join(temp_dir, 'third_parties', 'dp', 'bin', 'dp.dll')
+            utils.write_text('v1', source)
+            os.utime(source, ns=(0, 0))
+            dist = path.join(temp_dir, 'bin', 'Debug', 'dp.dll')
+            plan_file = path.join(temp_dir, 'cache', binary_stager.PLAN_FILE_NAME)
+            binary_stager.write_plan({ path.dirname(dist) : [source] }, plan_file)
+            self.assertEqual([dist], binary_stager.stage_plan(plan_file, 'copy', 'mtime').staged)
+            self.assertTrue(path.isfile(path.join(temp_dir, 'cache', binary_stager.RECORD_FILE_NAME)))
+
+            # the binary is overwritten in place, the plan does not change but the rerun stages it again
+            utils.write_text('v2', source)
+            self.assertFalse(binary_stager.write_plan({ path.dirname(dist) : [source] }, plan_file))
+            self.assertEqual([dist], binary_stager.stage_plan(plan_file, 'copy', 'mtime').staged)
+            self.assertEqual('v2', self._read(dist))
+            self.assertEqual(1, binary_stager.stage_plan(plan_file, 'copy', 'mtime').up_to_date)
+
+if __name__ == '__main__':
+    unittest.main()
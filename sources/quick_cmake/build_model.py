@@ -1,11 +1,16 @@
 
+from concurrent import futures
 import glog
-import importlib.util
 from os import path
 import os
 import sys
+import traceback
 
+from build_script_loader import BuildScriptLoader
 import config
+from gconfig import GConfig
+import graph as graph_utils
+import profiler
 import utils
 
 class ModuleNode:
@@ -14,6 +19,20 @@ class ModuleNode:
         childs: chlidrens node, type is Module Node
         is_cached: if it is True, then cached result will store in dependencies and third parties
         dependencies and third_parties: result for module
+        direct_third_parties: third parties defined in the build file of module
+        private_dependencies and private_third_parties: the ones of childs and direct_third_parties which are private,
+            they are not propagated to the modules depending on module
+        include_dirs and private_include_dirs: include dirs relative to module dir, the public ones are propagated to
+            the modules depending on module
+        unittest_timeout: seconds each unit test of module can run in ctest, None means the default
+        unittest_costs: map {unit test file relative to module dir --> cost}, ctest runs costly tests first
+        unity_build: if False, module is not compiled in unity batches even if unity build is enabled
+        unity_exclude: sources relative to module dir which can not be compiled in unity batches
+        unity_batch_size: number of sources in a unity batch, None means the default
+        precompile_headers: headers to precompile, None means the headers included by most sources
+        compiler_launcher: compiler launcher of module, such as ccache, None means the launcher of project
+        heavy_compile: if compile the sources of module in the heavy compile pool of ninja
+        single_test_binary: if link all unit tests of module into a single binary, None means the default
     '''
     def __init__(self):
         self.module_name = ''
@@ -22,9 +41,23 @@ class ModuleNode:
         self.main_file = ''
         self.dependencies = set()
         self.third_parties = set()
+        self.direct_third_parties = set()
+        self.private_dependencies = set()
+        self.private_third_parties = set()
+        self.include_dirs = []
+        self.private_include_dirs = []
         self.system_libs = set()
         self.pre_build = None
         self.post_build = None
+        self.unittest_timeout = None
+        self.unittest_costs = {}
+        self.unity_build = True
+        self.unity_exclude = []
+        self.unity_batch_size = None
+        self.precompile_headers = None
+        self.compiler_launcher = None
+        self.heavy_compile = False
+        self.single_test_binary = None
 
 class ThirdPartyInfo:
     def __init__(self):
@@ -36,14 +69,124 @@ class ThirdPartyInfo:
         self.bins = []
         self.system_libs = set()
 
+class BuildEvent:
+    ''' Pre/post build event of a module which is evaluated in a worker process. Bound methods of the build object
+        can not be sent back to the main process, so the build script is run again when the event is triggered.
+    '''
+    def __init__(self, build_file, config, event_name):
+        self._build_file = build_file
+        self._config = config
+        self._event_name = event_name
+
+    def __call__(self):
+        build_object = _run_build_script(BuildScriptLoader(), self._build_file, self._config)
+        return getattr(build_object, self._event_name)()
+
+# build script loaders of worker process, cache dir --> BuildScriptLoader
+_worker_loaders = {}
+
+def _run_build_script(loader, build_file, config):
+    build_dir = path.dirname(build_file)
+    module_name = path.basename(build_dir)
+    build_obj = loader.load(build_file)
+    # Verify class in build.py
+    debug_msg = 'build file {} does not define class with module name {}, build object attributes is {}'
+    debug_msg = debug_msg.format(build_file, module_name, dir(build_obj))
+    glog.check(module_name in dir(build_obj), debug_msg)
+    # create class object
+    build_class = getattr(build_obj, module_name)
+    return build_class(config)
+
+def _get_span_name(build_file):
+    ''' Name of the profiling span of a build file, such as sources/module_name or third_parties/name '''
+    build_dir = path.dirname(path.abspath(build_file))
+    return path.basename(path.dirname(build_dir)) + '/' + path.basename(build_dir)
+
+def _module_object_to_module_node(build_object):
+    module_node = ModuleNode()
+    module_node.module_name = build_object.__class__.__name__
+    module_node.output = build_object.output
+    if module_node.output == config.Output().BINARY:
+        module_node.main_file = getattr(build_object, 'main_file', '')
+        if module_node.main_file == '':
+            glog.warning('No main file set for binary target %s', module_node.module_name)
+        
+    module_node.dependencies = set(getattr(build_object, 'dependencies', []))
+    module_node.third_parties = set(getattr(build_object, 'third_parties', []))
+    # a dependency declared both public and private is public
+    module_node.private_dependencies = set(getattr(build_object, 'private_dependencies', [])) - module_node.dependencies
+    module_node.private_third_parties = set(getattr(build_object, 'private_third_parties', [])) - module_node.third_parties
+    module_node.include_dirs = list(getattr(build_object, 'include_dirs', []))
+    module_node.private_include_dirs = list(getattr(build_object, 'private_include_dirs', []))
+    module_node.system_libs = set(getattr(build_object, 'system_libs', []))
+    module_node.pre_build = getattr(build_object, 'pre_build', None)
+    module_node.post_build = getattr(build_object, 'post_build', None)
+    module_node.unittest_timeout = getattr(build_object, 'unittest_timeout', None)
+    module_node.unittest_costs = dict(getattr(build_object, 'unittest_costs', {}))
+    module_node.unity_build = getattr(build_object, 'unity_build', True)
+    module_node.unity_exclude = list(getattr(build_object, 'unity_exclude', []))
+    module_node.unity_batch_size = getattr(build_object, 'unity_batch_size', None)
+    module_node.precompile_headers = getattr(build_object, 'precompile_headers', None)
+    module_node.compiler_launcher = getattr(build_object, 'compiler_launcher', None)
+    module_node.heavy_compile = getattr(build_object, 'heavy_compile', False)
+    module_node.single_test_binary = getattr(build_object, 'single_test_binary', None)
+    module_node.childs = module_node.dependencies | module_node.private_dependencies
+    module_node.direct_third_parties = module_node.third_parties | module_node.private_third_parties
+    return module_node
+
+def _third_party_object_to_module_node(build_object):
+    info = ThirdPartyInfo()
+    info.third_party_name = build_object.__class__.__name__
+    info.include_dirs = getattr(build_object, 'include_dirs', [])
+    info.bin_dirs = getattr(build_object, 'bin_dirs', [])
+    info.lib_dirs = getattr(build_object, 'lib_dirs', [])
+    info.libs = getattr(build_object, 'libs', [])
+    info.bins = getattr(build_object, 'bins', [])
+    info.system_libs = set(getattr(build_object, 'system_libs', []))
+    return info
+
+def _evaluate_build_script(converter, cache_dir, build_file, configs, is_profiling = False):
+    ''' Run build script for each config in a worker process.
+    Args:
+        is_profiling: record a span for each config, the spans are sent back to the main process
+    Return:
+        tuple (results, spans). results is a list of tuple, (converted build object, None) if success, or
+        (None, error message). spans is a list of profiler.Span
+    '''
+    loader = _worker_loaders.setdefault(cache_dir, BuildScriptLoader(cache_dir))
+    worker_profiler = profiler.Profiler() if is_profiling else None
+    results = []
+    for config in configs:
+        try:
+            if worker_profiler:
+                with worker_profiler.span(_get_span_name(build_file), 'build_script',
+                                          config=config.description()):
+                    build_object = _run_build_script(loader, build_file, config)
+            else:
+                build_object = _run_build_script(loader, build_file, config)
+            result = converter(build_object)
+            if isinstance(result, ModuleNode):
+                for event_name in ['pre_build', 'post_build']:
+                    if getattr(result, event_name) != None:
+                        setattr(result, event_name, BuildEvent(build_file, config, event_name))
+            results.append((result, None))
+        except Exception:
+            results.append((None, traceback.format_exc()))
+    return results, worker_profiler.spans() if worker_profiler else []
+
 class BuildModel:
-    def __init__(self, configs):
+    def __init__(self, configs, loader = None):
         self._configs = configs
+        # loader for build scripts, each build script is loaded once and used by all configs
+        self._loader = loader if loader != None else BuildScriptLoader()
         # _modules is an array, length is equal to config, value is a map {name --> ModuleNode}
         self._modules = [ {} for c in configs ]
         # _third_parties is an array, length is equal to config, value is a map {name --> ThirdPartyInfo}
         self._third_parties = [ {} for c in configs ]
 
+    def loader(self):
+        return self._loader
+
     def modules(self):
         return self._modules
 
@@ -51,16 +194,18 @@ class BuildModel:
         return self._third_parties
 
     def import_modules(self, module_map):
-        for name, build_file in module_map.items():
-            for i in range(len(self._configs)):
-                build_object = self._run_build_script(build_file, self._configs[i])
-                self._modules[i][name] = self._module_object_to_module_node(build_object)
+        for name, i, module_node in self._run_build_scripts(module_map, _module_object_to_module_node):
+            self._modules[i][name] = module_node
+
+    def reload_modules(self, module_map):
+        ''' Run build files of module_map again after they changed, parse() should be called after it. '''
+        for build_file in module_map.values():
+            self._loader.forget(build_file)
+        self.import_modules(module_map)
 
     def import_third_parties(self, third_party_map):
-        for name, build_file in third_party_map.items():
-            for i in range(len(self._configs)):
-                build_object = self._run_build_script(build_file, self._configs[i])
-                self._third_parties[i][name] = self._third_party_object_to_module_node(build_object)
+        for name, i, info in self._run_build_scripts(third_party_map, _third_party_object_to_module_node):
+            self._third_parties[i][name] = info
 
     def import_default_third_parties(self, default_third_parties):
         ''' Import default third parties, that there is no build file in the directory
@@ -69,140 +214,150 @@ class BuildModel:
                For bin operation, it is similar
         '''
         for party, dir in default_third_parties.items():
+            # the dirs are the same for all configs, so they are listed once
+            if not path.exists(path.join(dir, 'include')):
+                glog.warn('Default third party \'%s\' do not contain include dir. Skip it.', dir)
+                continue
+            lib_dirs, libs = self._get_default_third_party_files(party, dir, 'lib', 'lib')
+            bin_dirs, bins = self._get_default_third_party_files(party, dir, 'bin', 'binary')
             for i in range(len(self._configs)):
-                if not path.exists(path.join(dir, 'include')):
-                    glog.warn('Default third party \'%s\' do not contain include dir. Skip it.', dir)
-                    continue
                 info = ThirdPartyInfo()
                 info.third_party_name = party
                 info.include_dirs = ['include']
-                if path.exists(path.join(dir, 'lib')):
-                    lib_dir = path.join(dir, 'lib')
-                    files = [ f for f in os.listdir(lib_dir) if path.isfile(path.join(lib_dir, f)) ]
-                    if files:
-                        libs_debug_info = ''
-                        for f in files:
-                            libs_debug_info += f+','
-                        glog.info('Add lib files for default third party %s : %s', party, libs_debug_info)
-                        info.lib_dirs = ['lib']
-                        info.libs = ['*.*']
-
-                if path.exists(path.join(dir, 'bin')):
-                    bin_dir = path.join(dir, 'bin')
-                    files = [ f for f in os.listdir(bin_dir) if path.isfile(path.join(bin_dir, f)) ]
-                    if files:
-                        bins_debug_info = ''
-                        for f in files:
-                            bins_debug_info += f+','
-                        glog.info('Add binary files for default third party %s : %s', party, bins_debug_info)
-                        info.bin_dirs = ['bin']
-                        info.bins = ['*.*']
-
-                glog.info('Add default third party %s', party)
+                info.lib_dirs = list(lib_dirs)
+                info.libs = list(libs)
+                info.bin_dirs = list(bin_dirs)
+                info.bins = list(bins)
                 self._third_parties[i][party] = info
+            glog.info('Add default third party %s', party)
+
+    def _get_default_third_party_files(self, party, dir, sub_dir, description):
+        ''' Return tuple (dirs, files) of default third party, which matches all files in sub_dir, or empty lists if
+            there is no file in sub_dir.
+        '''
+        files_dir = path.join(dir, sub_dir)
+        if not path.exists(files_dir):
+            return [], []
+        files = [ f for f in os.listdir(files_dir) if path.isfile(path.join(files_dir, f)) ]
+        if not files:
+            return [], []
+        glog.info('Add %s files for default third party %s : %s', description, party, ','.join(files) + ',')
+        return [sub_dir], ['*.*']
 
     def parse(self):
+        # build files usually declare the same dependencies for all configs, parse each distinct graph only once
+        parsed = {} # graph --> modules parsed
         for i in range(len(self._configs)):
-            self._parse(self._modules[i])
+            modules = self._modules[i]
+            graph = frozenset([ (k, frozenset(v.childs), frozenset(v.direct_third_parties)) \
+                                for k, v in modules.items() ])
+            parsed_modules = parsed.get(graph)
+            if parsed_modules is not None:
+                for k, v in modules.items():
+                    v.dependencies = set(parsed_modules[k].dependencies)
+                    v.third_parties = set(parsed_modules[k].third_parties)
+            else:
+                self._parse(modules)
+                parsed[graph] = modules
+
+    def get_dependent_modules(self, module_names, third_party_names = ()):
+        ''' Return the reverse dependency closure: the given modules, and the modules which depend on them or on
+            the given third parties, directly or indirectly, in any config. It must be called after parse().
+        '''
+        module_names = set(module_names)
+        third_party_names = set(third_party_names)
+        result = set()
+        for modules in self._modules:
+            for name, module in modules.items():
+                # dependencies and third parties are closures after parsing
+                if name in module_names or module.dependencies & module_names or \
+                    module.third_parties & third_party_names:
+                    result.add(name)
+        return result
 
     def _post_order_traversal(self, modules):
-        result = []
-        if not modules:
-            return result
-        # find roots
+        graph = { k : v.childs for k, v in modules.items() }
+        # find roots, if module is children of another module, it is not the root.
         child_set = set()
-        for k in modules:
-            child_set.update(modules[k].childs)
+        for childs in graph.values():
+            child_set.update(childs)
+        roots = [ k for k in modules if k not in child_set ]
+        # start from other modules too, so that modules in a cycle are reported
+        return graph_utils.post_order(graph, roots + list(modules))
 
-        #childs map :key -> list
-        childs = {}
-        for k, v in modules.items():
-            childs[k] = utils.set_to_sorted_list(v.childs)
-
-        for k in modules:
-            # if module is children of another module, it is not the root.
-            if k in child_set:
-                continue
-
-            stack = []
-            cur_node = k
-            while cur_node or stack :
-                if cur_node not in result and childs[cur_node]:
-                    stack.append(cur_node)
-                    cur_node = childs[cur_node][0]
-                else:
-                    if cur_node not in result:
-                        result.append(cur_node)
-                    while stack:
-                        parent = stack[-1]
-                        index = childs[parent].index(cur_node)
-                        if index + 1 < len(childs[parent]):
-                            cur_node = childs[parent][index+1]
-                            break
-                        else:
-                            cur_node = stack.pop()
-                            if cur_node not in result:
-                                result.append(cur_node)
-                    if not stack:
-                        break
-        return result
+    def _run_build_scripts(self, build_file_map, converter):
+        ''' Run build scripts for each config, in worker processes if GConfig.JOBS is greater than 1.
+            Each build script is evaluated for all configs by the same worker, so it is loaded only once.
+        Args:
+            build_file_map: map {name --> build file}
+            converter: convert build object to the result, it must be picklable
+        Return:
+            list of tuple (name, config index, converted build object), in the order of build_file_map and configs
+        '''
+        results = []
+        if GConfig.JOBS <= 1 or len(build_file_map) <= 1:
+            for name, build_file in build_file_map.items():
+                for i in range(len(self._configs)):
+                    with profiler.span(_get_span_name(build_file), 'build_script',
+                                       config=self._configs[i].description()):
+                        build_object = _run_build_script(self._loader, build_file, self._configs[i])
+                    results.append((name, i, converter(build_object)))
+            return results
 
-    def _module_object_to_module_node(self, build_object):
-        module_node = ModuleNode()
-        module_node.module_name = build_object.__class__.__name__
-        module_node.output = build_object.output
-        if module_node.output == config.Output().BINARY:
-            module_node.main_file = getattr(build_object, 'main_file', '')
-            if module_node.main_file == '':
-                glog.warning('No main file set for binary target %s', module_node.module_name)
-            
-        module_node.dependencies = set(getattr(build_object, 'dependencies', []))
-        module_node.third_parties = set(getattr(build_object, 'third_parties', []))
-        module_node.system_libs = set(getattr(build_object, 'system_libs', []))
-        module_node.pre_build = getattr(build_object, 'pre_build', None)
-        module_node.post_build = getattr(build_object, 'post_build', None)
-        module_node.childs = module_node.dependencies
-        return module_node
-
-    def _third_party_object_to_module_node(self, build_object):
-        info = ThirdPartyInfo()
-        info.third_party_name = build_object.__class__.__name__
-        info.include_dirs = getattr(build_object, 'include_dirs', [])
-        info.bin_dirs = getattr(build_object, 'bin_dirs', [])
-        info.lib_dirs = getattr(build_object, 'lib_dirs', [])
-        info.libs = getattr(build_object, 'libs', [])
-        info.bins = getattr(build_object, 'bins', [])
-        info.system_libs = set(getattr(build_object, 'system_libs', []))
-        return info
-
-    def _run_build_script(self, build_file, config):
-        glog.check(path.exists(build_file), 'Build file is not exists!' + build_file)
-
-        build_dir = path.dirname(build_file)
-        module_name = path.basename(build_dir)
-        spec = importlib.util.spec_from_file_location(module_name, build_file)
-        build_obj = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(build_obj)
-        # Verify class in build.py
-        debug_msg = 'build file {} does not define class with module name {}, build object attributes is {}'
-        debug_msg = debug_msg.format(build_file, module_name, dir(build_obj))
-        glog.check(module_name in dir(build_obj), debug_msg)
-        # create class object
-        build_class = getattr(build_obj, module_name)
-        return build_class(config)
+        errors = []
+        is_profiling = profiler.get() != None
+        with futures.ProcessPoolExecutor(max_workers=GConfig.JOBS) as executor:
+            fs = [ executor.submit(_evaluate_build_script, converter, self._loader.cache_dir, build_file,
+                                   self._configs, is_profiling) for build_file in build_file_map.values() ]
+            for (name, build_file), future in zip(build_file_map.items(), fs):
+                build_results, spans = future.result()
+                if is_profiling:
+                    profiler.get().add_spans(spans)
+                for i, (result, error) in enumerate(build_results):
+                    if error != None:
+                        errors.append('Run build file {} with config {} failed:\n{}'.format(
+                            build_file, self._configs[i].description(), error))
+                    results.append((name, i, result))
+        glog.check(not errors, '\n'.join(errors))
+        return results
 
     def _get_attri_or_none(self, object, name):
         ''' Get attribute of an object, or return None if it is not exists'''
         return getattr(object, name)
 
     def _parse(self, modules):
-        for m in self._post_order_traversal(modules):
+        ''' Compute dependencies and third parties of modules, including the indirect ones.
+            Modules get dense ids in post order, so children are computed before parents, and the closures are
+            bitsets of ids. Names are only materialized for the output, by copying the largest set of a child and
+            adding the names it misses.
+        '''
+        order = self._post_order_traversal(modules)
+        module_ids = graph_utils.IdMap(order)
+        third_party_ids = graph_utils.IdMap()
+        dependency_bits = []
+        third_party_bits = []
+        for m in order:
+            # start from the values of build file, so that parsing again is the same
             cur_module = modules[m]
-            append_ds = set()
-            append_ts = set()
+            ds = 0
+            ts = third_party_ids.to_bits(cur_module.direct_third_parties)
             for child in cur_module.childs:
-                append_ds.update(modules[child].dependencies)
-                append_ts.update(modules[child].third_parties)
-            cur_module.dependencies.update(append_ds)
-            cur_module.third_parties.update(append_ts)
+                child_id = module_ids.id(child)
+                ds |= dependency_bits[child_id] | (1 << child_id)
+                ts |= third_party_bits[child_id]
+            dependency_bits.append(ds)
+            third_party_bits.append(ts)
 
+            if not cur_module.childs:
+                cur_module.dependencies = set()
+                cur_module.third_parties = third_party_ids.to_set(ts)
+                continue
+            # copying a set is much faster than inserting names one by one
+            child = max(cur_module.childs, key=lambda x: len(modules[x].dependencies))
+            child_id = module_ids.id(child)
+            cur_module.dependencies = set(modules[child].dependencies)
+            cur_module.dependencies.update(module_ids.to_set(ds & ~dependency_bits[child_id]))
+            child = max(cur_module.childs, key=lambda x: len(modules[x].third_parties))
+            cur_module.third_parties = set(modules[child].third_parties)
+            cur_module.third_parties.update(
+                third_party_ids.to_set(ts & ~third_party_bits[module_ids.id(child)]))
@@ -1,13 +1,18 @@
 
 import copy
+import glog
 from  os import path
+import tempfile
 import unittest
 
 from config import Config
+from build_model import BuildEvent
 from build_model import BuildModel
 from build_model import ModuleNode
 from build_model import ThirdPartyInfo
+from gconfig import GConfig
 from path_manager import PathManager
+import utils
 
 class TestBuildModel(unittest.TestCase):
     def test_import(self):
@@ -76,6 +81,73 @@ class TestBuildModel(unittest.TestCase):
                             }
         self._assert_expected_module_info(build_model, configs, expected_dependencies, expected_third_parties)
 
+    def test_import_in_worker_processes(self):
+        configs = self._create_mock_config()
+        pmg = PathManager(path.join(path.dirname(__file__), 'test'))
+        serial_model = BuildModel(configs)
+        serial_model.import_modules(pmg.module_map)
+        serial_model.import_third_parties(pmg.third_party_map)
+
+        jobs = GConfig.JOBS
+        GConfig.JOBS = 2
+        try:
+            parallel_model = BuildModel(configs)
+            parallel_model.import_modules(pmg.module_map)
+            parallel_model.import_third_parties(pmg.third_party_map)
+        finally:
+            GConfig.JOBS = jobs
+
+        for i in range(len(configs)):
+            self.assertListEqual(list(serial_model.modules()[i].keys()), list(parallel_model.modules()[i].keys()))
+            for name, module in serial_model.modules()[i].items():
+                parallel_module = parallel_model.modules()[i][name]
+                self.assertEqual(module.module_name, parallel_module.module_name)
+                self.assertEqual(module.output, parallel_module.output)
+                self.assertSetEqual(module.dependencies, parallel_module.dependencies)
+                self.assertSetEqual(module.third_parties, parallel_module.third_parties)
+                self.assertEqual(module.pre_build is None, parallel_module.pre_build is None)
+                self.assertEqual(module.post_build is None, parallel_module.post_build is None)
+            for name, info in serial_model.third_parties()[i].items():
+                self._assert_equal_third_info(info, parallel_model.third_parties()[i][name])
+        self.assertIsInstance(parallel_model.modules()[0]['A'].pre_build, BuildEvent)
+        parallel_model.modules()[0]['A'].pre_build()
+
+    def test_import_error_in_worker_processes(self):
+        configs = self._create_mock_config()
+        jobs = GConfig.JOBS
+        GConfig.JOBS = 2
+        with tempfile.TemporaryDirectory() as temp_dir:
+            build_file = path.join(temp_dir, 'broken', 'build.py')
+            utils.write_text('class broken:\n    def __init__(self, config):\n        raise ValueError(\'bad value\')\n', 
+                             build_file)
+            try:
+                build_model = BuildModel(configs)
+                module_map = {'broken': build_file, 'D': PathManager(path.join(path.dirname(__file__), 'test')).module_map['D']}
+                with self.assertRaises(glog.FailedCheckException) as context:
+                    build_model.import_modules(module_map)
+            finally:
+                GConfig.JOBS = jobs
+            self.assertIn(build_file, str(context.exception))
+            self.assertIn('bad value', str(context.exception))
+            self.assertIn(configs[0].description(), str(context.exception))
+
+    def test_get_dependent_modules(self):
+        configs = self._create_mock_config()
+        pmg = PathManager(path.join(path.dirname(__file__), 'test'))
+        build_model = BuildModel(configs)
+        build_model.import_modules(pmg.module_map)
+        build_model.import_third_parties(pmg.third_party_map)
+        build_model.import_default_third_parties(pmg.default_third_party_map)
+        build_model.parse()
+
+        self.assertSetEqual({'A', 'B', 'C', 'D'}, build_model.get_dependent_modules({'D'}))
+        self.assertSetEqual({'A', 'B'}, build_model.get_dependent_modules({'B'}))
+        # only depended on in some configs
+        self.assertSetEqual({'A', 'only_Release_X64'}, build_model.get_dependent_modules({'only_Release_X64'}))
+        self.assertSetEqual({'A', 'B'}, build_model.get_dependent_modules(set(), {'third_party1'}))
+        self.assertSetEqual({'A', 'B', 'C', 'D'}, build_model.get_dependent_modules(set(), {'default_party'}))
+        self.assertSetEqual(set(), build_model.get_dependent_modules(set()))
+
     def test_post_order_traversal(self):
         build_model = BuildModel([])
 
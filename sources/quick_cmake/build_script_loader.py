@@ -0,0 +1,65 @@
+import glog
+import hashlib
+import importlib.util
+import marshal
+import os
+from os import path
+import types
+
+class BuildScriptLoader:
+    ''' Loader for build.py files. Each build file is read and compiled only once, and its code is executed in a
+        new module for every load, so the configs do not share the state of build files.
+    Attributes:
+        cache_dir: if it is not None, compiled code is stored under this dir, one file for each build file with the
+            hash of its content, so that an unchanged build file is not compiled again in next run.
+    '''
+    def __init__(self, cache_dir = None):
+        self.cache_dir = cache_dir
+        self._codes = {} # absolute build file path --> code
+
+    def load(self, build_file):
+        ''' Load build file as a module, the name of module is the name of the dir of build file '''
+        abs_build_file = path.abspath(build_file)
+        code = self._codes.get(abs_build_file)
+        if code is None:
+            glog.check(path.exists(build_file), 'Build file is not exists!' + build_file)
+            with open(build_file, 'rb') as f:
+                source = f.read()
+            code = self._compile(build_file, source)
+            self._codes[abs_build_file] = code
+
+        module = types.ModuleType(path.basename(path.dirname(abs_build_file)))
+        module.__file__ = build_file
+        exec(code, module.__dict__)
+        return module
+
+    def forget(self, build_file):
+        ''' Forget the compiled code of build_file, so it is read again next time '''
+        self._codes.pop(path.abspath(build_file), None)
+
+    def _compile(self, build_file, source):
+        if self.cache_dir is None:
+            return compile(source, build_file, 'exec', dont_inherit=True)
+
+        # the cache file of a build file is replaced when the build file changes, so stale files are not left
+        cache_file = path.join(self.cache_dir, hashlib.sha1(path.abspath(build_file).encode('utf-8')).hexdigest() + '.pyc')
+        header = importlib.util.MAGIC_NUMBER + hashlib.sha1(source).digest()
+        if path.exists(cache_file):
+            with open(cache_file, 'rb') as f:
+                data = f.read()
+            if data.startswith(header):
+                try:
+                    return marshal.loads(data[len(header):])
+                except (EOFError, ValueError, TypeError):
+                    glog.warn('Broken bytecode cache %s for build file %s', cache_file, build_file)
+
+        code = compile(source, build_file, 'exec', dont_inherit=True)
+        if not path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file then replace, build files may be compiled in several processes
+        temp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+        with open(temp_file, 'wb') as f:
+            f.write(header)
+            f.write(marshal.dumps(code))
+        os.replace(temp_file, cache_file)
+        return code
@@ -0,0 +1,57 @@
+import os
+from os import path
+import tempfile
+import unittest
+from unittest import mock
+
+from build_script_loader import BuildScriptLoader
+import utils
+
+class TestBuildScriptLoader(unittest.TestCase):
+    def test_compile_once(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            build_file = path.join(temp_dir, 'module_a', 'build.py')
+            utils.write_text('STATE = []\nclass module_a:\n    pass\n', build_file)
+            loader = BuildScriptLoader()
+            with mock.patch.object(loader, '_compile', wraps=loader._compile) as compile_mock:
+                module = loader.load(build_file)
+                self.assertEqual('module_a', module.__name__)
+                self.assertTrue(hasattr(module, 'module_a'))
+                # the code is executed for each load, so the state of build file is not shared by configs
+                module.STATE.append('debug')
+                other_module = loader.load(build_file)
+                self.assertIsNot(module, other_module)
+                self.assertListEqual([], other_module.STATE)
+                self.assertEqual(1, compile_mock.call_count)
+
+                loader.forget(build_file)
+                loader.load(build_file)
+                self.assertEqual(2, compile_mock.call_count)
+
+    def test_bytecode_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_dir = path.join(temp_dir, 'cache')
+            build_file = path.join(temp_dir, 'module_a', 'build.py')
+            utils.write_text('VALUE = 1\n', build_file)
+            self.assertEqual(1, BuildScriptLoader(cache_dir).load(build_file).VALUE)
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+
+            # cached code is used
+            cache_file = path.join(cache_dir, os.listdir(cache_dir)[0])
+            os.utime(cache_file, ns=(0, 0))
+            self.assertEqual(1, BuildScriptLoader(cache_dir).load(build_file).VALUE)
+            self.assertEqual(0, os.stat(cache_file).st_mtime_ns)
+
+            # changed build file is compiled again, and its cache file is replaced
+            utils.write_text('VALUE = 2\n', build_file)
+            self.assertEqual(2, BuildScriptLoader(cache_dir).load(build_file).VALUE)
+            self.assertListEqual([path.basename(cache_file)], os.listdir(cache_dir))
+            self.assertEqual(2, BuildScriptLoader(cache_dir).load(build_file).VALUE)
+
+            # broken cache file is ignored
+            for f in os.listdir(cache_dir):
+                utils.write_text('broken', path.join(cache_dir, f))
+            self.assertEqual(2, BuildScriptLoader(cache_dir).load(build_file).VALUE)
+
+if __name__ == '__main__':
+    unittest.main()
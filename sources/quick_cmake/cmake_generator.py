@@ -1,18 +1,33 @@
 
-import copy
-import glob
+from concurrent import futures
+import binary_stager
 import glog
 import os
 from os import path
+import re
+import shutil
 import subprocess
 import sys
 
 import config
+import dependency_checker
 from gconfig import GConfig
+import graph as graph_utils
+import include_scanner
+import profiler
+from source_scanner import SourceScanner
 import utils
 
 CMAKE_SOURCES_DIR = '${SOURCE_DIR}'
 
+# ninja job pools
+LINK_POOL = 'link_pool'
+COMPILE_POOL = 'compile_pool'
+HEAVY_COMPILE_POOL = 'heavy_compile_pool'
+
+# custom target which stages binaries of third parties at build time
+STAGE_BINARIES_TARGET = 'stage_third_party_binaries'
+
 class CMakeConfig:
     GENERAL = 0
     DEBUG = 1
@@ -34,6 +49,7 @@ class CMakeTarget:
     STATIC_LIBRARY = 1
     SHARED_LIBRARY = 2
     UNITTEST_CUSTOM_TARGET = 3 # custom target for unit tests
+    OBJECT_LIBRARY = 4 # sources of binary module compiled once for the module and its unit tests
 
     ConfigMap = {config.Output().BINARY : EXECUTABLE,
                  config.Output().STATIC_LIB : STATIC_LIBRARY,
@@ -50,24 +66,60 @@ class TargetInfo:
         self.third_party_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.libs = [set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.system_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
+        # private ones are only used by the target, the others are propagated to the targets linking it by cmake
+        self.private_include_dirs = set()
+        self.private_third_party_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
+        self.private_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
+        self.private_system_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.has_pre_build = False
         self.has_post_build = False
-        self.unittest_targets = {} # ut target name --> ut source file
-        self.module_name = '' # set when target is custom target
+        self.unittest_targets = {} # ut target name --> ut source file, or ut source files of a single test binary
+        self.module_name = '' # set when target is custom target or unit test
+        self.is_unittest = False
+        self.test_timeout = None # seconds, for ctest
+        self.test_cost = None # for ctest
+        self.unity_build = False
+        self.unity_batch_size = 0
+        self.unity_skip_files = [] # relative to sources dir, files not included in unity batches
+        self.precompile_headers = [] # in the form of <header>
+        self.pch_reuse_from = '' # target whose precompiled headers are reused
+        self.compiler_launcher = None # None means the launcher of project is used
+        self.heavy_compile = False # if compile in the heavy compile pool of ninja
+        self.object_libraries = [] # object library targets whose objects are linked into this target
+        self.test_entries = {} # ut name --> ut source file, for a single test binary of module
+        self.test_costs = {} # ut name --> cost, for ctest of a single test binary
+        self.generated_files = {} # path relative to project files dir --> lines, such as the main file of single test binary
 
 class CMakeModule:
     def __init__(self):
         self.name = ''
         self.output = 0
         self.main_file = ''
+        # direct dependencies and third parties of module, the ones of head only modules are merged since they are
+        # not linked. The libs of modules depended on indirectly are propagated by cmake.
         self.third_party_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.include_dirs = set()
         self.libs = [set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.system_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
+        self.private_third_party_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
+        self.private_include_dirs = set()
+        self.private_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
+        self.private_system_libs = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.bins = [ set() for i in range(CMakeConfig.CONFIG_LEN) ]
         self.has_pre_build = False
         self.has_post_build = False
         self.head_only = False
+        self.unittest_timeout = None
+        self.unittest_costs = {}
+        self.unity_build = True
+        self.unity_exclude = []
+        self.unity_batch_size = None
+        self.precompile_headers = None # set by build file, None means the frequent headers are used
+        self.frequent_headers = [] # headers included by most sources, in the form of <header>
+        self.compiler_launcher = None # set by build file, None means the launcher of project is used
+        self.heavy_compile = False
+        self.single_test_binary = None # set by build file, None means GConfig.SINGLE_TEST_BINARY
+        self.file_includes = {} # file relative to sources dir --> list of (header, is_angled), for checking dependencies
 
         # Following path is relative to the sources dir
         self.file_group_infos = {} # key -- > sources files
@@ -95,52 +147,240 @@ class CMakeGenerator:
         self._path_manager = path_manager
         self._cmake_modules = {}
         self._cmake_third_parties = {}
+        self._source_scanner = SourceScanner(path_manager.directory_index())
+        self._compiler_launcher = self._resolve_compiler_launcher(GConfig.COMPILER_LAUNCHER)
+        # kept for update(), module name --> CMakeModule whose file infos can be reused
+        self._reusable_modules = {}
+        # kept for update(), module name --> content of module fragment
+        self._module_contents = {}
 
         self.cached_post_order = self._get_post_order()
 
-    def generate(self):
+    def generate(self, affected_modules = None):
+        ''' Generate CMakeLists.txt and module fragments
+        Args:
+            affected_modules: if it is not None, only fragments of these modules are generated again, others are
+                the same as the last generation.
+        Return:
+            bool: if any cmake file is written
+        '''
         # for each modules
-        self._parse_cmake_info()
+        with profiler.span('parse cmake info', 'phase'):
+            self._parse_cmake_info()
+        with profiler.span('generate cmake files', 'phase'):
+            return self._generate_cmake_files(affected_modules)
 
+    def _generate_cmake_files(self, affected_modules = None):
+        ''' Generate and write cmake files from the parsed cmake modules, see generate() '''
         glog.info('Generate header')
         content = self._generate_quick_cmake_meta_info()
         content.extend(self._generate_header())
         content.extend(self._generate_project_info())
+        content.extend(self._generate_job_pools())
         content.extend(self._generate_compile_options())
         content.extend(self._generate_compile_definitions())
 
+        module_contents = {}
         for module_name in self.cached_post_order:
+            if affected_modules is not None and module_name not in affected_modules \
+                and module_name in self._module_contents:
+                module_contents[module_name] = self._module_contents[module_name]
+                continue
             glog.info('Generate module ' + module_name)
-            content.extend(self._generate_module(self._cmake_modules[module_name]))
-        
+            with profiler.span(module_name, 'generate'):
+                module_contents[module_name] = self._generate_module(self._cmake_modules[module_name])
+        self._module_contents = module_contents
+        content.extend(self._generate_module_includes())
+        content.extend(self._generate_stage_binaries())
+
         # write to file
-        cmake_dist = path.join(self._path_manager.project_files_dir(), 'CMakeLists.txt')
-        glog.info('Write to file:' + cmake_dist)
-        utils.write_text('\n'.join(content), cmake_dist)
+        is_written = self._write_cmake_files(content, module_contents)
+
+        self._stage_third_party_binaries()
+        return is_written
+
+    def update(self, build_models, dirty_modules):
+        ''' Generate again after the build files or the sources of dirty modules changed. The sources of other
+            modules are not scanned again, and only dirty modules and the modules depending on them are generated.
+        Return:
+            bool: if any cmake file is written
+        '''
+        self._reusable_modules = { k : v for k, v in self._cmake_modules.items() if k not in dirty_modules }
+        self._build_models = build_models
+        self._cmake_modules = {}
+        self._cmake_third_parties = {}
+        self.cached_post_order = self._get_post_order()
 
-        self._copy_third_party_binaries()
+        # dependencies are parsed, they contain the modules depended on indirectly
+        affected_modules = set(dirty_modules)
+        for modules in self._build_models.modules():
+            for name, module in modules.items():
+                if module.dependencies & set(dirty_modules):
+                    affected_modules.add(name)
+        glog.info('Update modules: ' + ','.join(sorted(affected_modules)))
+        return self.generate(affected_modules)
+
+    def modules_dir(self):
+        ''' Dir of the cmake fragment files, one file for each module '''
+        return path.join(self._path_manager.project_files_dir(), 'modules')
+
+    def _get_module_file_name(self, module_name):
+        return module_name + '.cmake'
+
+    def _write_cmake_files(self, content, module_contents):
+        ''' Write CMakeLists.txt and the fragment files of modules. A file is only written if its content changes,
+            and fragment files of modules which do not exist anymore are removed.
+        Args:
+            content: lines of CMakeLists.txt
+            module_contents: map {module name --> lines of module fragment}
+        Return:
+            bool: if any file is written or removed
+        '''
+        is_written = False
+        modules_dir = self.modules_dir()
+        module_files = set()
+        for module_name, module_content in module_contents.items():
+            module_file = self._get_module_file_name(module_name)
+            module_files.add(module_file)
+            if utils.write_text_if_changed('\n'.join(module_content), path.join(modules_dir, module_file)):
+                glog.info('Write to file:' + path.join(modules_dir, module_file))
+                is_written = True
+
+        if path.isdir(modules_dir):
+            for f in os.listdir(modules_dir):
+                if f.endswith('.cmake') and f not in module_files:
+                    glog.info('Remove file:' + path.join(modules_dir, f))
+                    os.remove(path.join(modules_dir, f))
+                    is_written = True
+
+        cmake_dist = path.join(self._path_manager.project_files_dir(), 'CMakeLists.txt')
+        if utils.write_text_if_changed('\n'.join(content), cmake_dist):
+            glog.info('Write to file:' + cmake_dist)
+            is_written = True
+        return is_written
 
     def exe_cmake(self):
-        self._path_manager.project_files_dir()
         run_args = ['cmake', '-S', self._path_manager.project_files_dir(), '-B', self._path_manager.project_files_dir()]
+        generator = self._get_generator()
+        if generator:
+            run_args.extend(['-G', generator])
         returncode = subprocess.run(run_args).returncode
         glog.check_eq(0, returncode)
 
-    def _copy_third_party_binaries(self):
-        # copy binary file of third
-        # parties to binary dir
-        bins = { 'Debug':list(), 'Release':list() }
+    def _get_generator(self):
+        ''' Return the generator passed to cmake, empty means the default generator of cmake or the generator of the
+            existing build dir.
+        '''
+        generator = self._get_configured_generator()
+        # cmake fails if the generator is different from the one of the existing build dir
+        cached_generator = self._get_cached_generator()
+        if cached_generator and generator and cached_generator != generator:
+            if GConfig.GENERATOR != 'auto':
+                glog.warn('The build dir is generated by {}, not {}. Remove {} to change the generator.'.format(
+                    cached_generator, generator, self._path_manager.project_files_dir()))
+            return ''
+        return generator
+
+    def _get_configured_generator(self):
+        ''' Return the generator set by GConfig.GENERATOR, empty means the default generator of cmake '''
+        if GConfig.GENERATOR == 'auto':
+            return 'Ninja Multi-Config' if shutil.which('ninja') else ''
+        return GConfig.GENERATOR
+
+    def _get_used_generator(self):
+        ''' Return the generator which cmake uses, empty if it is the default generator of cmake '''
+        return self._get_cached_generator() or self._get_configured_generator()
+
+    def _get_cached_generator(self):
+        ''' Return the generator in the CMakeCache.txt of build dir, empty if it is not generated '''
+        cache_file = path.join(self._path_manager.project_files_dir(), 'CMakeCache.txt')
+        if not path.isfile(cache_file):
+            return ''
+        with open(cache_file, 'r', errors='replace') as f:
+            for line in f:
+                if line.startswith('CMAKE_GENERATOR:INTERNAL='):
+                    return line.strip()[len('CMAKE_GENERATOR:INTERNAL='):]
+        return ''
+
+    def print_launcher_stats(self):
+        ''' Print statistics of the compiler cache, such as the hit rate, if ccache or sccache is the launcher '''
+        launcher_name = path.splitext(path.basename(self._compiler_launcher))[0]
+        if launcher_name not in ('ccache', 'sccache'):
+            return
+        process = subprocess.run([self._compiler_launcher, '--show-stats'], stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT)
+        print(process.stdout.decode('utf-8', 'replace').rstrip('\n'))
+
+    def check_dependencies(self):
+        ''' Compare the headers included by each module with its dependencies, in all configs.
+        Return:
+            dependency_checker.DependencyReport
+        '''
+        if not self._cmake_modules:
+            self._parse_cmake_info()
+        direct_dependencies = {}
+        dependencies = {}
+        for modules in self._build_models.modules():
+            for name, module in modules.items():
+                direct_dependencies.setdefault(name, set()).update(module.childs)
+                dependencies.setdefault(name, set()).update(module.dependencies)
+        module_includes = { name : m.file_includes for name, m in self._cmake_modules.items() }
+        # public include dirs of dependencies are propagated by cmake
+        module_include_dirs = {}
+        for name, m in self._cmake_modules.items():
+            include_dirs = m.include_dirs | m.private_include_dirs
+            for dependency in dependencies[name]:
+                include_dirs |= self._cmake_modules[dependency].include_dirs
+            module_include_dirs[name] = [ path.join(self._path_manager.workspace(), d)
+                                          for d in utils.set_to_sorted_list(include_dirs) ]
+        return dependency_checker.check_dependencies(self._path_manager.sources_dir(), module_includes,
+                                                     module_include_dirs, direct_dependencies, dependencies)
+
+    def get_unittest_targets(self, module_names):
+        ''' Return names of the custom targets which run the unittests of modules, modules without unittests
+            are skipped.
+        '''
+        if not self._cmake_modules:
+            self._parse_cmake_info()
+        if not GConfig.ENABLE_UNITTEST:
+            return []
+        return [ 'test_' + m for m in self.cached_post_order if m in module_names and self._cmake_modules[m].unittest_sources ]
+
+    def build_targets(self, targets):
+        ''' Build targets by cmake, the first configuration is used for multi-config generators.
+        Return:
+            bool: if the build succeeds
+        '''
+        run_args = ['cmake', '--build', self._path_manager.project_files_dir(), '--target'] + targets
+        configurations = self._get_configurations()
+        if configurations:
+            run_args.extend(['--config', configurations.split(';')[0]])
+        return subprocess.run(run_args).returncode == 0
+
+    def _get_third_party_binaries(self):
+        ''' Return map {dist dir --> binaries of third parties}, binaries of each configuration are staged to the
+            dir of the configuration under the binary dir.
+        '''
+        bins = { 'Debug':set(), 'Release':set() }
         for third_party in self._cmake_third_parties.values():
             for i in range(CMakeConfig.CONFIG_LEN):
+                # bins are relative to the workspace, not the current dir
+                files = [ path.join(self._path_manager.workspace(), f) for f in third_party.bins[i] ]
                 if i == CMakeConfig.GENERAL or i == CMakeConfig.DEBUG:
-                    bins['Debug'].extend(third_party.bins[i])
+                    bins['Debug'].update(files)
                 if i == CMakeConfig.GENERAL or i == CMakeConfig.RELEASE:
-                    bins['Release'].extend(third_party.bins[i])
+                    bins['Release'].update(files)
+        return { path.join(self._path_manager.binary_dirs(), config_dir) : files for config_dir, files in bins.items() }
 
-        # check conflict files
-        for config_dir, files in bins.items():
-            if files:
-                utils.copy_files(files, path.join(self._path_manager.binary_dirs(), config_dir))
+    def _stage_third_party_binaries(self):
+        ''' Write binaries of third parties to the plan file and stage them to the binary dir, or leave the plan
+            file to the build step with GConfig.STAGE_AT_BUILD. The plan file is staged again by the runs which
+            skip generation, so binaries updated in place are staged without generating again.
+        '''
+        plan_file = path.join(self._path_manager.cache_dir(), binary_stager.PLAN_FILE_NAME)
+        binary_stager.write_plan(self._get_third_party_binaries(), plan_file)
+        if not GConfig.STAGE_AT_BUILD:
+            glog.info(binary_stager.stage_plan(plan_file, GConfig.STAGE_MODE, GConfig.STAGE_CHECK).summary())
 
     def _union_libs(self, target_libs):
         target_libs[CMakeConfig.GENERAL] = target_libs[CMakeConfig.DEBUG] & target_libs[CMakeConfig.RELEASE]
@@ -156,8 +396,9 @@ class CMakeGenerator:
         # Merge third party and module valus under DEBUG and  RELEASE configuration
         # Extract the common value to GENERAL
         for module in self._cmake_modules.values():
-            self._union_libs(module.libs)
-            self._union_libs(module.system_libs)
+            for target_libs in [ module.libs, module.third_party_libs, module.system_libs, module.private_libs,
+                                 module.private_third_party_libs, module.private_system_libs ]:
+                self._union_libs(target_libs)
 
         for third_party in self._cmake_third_parties.values():
             self._union_libs(third_party.libs)
@@ -183,7 +424,8 @@ class CMakeGenerator:
             third_libs = utils.match_files(third_party_workspace, 
                                             third_party.lib_dirs, 
                                             third_party.libs, 
-                                            self._path_manager.workspace())
+                                            self._path_manager.workspace(),
+                                            self._path_manager.file_matcher().glob)
 
             third_libs = ['${PROJECT_DIR}/' + x.replace('\\','/') \
                 if not path.isabs(x) else x.replace('\\','/') \
@@ -193,43 +435,104 @@ class CMakeGenerator:
             cmake_third_party.bins[config_index].update(utils.match_files(third_party_workspace, 
                                                                             third_party.bin_dirs, 
                                                                             third_party.bins, 
-                                                                            self._path_manager.workspace()))
+                                                                            self._path_manager.workspace(),
+                                                                            self._path_manager.file_matcher().glob))
         
     def _parse_cmake_module(self, config, modules):
         config_index = self._get_configuration_index(config)
+        new_modules = []
         for module_name in self.cached_post_order:
             module = modules[module_name]
-            cmake_module = None
             if module.module_name not in self._cmake_modules:
                 # create new one 
                 cmake_module = CMakeModule()
                 cmake_module.name = module.module_name
                 cmake_module.output = module.output
                 cmake_module.main_file = module.main_file
-                cmake_module.include_dirs = set()
-                cmake_module.libs[config_index] = set()
-                cmake_module.third_party_libs[config_index] = set()
-                cmake_module.system_libs[config_index] = set()
                 cmake_module.has_pre_build = module.pre_build != None
                 cmake_module.has_post_build = module.post_build != None 
-                self._parse_file_infos(cmake_module)
+                cmake_module.unittest_timeout = module.unittest_timeout
+                cmake_module.unittest_costs = module.unittest_costs
+                cmake_module.unity_build = module.unity_build
+                cmake_module.unity_exclude = module.unity_exclude
+                cmake_module.unity_batch_size = module.unity_batch_size
+                cmake_module.precompile_headers = module.precompile_headers
+                cmake_module.compiler_launcher = module.compiler_launcher
+                cmake_module.heavy_compile = module.heavy_compile
+                cmake_module.single_test_binary = module.single_test_binary
                 self._cmake_modules[cmake_module.name] = cmake_module
-            else:
-                cmake_module = self._cmake_modules[module.module_name]
-
-            # append include dirs
-            cmake_module.include_dirs.update(self._get_module_include_dirs(module, self._cmake_third_parties))
-            # for dependencies, we can use the library target name
-            for x in module.dependencies:
-                glog.check(x in self._cmake_modules, x + 'not in ' + str(self._cmake_modules.keys()))
-                if not self._cmake_modules[x].head_only:
-                    cmake_module.libs[config_index].add(x)
+                new_modules.append(cmake_module)
+        self._parse_modules_file_infos(new_modules)
+
+        for module_name in self.cached_post_order:
+            module = modules[module_name]
+            cmake_module = self._cmake_modules[module.module_name]
+
+            # dependencies and third parties are closures after parsing, only the direct ones are linked
+            public_dependencies = module.childs - module.private_dependencies
+            public_third_parties = module.direct_third_parties - module.private_third_parties
             cmake_module.system_libs[config_index].update(module.system_libs)
-            for third_party in module.third_parties:
-                glog.check(third_party in self._cmake_third_parties, 
-                            'third party {} is not in cmake third parties'.format(third_party))
-                cmake_module.third_party_libs[config_index].update(self._cmake_third_parties[third_party].libs[config_index])
-                cmake_module.system_libs[config_index].update(self._cmake_third_parties[third_party].system_libs[config_index])
+            self._add_module_dependencies(cmake_module, config_index, public_dependencies, module.include_dirs,
+                                          public_third_parties, cmake_module.include_dirs, cmake_module.libs,
+                                          cmake_module.third_party_libs, cmake_module.system_libs)
+            self._add_module_dependencies(cmake_module, config_index, module.private_dependencies,
+                                          module.private_include_dirs, module.private_third_parties,
+                                          cmake_module.private_include_dirs, cmake_module.private_libs,
+                                          cmake_module.private_third_party_libs, cmake_module.private_system_libs)
+
+    def _add_module_dependencies(self, cmake_module, config_index, dependencies, module_include_dirs, third_parties,
+                                 include_dirs, libs, third_party_libs, system_libs):
+        ''' Add dependencies, include dirs and third parties of cmake_module in a scope (public or private) of config.
+            Head only modules are not linked, so their public dependencies and include dirs are added instead, they
+            are parsed before cmake_module in post order.
+        Args:
+            module_include_dirs: include dirs of build file, relative to the module dir
+            include_dirs, libs, third_party_libs and system_libs: fields of cmake_module to add to
+        '''
+        include_dirs.update(self._get_module_include_dirs(cmake_module.name, module_include_dirs, third_parties))
+        for x in dependencies:
+            glog.check(x in self._cmake_modules, x + 'not in ' + str(self._cmake_modules.keys()))
+            dependency = self._cmake_modules[x]
+            if not dependency.head_only:
+                # for dependencies, we can use the library target name
+                libs[config_index].add(x)
+                continue
+            include_dirs.update(dependency.include_dirs)
+            libs[config_index].update(dependency.libs[config_index])
+            third_party_libs[config_index].update(dependency.third_party_libs[config_index])
+            system_libs[config_index].update(dependency.system_libs[config_index])
+        for third_party in third_parties:
+            glog.check(third_party in self._cmake_third_parties,
+                        'third party {} is not in cmake third parties'.format(third_party))
+            third_party_libs[config_index].update(self._cmake_third_parties[third_party].libs[config_index])
+            system_libs[config_index].update(self._cmake_third_parties[third_party].system_libs[config_index])
+
+    def _parse_modules_file_infos(self, cmake_modules):
+        ''' Parse file infos of modules, in a thread pool if GConfig.SCAN_JOBS is not 1. Each module only
+            updates itself, so the result is the same as parsing them one by one.
+        '''
+        reused_modules = [ m for m in cmake_modules if m.name in self._reusable_modules ]
+        for cmake_module in reused_modules:
+            self._reuse_file_infos(cmake_module, self._reusable_modules[cmake_module.name])
+        cmake_modules = [ m for m in cmake_modules if m.name not in self._reusable_modules ]
+
+        if GConfig.SCAN_JOBS == 1 or len(cmake_modules) <= 1:
+            for cmake_module in cmake_modules:
+                self._scan_file_infos(cmake_module)
+            return
+        max_workers = GConfig.SCAN_JOBS if GConfig.SCAN_JOBS > 0 else None
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # consume the results to raise the exception in worker threads
+            list(executor.map(self._scan_file_infos, cmake_modules))
+
+    def _reuse_file_infos(self, cmake_module, reusable_module):
+        cmake_module.file_group_infos = reusable_module.file_group_infos
+        cmake_module.sources_infos = reusable_module.sources_infos
+        cmake_module.unittest_exclude_file_infos = reusable_module.unittest_exclude_file_infos
+        cmake_module.unittest_sources = reusable_module.unittest_sources
+        cmake_module.head_only = reusable_module.head_only
+        cmake_module.frequent_headers = reusable_module.frequent_headers
+        cmake_module.file_includes = reusable_module.file_includes
 
     def _get_file_info_dir_key(self, sub_dir, module_name):
         '''
@@ -256,19 +559,18 @@ class CMakeGenerator:
             return prefix
         return '\\\\'.join(utils.split_path(path.join(prefix, sub_dir)))
 
+    def _scan_file_infos(self, cmake_module):
+        with profiler.span(cmake_module.name, 'scan'):
+            self._parse_file_infos(cmake_module)
+
     def _parse_file_infos(self, cmake_module):
         module_dir = path.join(self._path_manager.sources_dir(), cmake_module.name)
         rel_main_file = path.join(cmake_module.name, cmake_module.main_file)
-        for subdir, dirs, files in os.walk(module_dir):
-            file_results = []
-            for extension in GConfig.SOURCES_FILTER:
-                for file in [path.relpath(f, self._path_manager.sources_dir()) for f in glob.glob(path.join(subdir, extension))]:
-                    if file == rel_main_file:
-                        continue
-                    # remove end with _test files
-                    if not path.splitext(file)[0].endswith('_test'):
-                        file_results.append(file)
-                        print(file)
+        for subdir, entries in self._source_scanner.walk(module_dir):
+            # relative path to sources dir
+            rel_dir = path.relpath(subdir, self._path_manager.sources_dir())
+            file_results = [ path.join(rel_dir, f) for f in entries.sources ]
+            file_results = [ f for f in file_results if f != rel_main_file ]
             key = self._get_file_info_dir_key(path.relpath(subdir, module_dir), cmake_module.name)
             if file_results:
                 cmake_module.file_group_infos[key] = file_results
@@ -277,8 +579,7 @@ class CMakeGenerator:
                 cmake_module.sources_infos[sources_info_key].append(key)
             # For unittest
             if GConfig.ENABLE_UNITTEST:
-                for extension in GConfig.UNITTEST_SOURCES_FILTTER:
-                    cmake_module.unittest_sources.extend([path.relpath(f, self._path_manager.sources_dir()) for f in glob.glob(path.join(subdir, extension))])
+                cmake_module.unittest_sources.extend([ path.join(rel_dir, f) for f in entries.unittests ])
         # For main_file
         real_main_file = path.join(module_dir, cmake_module.main_file)
         if cmake_module.output == config.Output().BINARY and path.exists(real_main_file) and path.isfile(real_main_file):
@@ -296,11 +597,33 @@ class CMakeGenerator:
                     break
             if not cmake_module.head_only:
                 break
+        if GConfig.PCH and cmake_module.precompile_headers is None and not cmake_module.head_only:
+            cmake_module.frequent_headers = self._get_frequent_headers(cmake_module)
+
+        if GConfig.CHECK_DEPENDENCIES:
+            source_files = [ f for file_group in cmake_module.file_group_infos.values() for f in file_group ]
+            source_files.extend(cmake_module.unittest_sources)
+            cmake_module.file_includes = { f : include_scanner.scan_includes(path.join(self._path_manager.sources_dir(), f))
+                                           for f in source_files }
 
         build_file_key = self._get_build_file_group_name(cmake_module.name)
         cmake_module.file_group_infos[build_file_key] = [path.join(cmake_module.name, 'build.py').replace('\\', '/')]
         cmake_module.unittest_exclude_file_infos.append(build_file_key)
 
+    def _get_frequent_headers(self, cmake_module):
+        ''' Return headers included by at least GConfig.PCH_THRESHOLD of the sources of module, in the form of <header> '''
+        sources_dir = self._path_manager.sources_dir()
+        module_dir = path.join(sources_dir, cmake_module.name)
+        source_files = [ path.join(sources_dir, f) for file_group in cmake_module.file_group_infos.values()
+                         for f in file_group if '*' + path.splitext(f)[1] in GConfig.SOURCE_FILE_FILTER ]
+        counter = include_scanner.count_includes(source_files)
+        # quoted header may be relative to the including file, only the ones found by include dirs of module are kept
+        counter = { (header, is_angled) : count for (header, is_angled), count in counter.items()
+                    if is_angled or path.isfile(path.join(sources_dir, header)) or path.isfile(path.join(module_dir, header)) }
+        headers = include_scanner.select_frequent_includes(counter, len(source_files), GConfig.PCH_THRESHOLD,
+                                                           GConfig.PCH_MAX_HEADERS)
+        return [ '<{}>'.format(header) for header, is_angled in headers ]
+
     def _get_build_file_group_name(self, module_name):
         return module_name + '_BUILD_TARGET_FILE_GROUP'
 
@@ -313,16 +636,56 @@ class CMakeGenerator:
             glog.fatal('Unknown configuration type {}', config.configuration)
 
     def _generate_header(self):
-        headers = ['cmake_minimum_required(VERSION 3.2)']
+        headers = ['cmake_minimum_required(VERSION {})'.format(self._get_cmake_minimum_version())]
         headers.append('set(CMAKE_SUPPRESS_REGENERATION true)')
         headers.append('set(CMAKE_CONFIGURATION_TYPES \"{}\" CACHE STRING \"\" FORCE)'.format(self._get_configurations()))
         headers.append('set(CMAKE_CXX_STANDARD {})'.format(GConfig.STD))
+        if self._compiler_launcher:
+            headers.append('set(CMAKE_C_COMPILER_LAUNCHER \"{}\")'.format(self._compiler_launcher))
+            headers.append('set(CMAKE_CXX_COMPILER_LAUNCHER \"{}\")'.format(self._compiler_launcher))
         headers.append('if("${CMAKE_GENERATOR}" MATCHES "^Visual Studio.*")')
         headers.append('  set(CMAKE_GENERATOR_PLATFORM \"{}\" CACHE INTERNAL \"\" FORCE)'.format(self._get_generator_platform()))
         headers.append('endif()')
         headers.append('\n')
         return headers
 
+    def _get_cmake_minimum_version(self):
+        ''' Minimum version of cmake, it is higher if features of newer cmake are enabled '''
+        if self._get_used_generator() == 'Ninja Multi-Config':
+            return '3.17'
+        if GConfig.UNITY or GConfig.PCH:
+            # UNITY_BUILD and target_precompile_headers
+            return '3.16'
+        if self._has_object_libraries():
+            # target_link_libraries of object library
+            return '3.12'
+        if self._compiler_launcher:
+            # CMAKE_<LANG>_COMPILER_LAUNCHER
+            return '3.4'
+        return '3.2'
+
+    def _has_object_libraries(self):
+        ''' If binary modules with unit tests compile their sources by object libraries, see _get_objects_target_info '''
+        return GConfig.ENABLE_UNITTEST and any([ m.output == config.Output().BINARY and m.unittest_sources
+                                                 for m in self._cmake_modules.values() ])
+
+    def _resolve_compiler_launcher(self, launcher):
+        ''' Return the path of compiler launcher, empty if there is not a launcher.
+        Args:
+            launcher: 'auto' means ccache or sccache if one of them is installed, 'none' or empty means no launcher,
+                otherwise it is the name or the path of the launcher.
+        '''
+        if launcher == 'auto':
+            launcher = shutil.which('ccache') or shutil.which('sccache') or ''
+            if launcher:
+                glog.info('Use compiler launcher ' + launcher)
+            return launcher.replace('\\', '/')
+        if not launcher or launcher == 'none':
+            return ''
+        launcher_path = shutil.which(launcher)
+        glog.check(launcher_path, 'Compiler launcher {} is not found'.format(launcher))
+        return launcher_path.replace('\\', '/')
+
     def _generate_project_info(self):
         project_info = ['project({})'.format(self._path_manager.project_name())]
         project_info.append('set (PROJECT_DIR ${CMAKE_CURRENT_SOURCE_DIR}/../)')
@@ -333,9 +696,38 @@ class CMakeGenerator:
         
         # add sources dir to include
         project_info.append('include_directories(${SOURCE_DIR})')
+        if GConfig.CTEST:
+            project_info.append('enable_testing()')
         project_info.append('\n')
         return project_info
 
+    def _generate_job_pools(self):
+        ''' Limit the parallel jobs of linking, compiling and compiling heavy modules if the generator is ninja,
+            other generators do not support job pools. A pool is not defined if its number of jobs is 0.
+        '''
+        is_ninja = self._get_used_generator() in ('Ninja', 'Ninja Multi-Config')
+        heavy_modules = sorted([ m.name for m in self._cmake_modules.values() if m.heavy_compile ])
+        if heavy_modules and (not is_ninja or GConfig.HEAVY_COMPILE_JOBS <= 0):
+            glog.warn('heavy_compile of modules {} is ignored, it needs ninja and --heavy_compile_jobs > 0'.format(
+                ','.join(heavy_modules)))
+        if not is_ninja:
+            return []
+        pools = []
+        content = []
+        if GConfig.LINK_JOBS > 0:
+            pools.append('{}={}'.format(LINK_POOL, GConfig.LINK_JOBS))
+            content.append('set(CMAKE_JOB_POOL_LINK {})'.format(LINK_POOL))
+        if GConfig.COMPILE_JOBS > 0:
+            pools.append('{}={}'.format(COMPILE_POOL, GConfig.COMPILE_JOBS))
+            content.append('set(CMAKE_JOB_POOL_COMPILE {})'.format(COMPILE_POOL))
+        if GConfig.HEAVY_COMPILE_JOBS > 0:
+            pools.append('{}={}'.format(HEAVY_COMPILE_POOL, GConfig.HEAVY_COMPILE_JOBS))
+        if not pools:
+            return []
+        content.insert(0, 'set_property(GLOBAL PROPERTY JOB_POOLS {})'.format(' '.join(pools)))
+        content.append('\n')
+        return content
+
     def _generate_compile_options(self):
         if not GConfig.COMPILE_OPTIONS is None and GConfig.COMPILE_OPTIONS != '':
             options_vec = GConfig.COMPILE_OPTIONS.split(',')
@@ -353,10 +745,30 @@ class CMakeGenerator:
         meta_info.append('\n')
         return meta_info
 
+    def _generate_module_includes(self):
+        includes = []
+        for module_name in self.cached_post_order:
+            includes.append('include(${{CMAKE_CURRENT_SOURCE_DIR}}/modules/{})'.format(self._get_module_file_name(module_name)))
+        includes.append('\n')
+        return includes
+
+    def _generate_stage_binaries(self):
+        ''' Stage binaries of third parties by a build step, it runs in every build, but only replaces stale files '''
+        if not GConfig.STAGE_AT_BUILD:
+            return []
+        plan_file = path.abspath(path.join(self._path_manager.cache_dir(), binary_stager.PLAN_FILE_NAME))
+        cmd = [ sys.executable.replace('\\', '/'), path.join(path.dirname(path.abspath(__file__)), 'main.py').replace('\\', '/') ]
+        cmd.append('--stage_binaries=' + plan_file.replace('\\', '/'))
+        cmd.append('--stage_mode=' + GConfig.STAGE_MODE)
+        cmd.append('--stage_check=' + GConfig.STAGE_CHECK)
+        return ['add_custom_target({} ALL COMMAND {})'.format(STAGE_BINARIES_TARGET, ' '.join(cmd)), '\n']
+
     def _generate_module(self, module):
         content = []
         for target_info in self._get_target_info(module):
             content.extend(self._generate_target_info(target_info))
+            for generated_file, lines in target_info.generated_files.items():
+                utils.write_text_if_changed('\n'.join(lines), path.join(self._path_manager.project_files_dir(), generated_file))
         return content
 
     def _get_target_info(self, module):
@@ -370,13 +782,32 @@ class CMakeGenerator:
         module_target.third_party_libs = module.third_party_libs
         module_target.libs = module.libs
         module_target.system_libs = module.system_libs
-        module_target.include_dirs = set(['${PROJECT_DIR}/' + include_dir.replace('\\', '/')    \
-                if not path.isabs(include_dir) else include_dir.replace('\\', '/') \
-                for include_dir in module.include_dirs])
+        module_target.include_dirs = self._get_cmake_include_dirs(module.include_dirs)
         module_target.include_dirs.add(path.join(CMAKE_SOURCES_DIR, module.name).replace('\\', '/'))
+        module_target.private_third_party_libs = module.private_third_party_libs
+        module_target.private_libs = module.private_libs
+        module_target.private_system_libs = module.private_system_libs
+        module_target.private_include_dirs = self._get_cmake_include_dirs(module.private_include_dirs) - module_target.include_dirs
         module_target.has_pre_build = module.has_pre_build
         module_target.has_post_build = module.has_post_build
+        module_target.unity_build = GConfig.UNITY and module.unity_build and not module.head_only
+        module_target.unity_batch_size = module.unity_batch_size if module.unity_batch_size else GConfig.UNITY_BATCH_SIZE
+        # main file defines main(), it can not be in the same batch with unit tests
+        module_target.unity_skip_files = [ path.join(module.name, f) for f in module.unity_exclude ]
+        if module.output == config.Output().BINARY and module.main_file:
+            module_target.unity_skip_files.append(path.join(module.name, module.main_file))
+        if GConfig.PCH and not module.head_only:
+            module_target.precompile_headers = self._get_precompile_headers(module)
+        if module.compiler_launcher is not None:
+            module_target.compiler_launcher = self._resolve_compiler_launcher(module.compiler_launcher)
+        module_target.heavy_compile = module.heavy_compile
 
+        is_binary_module = module.output == config.Output().BINARY
+        objects_target = None
+        if GConfig.ENABLE_UNITTEST and module.unittest_sources and is_binary_module:
+            objects_target = self._get_objects_target_info(module, module_target)
+            if objects_target:
+                target_infos.append(objects_target)
         target_infos.append(module_target)
 
         # deal with unit test
@@ -387,29 +818,57 @@ class CMakeGenerator:
                 ut_file_group = dict(module.file_group_infos)
                 for x in module.unittest_exclude_file_infos:
                     ut_file_group.pop(x)
-            is_binary_module = module.output == config.Output().BINARY
+            # precompiled headers are reused from the target which compiles the sources of module
+            pch_target = objects_target if objects_target else module_target
 
-            for ut_file in module.unittest_sources:
+            # ut name --> ut files linked into the ut binary
+            unittest_groups = { self._get_unittest_name(ut_file) : [ut_file] for ut_file in module.unittest_sources }
+            test_mains = self._get_test_mains(module, unittest_groups)
+            if test_mains:
+                single_test_files = [ x[0] for x in test_mains.values() ]
+                unittest_groups = { k : v for k, v in unittest_groups.items() if k not in test_mains }
+                unittest_groups[self._get_single_test_binary_name(module.name)] = \
+                    [ x for x in module.unittest_sources if x in single_test_files ]
+
+            for ut_name, ut_files in unittest_groups.items():
                 unittest_target = TargetInfo()
-                # get ut name
-                file_name = path.splitext(path.basename(ut_file))[0]
-                glog.check(file_name[-5:] == '_test')
-                ut_remove_test_path = path.join(path.dirname(ut_file), file_name[:-5])
-                ut_name = 'test_'+'_'.join(utils.split_path(ut_remove_test_path))
                 unittest_target.name = ut_name
                 unittest_target.output = CMakeTarget.EXECUTABLE
-                if is_binary_module:
+                if objects_target:
+                    unittest_target.object_libraries = [objects_target.name]
+                elif is_binary_module:
                     unittest_target.file_group_infos = dict(ut_file_group)
-                unittest_target.file_group_infos[ut_name] = [ut_file]
+                unittest_target.file_group_infos[ut_name] = list(ut_files)
                 unittest_target.sources_infos['ut_file'] = [ut_name]
-                unittest_target.include_dirs = module_target.include_dirs
-                unittest_target.libs = copy.deepcopy(module_target.libs)
-                unittest_target.system_libs = copy.deepcopy(module_target.system_libs)
+                # ut files are in module, they can use everything module uses, and nothing depends on them
+                self._set_private_link_of_module(unittest_target, module_target)
                 if not is_binary_module and not module.head_only:
-                    unittest_target.libs[CMakeConfig.GENERAL].add(module.name)
+                    unittest_target.private_libs[CMakeConfig.GENERAL].add(module.name)
+
+                unittest_target.module_name = module.name
+                unittest_target.is_unittest = True
+                unittest_target.test_timeout = module.unittest_timeout
+                if unittest_target.test_timeout is None and GConfig.TEST_TIMEOUT > 0:
+                    unittest_target.test_timeout = GConfig.TEST_TIMEOUT
+                is_single_test_binary = test_mains and ut_name == self._get_single_test_binary_name(module.name)
+                if not is_single_test_binary:
+                    unittest_target.test_cost = self._get_unittest_cost(module, ut_files[0])
+                unittest_target.unity_build = module_target.unity_build
+                unittest_target.unity_batch_size = module_target.unity_batch_size
+                unittest_target.unity_skip_files = module_target.unity_skip_files + ut_files
+                # shared library is compiled with different flags, such as -fPIC, its pch can not be reused
+                if pch_target.precompile_headers and pch_target.output != CMakeTarget.SHARED_LIBRARY:
+                    unittest_target.pch_reuse_from = pch_target.name
+                else:
+                    unittest_target.precompile_headers = pch_target.precompile_headers
+                unittest_target.compiler_launcher = module_target.compiler_launcher
+                unittest_target.heavy_compile = module_target.heavy_compile
+
+                if is_single_test_binary:
+                    self._set_single_test_binary(unittest_target, module, test_mains)
 
                 target_infos.append(unittest_target)
-                unittest_names[ut_name] = ut_file
+                unittest_names[ut_name] = ut_files[0] if len(ut_files) == 1 else ut_files
 
             custom_target = TargetInfo()
             custom_target.name = 'test_' + module.name
@@ -419,6 +878,177 @@ class CMakeGenerator:
             target_infos.append(custom_target)
         return target_infos
 
+    def _get_unittest_name(self, ut_file):
+        ''' Return target name of ut file, test_[module_name]_[relative path without _test] '''
+        file_name = path.splitext(path.basename(ut_file))[0]
+        glog.check(file_name[-5:] == '_test')
+        ut_remove_test_path = path.join(path.dirname(ut_file), file_name[:-5])
+        return 'test_'+'_'.join(utils.split_path(ut_remove_test_path))
+
+    def _get_unittest_cost(self, module, ut_file):
+        return module.unittest_costs.get(path.relpath(ut_file, module.name).replace('\\', '/'))
+
+    def _get_single_test_binary_name(self, module_name):
+        # test_[module_name] is the custom target running all unit tests of module
+        return 'test_{}_all'.format(module_name)
+
+    def _get_test_mains(self, module, unittest_groups):
+        ''' Return {ut name --> (ut file, if main has arguments)} of the unit tests linked into a single binary if
+            module enables it, otherwise None. The main function of each ut file is renamed and called by a generated
+            main. A renamed main does not return 0 implicitly, so ut files whose main does not end with a return
+            statement are left in their own binaries.
+        '''
+        single_test_binary = module.single_test_binary
+        if single_test_binary is None:
+            single_test_binary = GConfig.SINGLE_TEST_BINARY
+        if not single_test_binary:
+            return None
+        test_mains = {}
+        for ut_name, ut_files in unittest_groups.items():
+            try:
+                with open(path.join(self._path_manager.sources_dir(), ut_files[0]), 'r', errors='replace') as f:
+                    content = f.read()
+            except OSError:
+                content = ''
+            if not re.search(r'\bmain\s*\(', content):
+                glog.warn('Can not find main function in {}, unit tests of {} are not linked into a single binary'.format(
+                    ut_files[0], module.name))
+                return None
+            if not _main_ends_with_return(content):
+                glog.info('main function of {} does not end with a return statement, it is linked into its own binary'.format(
+                    ut_files[0]))
+                continue
+            test_mains[ut_name] = (ut_files[0], re.search(r'\bmain\s*\(\s*(void)?\s*\)', content) is None)
+        return test_mains if test_mains else None
+
+    def _set_single_test_binary(self, target_info, module, test_mains):
+        ''' Link ut files of module into target_info. The main function of each ut file is renamed by a compile
+            definition, and a generated main runs all of them, or the one selected by --test_filter=[ut name].
+        '''
+        main_file = path.join('unittests', target_info.name + '_main.cc').replace('\\', '/')
+        target_info.generated_files[main_file] = self._generate_test_main(test_mains)
+        for ut_name, (ut_file, _) in test_mains.items():
+            target_info.test_entries[ut_name] = ut_file
+            target_info.test_costs[ut_name] = self._get_unittest_cost(module, ut_file)
+        # the precompiled headers can not be used by ut files, which define main as a macro
+        target_info.precompile_headers = []
+        target_info.pch_reuse_from = ''
+
+    def _get_test_main_name(self, ut_name):
+        return 'quick_cmake_main_' + re.sub(r'\W', '_', ut_name)
+
+    def _generate_test_main(self, test_mains):
+        ''' Return lines of the main file which runs the renamed main functions of ut files '''
+        content = ['// Generated by quick cmake', '#include <cstdio>', '#include <cstring>', '']
+        for ut_name, (ut_file, has_args) in sorted(test_mains.items()):
+            main_name = self._get_test_main_name(ut_name)
+            linkage = 'extern "C" ' if path.splitext(ut_file)[1] == '.c' else ''
+            if has_args:
+                content.append('{}int {}(int argc, char** argv);'.format(linkage, main_name))
+                content.append('static int run_{0}(int argc, char** argv) {{ return {0}(argc, argv); }}'.format(main_name))
+            else:
+                content.append('{}int {}();'.format(linkage, main_name))
+                content.append('static int run_{0}(int, char**) {{ return {0}(); }}'.format(main_name))
+        content.append('')
+        content.append('struct QuickCMakeTest { const char* name; int (*run)(int, char**); };')
+        content.append('static QuickCMakeTest quick_cmake_tests[] = {')
+        for ut_name in sorted(test_mains.keys()):
+            content.append('  {{ "{}", run_{} }},'.format(ut_name, self._get_test_main_name(ut_name)))
+        content.append('};')
+        content.append('')
+        content.append('// Run all unit tests, or the one named by --test_filter=[ut name]. Other arguments are passed to the tests.')
+        content.append('int main(int argc, char** argv) {')
+        content.append('  const char* filter = nullptr;')
+        content.append('  int test_argc = 0;')
+        content.append('  for (int i = 0; i < argc; ++i) {')
+        content.append('    if (i > 0 && std::strncmp(argv[i], "--test_filter=", 14) == 0) {')
+        content.append('      filter = argv[i] + 14;')
+        content.append('    } else {')
+        content.append('      argv[test_argc++] = argv[i];')
+        content.append('    }')
+        content.append('  }')
+        content.append('  argv[test_argc] = nullptr;')
+        content.append('  int run = 0;')
+        content.append('  int failed = 0;')
+        content.append('  for (const QuickCMakeTest& test : quick_cmake_tests) {')
+        content.append('    if (filter != nullptr && std::strcmp(filter, test.name) != 0) {')
+        content.append('      continue;')
+        content.append('    }')
+        content.append('    std::printf("[RUN] %s\\n", test.name);')
+        content.append('    std::fflush(stdout);')
+        content.append('    int code = test.run(test_argc, argv);')
+        content.append('    std::printf("[%s] %s\\n", code == 0 ? "PASS" : "FAIL", test.name);')
+        content.append('    ++run;')
+        content.append('    failed += code == 0 ? 0 : 1;')
+        content.append('  }')
+        content.append('  if (run == 0) {')
+        content.append('    std::printf("No unit test matches %s\\n", filter);')
+        content.append('    return 1;')
+        content.append('  }')
+        content.append('  return failed;')
+        content.append('}')
+        content.append('')
+        return content
+
+    def _get_objects_target_info(self, module, module_target):
+        ''' Return the target info of the object library, which compiles the sources of binary module except the
+            main file once for the module target and its unit tests. Its file groups are moved out of module_target.
+            None if there is no source to compile.
+        '''
+        file_groups = { k : v for k, v in module.file_group_infos.items() if k not in module.unittest_exclude_file_infos }
+        if not any([ '*' + path.splitext(f)[1] in GConfig.SOURCE_FILE_FILTER for v in file_groups.values() for f in v ]):
+            return None
+        objects_target = TargetInfo()
+        objects_target.name = module.name + '_objects'
+        objects_target.output = CMakeTarget.OBJECT_LIBRARY
+        objects_target.file_group_infos = file_groups
+        objects_target.sources_infos = self._get_sources_infos_of_groups(module.sources_infos, file_groups)
+        # only the usage requirements of linked libs are used by object library, such as include dirs
+        self._set_private_link_of_module(objects_target, module_target)
+        objects_target.module_name = module.name
+        objects_target.unity_build = module_target.unity_build
+        objects_target.unity_batch_size = module_target.unity_batch_size
+        objects_target.unity_skip_files = module_target.unity_skip_files
+        objects_target.precompile_headers = module_target.precompile_headers
+        objects_target.compiler_launcher = module_target.compiler_launcher
+        objects_target.heavy_compile = module_target.heavy_compile
+
+        module_target.file_group_infos = { k : v for k, v in module.file_group_infos.items() if k not in file_groups }
+        module_target.sources_infos = self._get_sources_infos_of_groups(module.sources_infos, module_target.file_group_infos)
+        module_target.object_libraries = [objects_target.name]
+        if objects_target.precompile_headers:
+            module_target.precompile_headers = []
+            module_target.pch_reuse_from = objects_target.name
+        return objects_target
+
+    def _set_private_link_of_module(self, target_info, module_target):
+        ''' Set include dirs and libs of module_target as the private ones of target_info '''
+        target_info.private_include_dirs = module_target.include_dirs | module_target.private_include_dirs
+        for i in range(CMakeConfig.CONFIG_LEN):
+            target_info.private_libs[i] = module_target.libs[i] | module_target.private_libs[i]
+            target_info.private_third_party_libs[i] = module_target.third_party_libs[i] | module_target.private_third_party_libs[i]
+            target_info.private_system_libs[i] = module_target.system_libs[i] | module_target.private_system_libs[i]
+
+    def _get_cmake_include_dirs(self, include_dirs):
+        ''' Convert include dirs relative to the workspace to the paths of cmake '''
+        return set([ '${PROJECT_DIR}/' + include_dir.replace('\\', '/') if not path.isabs(include_dir) \
+                     else include_dir.replace('\\', '/') for include_dir in include_dirs ])
+
+    def _get_sources_infos_of_groups(self, sources_infos, file_group_infos):
+        ''' Return sources infos which only contain the file groups in file_group_infos '''
+        result = {}
+        for key, file_groups in sources_infos.items():
+            file_groups = [ x for x in file_groups if x in file_group_infos ]
+            if file_groups:
+                result[key] = file_groups
+        return result
+
+    def _get_precompile_headers(self, module):
+        ''' Return headers set by the build file of module, or the frequent headers '''
+        if module.precompile_headers is None:
+            return module.frequent_headers
+        return [ h if h.startswith('<') else '<{}>'.format(h) for h in module.precompile_headers ]
+
     def _generate_target_info(self, target_info):
         if target_info.output == CMakeTarget.UNITTEST_CUSTOM_TARGET:
             return self._generate_unittest_custom_target(target_info)
@@ -434,34 +1064,44 @@ class CMakeGenerator:
             content.append('source_group(\"{}\" FILES {})'.format(key, ' '.join(['${'+x+'}' for x in value])))
 
         # add target
-        sources_part = ' '.join([ '${{{}}} '.format(key) for key in target_info.file_group_infos.keys() ])
+        sources_part = ' '.join([ '${{{}}} '.format(key) for key in target_info.file_group_infos.keys() ]
+                                + [ '$<TARGET_OBJECTS:{}>'.format(x) for x in target_info.object_libraries ]
+                                + [ '${{CMAKE_CURRENT_SOURCE_DIR}}/{}'.format(x) for x in target_info.generated_files ])
         if target_info.output == CMakeTarget.EXECUTABLE:
             content.append('add_executable({} {})'.format(target_info.name, sources_part))
         elif target_info.output == CMakeTarget.STATIC_LIBRARY:
             content.append('add_library({} STATIC {})'.format(target_info.name, sources_part))
         elif target_info.output == CMakeTarget.SHARED_LIBRARY:
             content.append('add_library({} SHARED {})'.format(target_info.name, sources_part))
+        elif target_info.output == CMakeTarget.OBJECT_LIBRARY:
+            content.append('add_library({} OBJECT {})'.format(target_info.name, sources_part))
         else:
             glog.fatal('Unknown output type for module {} : {}', target_info.name, target_info.output)
 
-        # add target include dirs
+        # add target include dirs, public ones are propagated to the targets linking it by cmake
         target_include_part = []
-        if target_info.include_dirs:
+        if target_info.include_dirs or target_info.private_include_dirs:
             target_include_part.append('\n')
-            target_include_part.extend(['PUBLIC ' + include_dir for include_dir in target_info.include_dirs])
+            target_include_part.extend(['PUBLIC ' + include_dir for include_dir in utils.set_to_sorted_list(target_info.include_dirs)])
+            target_include_part.extend(['PRIVATE ' + include_dir for include_dir in utils.set_to_sorted_list(target_info.private_include_dirs)])
         content.append('target_include_directories({} {})'.format(target_info.name, ' '.join(target_include_part)))
 
-        # add target link libs
+        # add target link libs, cmake links the libs of linked targets too
         target_link_value_part = []
-        for i in reversed(range(CMakeConfig.CONFIG_LEN)):
-            link_part = ''
-            for lib_sets in [ target_info.libs, target_info.third_party_libs, target_info.system_libs]:
-                if not lib_sets[i]:
+        for scope, lib_sets_of_scope in [ ('PUBLIC', [ target_info.libs, target_info.third_party_libs, target_info.system_libs ]),
+                                          ('PRIVATE', [ target_info.private_libs, target_info.private_third_party_libs,
+                                                        target_info.private_system_libs ]) ]:
+            for i in reversed(range(CMakeConfig.CONFIG_LEN)):
+                link_part = ''
+                for lib_sets in lib_sets_of_scope:
+                    if not lib_sets[i]:
+                        continue
+                    # sort to keep the output stable between runs
+                    link_part += utils.containers_format(utils.set_to_sorted_list(lib_sets[i]),
+                                                         ' {} {} {{}}\n'.format(scope, CMakeConfig.LINK_LIB_MAP[i]))
+                if link_part == '':
                     continue
-                link_part += utils.containers_format(lib_sets[i], ' ' + CMakeConfig.LINK_LIB_MAP[i] + ' {}\n')
-            if link_part == '':
-                continue
-            target_link_value_part.append(link_part)
+                target_link_value_part.append(link_part)
         if target_link_value_part:
             content.append('target_link_libraries({} {})'.format(target_info.name, ''.join(target_link_value_part)))
 
@@ -475,18 +1115,68 @@ class CMakeGenerator:
             content.append('add_custom_command(TARGET {} POST_BUILD COMMAND {})'.format(target_info.name, post_build_cmd))
         
         content.append('set_target_properties({} PROPERTIES LINKER_LANGUAGE CXX)'.format(target_info.name))
+        for ut_name, ut_file in sorted(target_info.test_entries.items()):
+            content.append('set_source_files_properties({} PROPERTIES COMPILE_DEFINITIONS main={})'.format(
+                path.join(CMAKE_SOURCES_DIR, ut_file).replace('\\', '/'), self._get_test_main_name(ut_name)))
+        if target_info.compiler_launcher is not None and target_info.compiler_launcher != self._compiler_launcher:
+            content.append('set_target_properties({0} PROPERTIES C_COMPILER_LAUNCHER "{1}" CXX_COMPILER_LAUNCHER "{1}")'.format(
+                target_info.name, target_info.compiler_launcher))
+        if target_info.heavy_compile and GConfig.HEAVY_COMPILE_JOBS > 0:
+            content.append('set_target_properties({} PROPERTIES JOB_POOL_COMPILE {})'.format(target_info.name, HEAVY_COMPILE_POOL))
+        if target_info.unity_build:
+            content.extend(self._generate_unity_build(target_info))
+        if target_info.pch_reuse_from:
+            content.append('target_precompile_headers({} REUSE_FROM {})'.format(target_info.name, target_info.pch_reuse_from))
+        elif target_info.precompile_headers:
+            content.append('target_precompile_headers({} PRIVATE {})'.format(
+                target_info.name, ' '.join([ '"{}"'.format(h) for h in target_info.precompile_headers ])))
+        if GConfig.CTEST and target_info.is_unittest:
+            content.extend(self._generate_test(target_info))
         content.append('\n')
         return content
 
+    def _generate_unity_build(self, target_info):
+        ''' Compile sources of target in unity batches by cmake, except the files to skip '''
+        content = ['set_target_properties({} PROPERTIES UNITY_BUILD ON UNITY_BUILD_BATCH_SIZE {})'.format(
+            target_info.name, target_info.unity_batch_size)]
+        if target_info.unity_skip_files:
+            skip_files = [ path.join(CMAKE_SOURCES_DIR, f).replace('\\', '/') for f in target_info.unity_skip_files ]
+            content.append('set_source_files_properties({} PROPERTIES SKIP_UNITY_BUILD_INCLUSION ON)'.format(
+                ' '.join(skip_files)))
+        return content
+
+    def _generate_test(self, target_info):
+        ''' Register unit test target to ctest, labeled with its module. Each ut file of a single test binary is
+            registered as a test, which runs the binary with --test_filter.
+        '''
+        tests = { target_info.name : ('', target_info.test_cost) }
+        if target_info.test_entries:
+            tests = { x : (' --test_filter=' + x, target_info.test_costs.get(x)) for x in target_info.test_entries }
+        content = []
+        for name, (args, cost) in sorted(tests.items()):
+            content.append('add_test(NAME {} COMMAND {}{})'.format(name, target_info.name, args))
+            properties = ['LABELS {}'.format(target_info.module_name)]
+            if target_info.test_timeout is not None:
+                properties.append('TIMEOUT {}'.format(target_info.test_timeout))
+            if cost is not None:
+                properties.append('COST {}'.format(cost))
+            content.append('set_tests_properties({} PROPERTIES {})'.format(name, ' '.join(properties)))
+        return content
+
     def _generate_unittest_custom_target(self, target_info):
         content = []
         content.append('# run all unittest under folder {}'.format(target_info.module_name))
-        cmd = []
-        for ut_target_name in sorted(target_info.unittest_targets.keys()):
-            source = target_info.unittest_targets[ut_target_name]
-            cmd.append('COMMAND echo run unittest files {}'.format(os.path.join(target_info.name, source).replace('\\', '/')))
-            cmd.append('COMMAND $<TARGET_FILE:{}>\n'.format(ut_target_name))
-        content.append('add_custom_target({} DEPENDS {} {})'.format(target_info.name, ' '.join(sorted(target_info.unittest_targets.keys())), ' '.join(cmd)))
+        ut_target_names = sorted(target_info.unittest_targets.keys())
+        # unittests may load the binaries of third parties
+        depends = ut_target_names + [STAGE_BINARIES_TARGET] if GConfig.STAGE_AT_BUILD else ut_target_names
+        # run by the test runner of quick cmake, so the unittests run concurrently
+        cmd = [ sys.executable.replace('\\', '/'), path.join(path.dirname(path.abspath(__file__)), 'main.py').replace('\\', '/') ]
+        cmd.append('--unittests=' + ','.join([ '$<TARGET_FILE:{}>'.format(x) for x in ut_target_names ]))
+        cmd.append('--test_jobs={}'.format(GConfig.TEST_JOBS))
+        if GConfig.TEST_TIMEOUT > 0:
+            cmd.append('--test_timeout={}'.format(GConfig.TEST_TIMEOUT))
+        cmd.append('--junit_xml=${{CMAKE_BINARY_DIR}}/unittest_results/{}.xml'.format(target_info.name))
+        content.append('add_custom_target({} DEPENDS {} COMMAND {})'.format(target_info.name, ' '.join(depends), ' '.join(cmd)))
         content.append('\n')
         return content
  
@@ -547,9 +1237,21 @@ class CMakeGenerator:
         glog.check(len(platforms) == 1, 'Platform should has one and only one value!{}'.format(str(platforms)))
         return CMakeConfig.PLATFORM_MAP[platforms.pop()]
 
-    def _get_module_include_dirs(self, module, third_parties):
+    def _get_module_include_dirs(self, module_name, module_include_dirs, third_party_names):
+        ''' Return include dirs relative to the workspace, or absolute ones.
+        Args:
+            module_include_dirs: include dirs of module, relative to the module dir
+            third_party_names: the include dirs of these third parties are added too
+        '''
         include_dirs = set()
-        for name in module.third_parties:
+        for include_dir in module_include_dirs:
+            if not path.isabs(include_dir):
+                include_dirs.add(path.relpath(path.join(self._path_manager.sources_dir(), module_name, include_dir),
+                                 self._path_manager.workspace()))
+            else:
+                include_dirs.add(include_dir)
+        third_parties = self._cmake_third_parties
+        for name in third_party_names:
             glog.check(name in third_parties, '{} in not in third parties {}'.format(name, str(third_parties.keys())))
             third_party = third_parties[name]
             glog.check_eq(name, third_party.name)
@@ -567,38 +1269,20 @@ class CMakeGenerator:
             # merge dependencies
             for name, m in self._build_models.modules()[i].items():
                 module_to_dep.setdefault(name, set()).update(m.dependencies)
+        return graph_utils.post_order(module_to_dep)
 
-        for key, value in module_to_dep.items():
-            module_to_dep[key] = utils.set_to_sorted_list(value)
-
-        result = []
-        for name, deps in module_to_dep.items():
-            if name in result:
-                continue
-            if not deps:
-                result.append(name)
-                continue
-            cur = name
-            stack = []
-            while cur or stack:
-                if module_to_dep[cur] and cur not in result:
-                    stack.append(cur)
-                    cur = module_to_dep[cur][0]
-                else:
-                    if cur not in result:
-                        result.append(cur)
-                    while stack:
-                        parent = stack[-1]
-                        index = module_to_dep[parent].index(cur)
-                        if index+1 < len(module_to_dep[parent]):
-                            cur = module_to_dep[parent][index+1]
-                            break
-                        else:
-                            # cur is None, can not find neighbor
-                            cur = stack.pop()
-                            if cur not in result:
-                                result.append(cur)
-                    if not stack:
-                        break
-        return result
-
+def _main_ends_with_return(content):
+    ''' Return if the body of the main function in content ends with a return statement '''
+    content = re.sub(r'//[^\n]*|/\*.*?\*/', ' ', content, flags=re.S)
+    match = re.search(r'\bmain\s*\([^)]*\)\s*\{', content)
+    if not match:
+        return False
+    depth = 1
+    for i in range(match.end(), len(content)):
+        if content[i] == '{':
+            depth += 1
+        elif content[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return re.search(r'\breturn\b[^;{}]*;\s*$', content[match.end():i]) is not None
+    return False
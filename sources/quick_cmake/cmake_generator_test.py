@@ -1,9 +1,13 @@
 
 import copy
+import os
 from os import path
+import tempfile
 import unittest
+from unittest import mock
 import sys
 
+import binary_stager
 import build_model
 from build_model import BuildModel
 from config import Config
@@ -11,7 +15,9 @@ import cmake_generator
 from cmake_generator import CMakeGenerator
 from cmake_generator import CMakeConfig
 from cmake_generator import CMakeTarget
+from gconfig import GConfig
 from path_manager import PathManager
+import utils
 
 class TestCMakeGenerator(unittest.TestCase):
     def __init__(self, *args, **kwargs):
@@ -53,42 +59,34 @@ class TestCMakeGenerator(unittest.TestCase):
 
         default_include = path.join('third_parties', 'default_party', 'include')
         default_only_include = path.join('third_parties', 'default_party_only_include', 'include')
-        expected_include_dirs = {'A': {default_include, default_only_include},
-                                 'B': {default_include},
-                                 'C': {default_include, default_only_include},
+        # only direct dependencies are linked, head only C is not linked, its dependencies are linked instead
+        expected_include_dirs = {'A': {default_only_include},
+                                 'B': set(),
+                                 'C': {default_only_include},
                                  'D': {default_include},
                                  'only_Release_X64' : set(),
                                  'only_Linux_Debug' : set()}
         default_lib = '/'.join(['${PROJECT_DIR}', 'third_parties', 'default_party', 'lib', 'mock.lib'])
-        expected_libs = {'A':{'B', 'D', default_lib},
-                         'B':{'D', default_lib},
-                         'C':{'D', default_lib},
-                         'D':{default_lib},
+        expected_libs = {'A':{'B', 'D'},
+                         'B':{'D'},
+                         'C':{'D'},
+                         'D':set(),
                          'only_Release_X64' : set(),
                          'only_Linux_Debug' : set()}
+        expected_third_party_libs = {'D':{default_lib}}
 
         for cmake_module in cmake_generator_._cmake_modules.values():
             self.assertSetEqual(expected_include_dirs[cmake_module.name], cmake_module.include_dirs)
-            if cmake_module.name == 'A':
-                is_test_debug = False
-                is_test_release = False
-                if self._configs[0].system == Config().System.LINUX:
-                    tmp_expected_lib = copy.deepcopy(expected_libs)
-                    tmp_expected_lib['A'].add('only_Linux_Debug')
-                    self.assertSetEqual(tmp_expected_lib[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.DEBUG])
-                    is_test_debug = True
-                if self._configs[0].platform == Config().Platform.X64:
-                    tmp_expected_lib = copy.deepcopy(expected_libs)
-                    tmp_expected_lib['A'].add('only_Release_X64')
-                    self.assertSetEqual(tmp_expected_lib[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.RELEASE])
-                    is_test_release = True
-                if not is_test_debug:
-                    self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.DEBUG])
-                if not is_test_release:
-                    self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.RELEASE])
-            else:
-                self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.RELEASE])
-                self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.DEBUG])
+            self.assertSetEqual(set(), cmake_module.private_include_dirs)
+            for i in [CMakeConfig.DEBUG, CMakeConfig.RELEASE]:
+                expected = set(expected_libs[cmake_module.name])
+                if cmake_module.name == 'A' and i == CMakeConfig.DEBUG and self._configs[0].system == Config().System.LINUX:
+                    expected.add('only_Linux_Debug')
+                if cmake_module.name == 'A' and i == CMakeConfig.RELEASE and self._configs[1].platform == Config().Platform.X64:
+                    expected.add('only_Release_X64')
+                self.assertSetEqual(expected, cmake_module.libs[i])
+                self.assertSetEqual(expected_third_party_libs.get(cmake_module.name, set()), cmake_module.third_party_libs[i])
+                self.assertSetEqual(set(), cmake_module.private_libs[i])
         self.assertTrue(cmake_generator_._cmake_modules['A'].has_pre_build)
         self.assertFalse(cmake_generator_._cmake_modules['A'].has_post_build)
 
@@ -102,26 +100,49 @@ class TestCMakeGenerator(unittest.TestCase):
 
         # Test whether the common lib is extracted to general
         default_lib = '/'.join(['${PROJECT_DIR}', 'third_parties', 'default_party', 'lib', 'mock.lib'])
-        expected_libs = {'A':{'B', 'D', default_lib},
-                         'B':{'D', default_lib},
-                         'C':{'D', default_lib},
-                         'D':{default_lib},
+        expected_libs = {'A':{'B', 'D'},
+                         'B':{'D'},
+                         'C':{'D'},
+                         'D':set(),
                          'only_Release_X64' : set(),
                          'only_Linux_Debug' : set()}
 
         for cmake_module in cmake_generator_._cmake_modules.values():
-            if cmake_module.name == 'A':
-                self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.GENERAL])
-                if self._configs[0].system == Config().System.LINUX:
-                    self.assertSetEqual({'only_Linux_Debug'}, cmake_module.libs[cmake_generator.CMakeConfig.DEBUG])
-                if self._configs[0].platform == Config().Platform.X64:
-                    self.assertSetEqual({'only_Release_X64'}, cmake_module.libs[cmake_generator.CMakeConfig.RELEASE])
-                else:
-                    self.assertSetEqual({}, cmake_module.libs[cmake_generator.CMakeConfig.RELEASE])
-            else:
-                self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[cmake_generator.CMakeConfig.GENERAL])
-                self.assertSetEqual(set(), cmake_module.libs[cmake_generator.CMakeConfig.DEBUG])
-                self.assertSetEqual(set(), cmake_module.libs[cmake_generator.CMakeConfig.RELEASE])
+            self.assertSetEqual(expected_libs[cmake_module.name], cmake_module.libs[CMakeConfig.GENERAL])
+            expected_debug_libs = set()
+            expected_release_libs = set()
+            if cmake_module.name == 'A' and self._configs[0].system == Config().System.LINUX:
+                expected_debug_libs.add('only_Linux_Debug')
+            if cmake_module.name == 'A' and self._configs[1].platform == Config().Platform.X64:
+                expected_release_libs.add('only_Release_X64')
+            self.assertSetEqual(expected_debug_libs, cmake_module.libs[CMakeConfig.DEBUG])
+            self.assertSetEqual(expected_release_libs, cmake_module.libs[CMakeConfig.RELEASE])
+        self.assertSetEqual({default_lib}, cmake_generator_._cmake_modules['D'].third_party_libs[CMakeConfig.GENERAL])
+        self.assertSetEqual(set(), cmake_generator_._cmake_modules['D'].third_party_libs[CMakeConfig.DEBUG])
+
+    def test_private_dependencies(self):
+        for modules in self._build_model.modules():
+            modules['B'].private_dependencies = {'D'}
+            modules['B'].private_third_parties = {'third_party1'}
+            modules['A'].private_include_dirs = ['folder']
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        module = cmake_generator_._cmake_modules['B']
+        self.assertSetEqual(set(), module.libs[CMakeConfig.GENERAL])
+        self.assertSetEqual({'D'}, module.private_libs[CMakeConfig.GENERAL])
+
+        content = cmake_generator_._generate_target_info(cmake_generator_._get_target_info(module)[0])
+        self.assertIn('target_link_libraries(B  PRIVATE general D\n)', content)
+        self.assertIn('target_include_directories(B \n PUBLIC ${SOURCE_DIR}/B)', content)
+
+        target_infos = cmake_generator_._get_target_info(cmake_generator_._cmake_modules['A'])
+        self.assertSetEqual({'${PROJECT_DIR}/sources/A/folder'}, target_infos[1].private_include_dirs)
+        objects_content = cmake_generator_._generate_target_info(target_infos[0])
+        self.assertIn('target_include_directories(A_objects \n PRIVATE ${PROJECT_DIR}/sources/A/folder '
+                      'PRIVATE ${PROJECT_DIR}/third_parties/default_party_only_include/include PRIVATE ${SOURCE_DIR}/A)',
+                      objects_content)
+        unittest_content = cmake_generator_._generate_target_info(target_infos[2])
+        self.assertIn(' PRIVATE general B\n PRIVATE general D\n PRIVATE general test\n)', '\n'.join(unittest_content))
 
     def test_get_post_order(self):
         cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
@@ -158,27 +179,297 @@ class TestCMakeGenerator(unittest.TestCase):
         cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
         cmake_generator_._parse_cmake_info()
         target_infos = cmake_generator_._get_target_info(cmake_generator_._cmake_modules['A'])
-        self.assertEqual(3, len(target_infos))
-        self.assertEqual('A', target_infos[0].name)
-        self.assertEqual(CMakeTarget.EXECUTABLE, target_infos[0].output)
-        self.assertEqual('test_A_some', target_infos[1].name)
+        self.assertEqual(4, len(target_infos))
+        self.assertEqual('A_objects', target_infos[0].name)
+        self.assertEqual(CMakeTarget.OBJECT_LIBRARY, target_infos[0].output)
+        self.assertEqual('A', target_infos[1].name)
         self.assertEqual(CMakeTarget.EXECUTABLE, target_infos[1].output)
-        self.assertEqual('test_A', target_infos[2].name)
-        self.assertEqual(CMakeTarget.UNITTEST_CUSTOM_TARGET, target_infos[2].output)
-        self.assertDictEqual({'test_A_some': path.join('A', 'some_test.cpp')}, target_infos[2].unittest_targets)
-        self.assertSetEqual({'test'} , target_infos[0].system_libs[CMakeConfig.GENERAL])
+        self.assertEqual('test_A_some', target_infos[2].name)
+        self.assertEqual(CMakeTarget.EXECUTABLE, target_infos[2].output)
+        self.assertEqual('test_A', target_infos[3].name)
+        self.assertEqual(CMakeTarget.UNITTEST_CUSTOM_TARGET, target_infos[3].output)
+        self.assertDictEqual({'test_A_some': path.join('A', 'some_test.cpp')}, target_infos[3].unittest_targets)
+        self.assertSetEqual({'test'} , target_infos[1].system_libs[CMakeConfig.GENERAL])
 
-        # test file_group_infos
+        # test file_group_infos, the sources of binary module are compiled once by the object library
         expected_dict = {'A' : [path.join('A','test.h'), path.join('A','test.cpp')],
                          'A_folder' : [path.join('A', 'folder', 'test.h'), path.join('A', 'folder', 'test.cc')]}
         self.assertListEqual(expected_dict['A'], target_infos[0].file_group_infos['A'])
         self.assertListEqual(expected_dict['A_folder'], target_infos[0].file_group_infos['A_folder'])
+        self.assertNotIn('A', target_infos[1].file_group_infos)
+        self.assertListEqual(['A_objects'], target_infos[1].object_libraries)
+        self.assertListEqual(['test_A_some'], list(target_infos[2].file_group_infos.keys()))
+        self.assertListEqual(['A_objects'], target_infos[2].object_libraries)
 
         # test sources_infos
         expected_sources_infos_dict = { 'sources' : ['A'],
                                         'sources\\\\folder': ['A_folder']}
         self.assertListEqual(expected_sources_infos_dict['sources'], target_infos[0].sources_infos['sources'])
-        self.assertListEqual(expected_sources_infos_dict['sources\\\\folder'], target_infos[0].sources_infos['sources\\\\folder'])                            
+        self.assertListEqual(expected_sources_infos_dict['sources\\\\folder'], target_infos[0].sources_infos['sources\\\\folder'])
+        self.assertNotIn('sources\\\\folder', target_infos[1].sources_infos)
+
+        content = cmake_generator_._generate_target_info(target_infos[0])
+        self.assertIn('add_library(A_objects OBJECT ${A}  ${A_folder} )', content)
+        content = cmake_generator_._generate_target_info(target_infos[2])
+        self.assertIn('add_executable(test_A_some ${test_A_some}  $<TARGET_OBJECTS:A_objects>)', content)
+
+    def test_third_party_binaries(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        # binaries are found by the workspace, wherever the current dir is
+        mock_dll = path.join(self._path_manager.third_parties_dir(), 'default_party', 'bin', 'mock.dll')
+        dir_files = cmake_generator_._get_third_party_binaries()
+        debug_dir = path.join(self._path_manager.binary_dirs(), 'Debug')
+        self.assertSetEqual({path.abspath(mock_dll)}, set([ path.abspath(f) for f in dir_files[debug_dir] ]))
+
+        # the plan is written even if binaries are staged when generating, runs which skip generation stage it again
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with mock.patch.object(self._path_manager, 'cache_dir', return_value=temp_dir), \
+                 mock.patch.object(binary_stager, 'stage_plan') as stage_plan:
+                cmake_generator_._stage_third_party_binaries()
+            plan_file = path.join(temp_dir, binary_stager.PLAN_FILE_NAME)
+            stage_plan.assert_called_once_with(plan_file, GConfig.STAGE_MODE, GConfig.STAGE_CHECK)
+            self.assertDictEqual({ path.abspath(k) : sorted([ path.abspath(f) for f in v ]) for k, v in dir_files.items() },
+                                 binary_stager.read_plan(plan_file))
+
+        stage_at_build = GConfig.STAGE_AT_BUILD
+        GConfig.STAGE_AT_BUILD = True
+        try:
+            content = cmake_generator_._generate_stage_binaries()
+            target_infos = cmake_generator_._get_target_info(cmake_generator_._cmake_modules['A'])
+            custom_content = cmake_generator_._generate_target_info(target_infos[3])
+        finally:
+            GConfig.STAGE_AT_BUILD = stage_at_build
+        self.assertTrue(content[0].startswith('add_custom_target(stage_third_party_binaries ALL COMMAND '))
+        self.assertIn('--stage_binaries=', content[0])
+        self.assertIn('DEPENDS test_A_some stage_third_party_binaries COMMAND', custom_content[1])
+        self.assertListEqual([], cmake_generator_._generate_stage_binaries())
+
+    def test_generate_test(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        module = cmake_generator_._cmake_modules['A']
+        module.unittest_timeout = 10
+        module.unittest_costs = {'some_test.cpp' : 5}
+        target_infos = cmake_generator_._get_target_info(module)
+        self.assertTrue(target_infos[2].is_unittest)
+        self.assertEqual('A', target_infos[2].module_name)
+        self.assertEqual(10, target_infos[2].test_timeout)
+        self.assertEqual(5, target_infos[2].test_cost)
+
+        ctest = GConfig.CTEST
+        GConfig.CTEST = True
+        try:
+            content = cmake_generator_._generate_target_info(target_infos[2])
+            module_content = cmake_generator_._generate_target_info(target_infos[1])
+        finally:
+            GConfig.CTEST = ctest
+        self.assertIn('add_test(NAME test_A_some COMMAND test_A_some)', content)
+        self.assertIn('set_tests_properties(test_A_some PROPERTIES LABELS A TIMEOUT 10 COST 5)', content)
+        self.assertFalse([ x for x in module_content if x.startswith('add_test') ])
+
+    def test_generate_unity_build(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        module = cmake_generator_._cmake_modules['A']
+        module.unity_exclude = ['test.cpp']
+        module.unity_batch_size = 4
+
+        unity = GConfig.UNITY
+        GConfig.UNITY = True
+        try:
+            target_infos = cmake_generator_._get_target_info(module)
+            content = cmake_generator_._generate_target_info(target_infos[2])
+            # the version is not raised by Ninja Multi-Config, wherever ninja is installed
+            with mock.patch.object(cmake_generator_, '_get_used_generator', return_value=''):
+                header = cmake_generator_._generate_header()
+            module.unity_build = False
+            disabled_target_infos = cmake_generator_._get_target_info(module)
+        finally:
+            GConfig.UNITY = unity
+        self.assertTrue(target_infos[1].unity_build)
+        self.assertIn(path.join('A', 'test.cpp'), target_infos[1].unity_skip_files)
+        self.assertIn('set_target_properties(test_A_some PROPERTIES UNITY_BUILD ON UNITY_BUILD_BATCH_SIZE 4)', content)
+        self.assertIn('set_source_files_properties(${SOURCE_DIR}/A/test.cpp ${SOURCE_DIR}/A/some_test.cpp '
+                      'PROPERTIES SKIP_UNITY_BUILD_INCLUSION ON)', content)
+        self.assertIn('cmake_minimum_required(VERSION 3.16)', header)
+        self.assertFalse(disabled_target_infos[1].unity_build)
+
+    def test_generate_precompile_headers(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        module = cmake_generator_._cmake_modules['A']
+        module.frequent_headers = ['<A/test.h>']
+
+        pch = GConfig.PCH
+        GConfig.PCH = True
+        try:
+            target_infos = cmake_generator_._get_target_info(module)
+            objects_content = cmake_generator_._generate_target_info(target_infos[0])
+            module_content = cmake_generator_._generate_target_info(target_infos[1])
+            unittest_content = cmake_generator_._generate_target_info(target_infos[2])
+            module.precompile_headers = ['vector', '<map>']
+            override_target_infos = cmake_generator_._get_target_info(module)
+            module.precompile_headers = []
+            disabled_target_infos = cmake_generator_._get_target_info(module)
+        finally:
+            GConfig.PCH = pch
+        self.assertIn('target_precompile_headers(A_objects PRIVATE "<A/test.h>")', objects_content)
+        self.assertIn('target_precompile_headers(A REUSE_FROM A_objects)', module_content)
+        self.assertIn('target_precompile_headers(test_A_some REUSE_FROM A_objects)', unittest_content)
+        self.assertListEqual(['<vector>', '<map>'], override_target_infos[0].precompile_headers)
+        self.assertListEqual([], disabled_target_infos[0].precompile_headers)
+        self.assertEqual('', disabled_target_infos[2].pch_reuse_from)
+
+    @unittest.skipIf(os.name == 'nt', 'launcher is a shell script')
+    def test_compiler_launcher(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            launcher = path.join(temp_dir, 'launcher').replace('\\', '/')
+            utils.write_text('#!/bin/sh\nexec "$@"\n', launcher)
+            os.chmod(launcher, 0o755)
+            compiler_launcher = GConfig.COMPILER_LAUNCHER
+            GConfig.COMPILER_LAUNCHER = launcher
+            try:
+                cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+            finally:
+                GConfig.COMPILER_LAUNCHER = compiler_launcher
+            self.assertEqual('', cmake_generator_._resolve_compiler_launcher('none'))
+            with self.assertRaises(AssertionError):
+                cmake_generator_._resolve_compiler_launcher(path.join(temp_dir, 'not_exists'))
+
+            # the version is not raised by Ninja Multi-Config, wherever ninja is installed
+            with mock.patch.object(cmake_generator_, '_get_used_generator', return_value=''):
+                header = cmake_generator_._generate_header()
+            self.assertIn('set(CMAKE_CXX_COMPILER_LAUNCHER "{}")'.format(launcher), header)
+            self.assertIn('cmake_minimum_required(VERSION 3.4)', header)
+
+            cmake_generator_._parse_cmake_info()
+            module = cmake_generator_._cmake_modules['A']
+            content = cmake_generator_._generate_target_info(cmake_generator_._get_target_info(module)[1])
+            self.assertFalse([ x for x in content if 'COMPILER_LAUNCHER' in x ])
+            module.compiler_launcher = 'none'
+            target_infos = cmake_generator_._get_target_info(module)
+            content = cmake_generator_._generate_target_info(target_infos[2])
+            self.assertIn('set_target_properties(test_A_some PROPERTIES C_COMPILER_LAUNCHER "" CXX_COMPILER_LAUNCHER "")', content)
+
+    def test_generate_job_pools(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        module = cmake_generator_._cmake_modules['A']
+        module.heavy_compile = True
+        target_infos = cmake_generator_._get_target_info(module)
+        # a small link pool is defined by default for ninja
+        with mock.patch.object(cmake_generator_, '_get_used_generator', return_value='Ninja Multi-Config'):
+            content = cmake_generator_._generate_job_pools()
+        target_contents = [ cmake_generator_._generate_target_info(x) for x in target_infos[:3] ]
+        self.assertIn('set_property(GLOBAL PROPERTY JOB_POOLS link_pool=2 heavy_compile_pool=2)', content)
+        self.assertIn('set(CMAKE_JOB_POOL_LINK link_pool)', content)
+        self.assertFalse([ x for x in content if 'CMAKE_JOB_POOL_COMPILE' in x ])
+        for target_info, target_content in zip(target_infos[:3], target_contents):
+            self.assertIn('set_target_properties({} PROPERTIES JOB_POOL_COMPILE heavy_compile_pool)'.format(
+                target_info.name), target_content)
+
+        # other generators do not support job pools, heavy_compile is ignored with a warning
+        with mock.patch.object(cmake_generator_, '_get_used_generator', return_value='Unix Makefiles'), \
+             mock.patch('glog.warn') as warn:
+            self.assertListEqual([], cmake_generator_._generate_job_pools())
+        self.assertIn('heavy_compile of modules A is ignored', warn.call_args[0][0])
+
+        link_jobs, heavy_compile_jobs = GConfig.LINK_JOBS, GConfig.HEAVY_COMPILE_JOBS
+        GConfig.LINK_JOBS, GConfig.HEAVY_COMPILE_JOBS = 0, 0
+        try:
+            with mock.patch.object(cmake_generator_, '_get_used_generator', return_value='Ninja'), \
+                 mock.patch('glog.warn') as warn:
+                self.assertListEqual([], cmake_generator_._generate_job_pools())
+            target_content = cmake_generator_._generate_target_info(target_infos[1])
+        finally:
+            GConfig.LINK_JOBS, GConfig.HEAVY_COMPILE_JOBS = link_jobs, heavy_compile_jobs
+        self.assertTrue(warn.called)
+        self.assertFalse([ x for x in target_content if 'JOB_POOL' in x ])
+
+    def test_get_generator(self):
+        generator = GConfig.GENERATOR
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                path_manager = PathManager(path.join(path.dirname(__file__), 'test'))
+                cmake_generator_ = CMakeGenerator(self._configs, self._build_model, path_manager)
+                output_dir = GConfig.OUTPUT_DIR
+                GConfig.OUTPUT_DIR = temp_dir
+                try:
+                    GConfig.GENERATOR = 'Unix Makefiles'
+                    self.assertEqual('Unix Makefiles', cmake_generator_._get_generator())
+                    utils.write_text('CMAKE_GENERATOR:INTERNAL=Ninja\n', path.join(temp_dir, 'CMakeCache.txt'))
+                    self.assertEqual('Ninja', cmake_generator_._get_cached_generator())
+                    # generator of the existing build dir is kept
+                    self.assertEqual('', cmake_generator_._get_generator())
+                    GConfig.GENERATOR = 'Ninja'
+                    self.assertEqual('Ninja', cmake_generator_._get_generator())
+                    self.assertNotEqual('3.17', cmake_generator_._get_cmake_minimum_version())
+                    # Ninja Multi-Config needs cmake 3.17
+                    utils.write_text('CMAKE_GENERATOR:INTERNAL=Ninja Multi-Config\n', path.join(temp_dir, 'CMakeCache.txt'))
+                    self.assertEqual('3.17', cmake_generator_._get_cmake_minimum_version())
+                    os.remove(path.join(temp_dir, 'CMakeCache.txt'))
+                    GConfig.GENERATOR = 'auto'
+                    with mock.patch('shutil.which', return_value='/usr/bin/ninja'):
+                        self.assertEqual('Ninja Multi-Config', cmake_generator_._get_generator())
+                        self.assertEqual('3.17', cmake_generator_._get_cmake_minimum_version())
+                finally:
+                    GConfig.OUTPUT_DIR = output_dir
+        finally:
+            GConfig.GENERATOR = generator
+
+    def test_single_test_binary(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        cmake_generator_._parse_cmake_info()
+        module = cmake_generator_._cmake_modules['A']
+        module.unittest_sources = [path.join('A', 'some_test.cpp'), path.join('A', 'folder', 'other_test.c')]
+        module.unittest_costs = {'some_test.cpp' : 5}
+        module.single_test_binary = True
+        with tempfile.TemporaryDirectory() as temp_dir:
+            utils.write_text('int main() { return 0; }\n', path.join(temp_dir, 'A', 'some_test.cpp'))
+            utils.write_text('int main(int argc, char** argv) { return 0; }\n', path.join(temp_dir, 'A', 'folder', 'other_test.c'))
+            with mock.patch.object(self._path_manager, 'sources_dir', return_value=temp_dir):
+                target_infos = cmake_generator_._get_target_info(module)
+                ctest = GConfig.CTEST
+                GConfig.CTEST = True
+                try:
+                    content = cmake_generator_._generate_target_info(target_infos[2])
+                finally:
+                    GConfig.CTEST = ctest
+
+            # main without return does not return 0 once it is renamed, its ut file is linked into its own binary
+            utils.write_text('int main() {\n  if (true) { return 1; }\n  // return 0;\n}\n',
+                             path.join(temp_dir, 'A', 'some_test.cpp'))
+            with mock.patch.object(self._path_manager, 'sources_dir', return_value=temp_dir):
+                separated_infos = cmake_generator_._get_target_info(module)
+            self.assertListEqual(['test_A_all', 'test_A_some'], sorted(x.name for x in separated_infos[2:4]))
+            single_target = [ x for x in separated_infos if x.name == 'test_A_all' ][0]
+            self.assertListEqual([path.join('A', 'folder', 'other_test.c')], single_target.file_group_infos['test_A_all'])
+            self.assertListEqual(['test_A_folder_other'], list(single_target.test_entries))
+            self.assertDictEqual({'test_A_some' : path.join('A', 'some_test.cpp'),
+                                  'test_A_all' : path.join('A', 'folder', 'other_test.c')},
+                                 separated_infos[-1].unittest_targets)
+
+            # main function is not found, ut files are linked one by one
+            utils.write_text('', path.join(temp_dir, 'A', 'folder', 'other_test.c'))
+            with mock.patch.object(self._path_manager, 'sources_dir', return_value=temp_dir):
+                self.assertEqual(5, len(cmake_generator_._get_target_info(module)))
+
+        self.assertEqual(4, len(target_infos))
+        unittest_target = target_infos[2]
+        self.assertEqual('test_A_all', unittest_target.name)
+        self.assertListEqual(module.unittest_sources, unittest_target.file_group_infos['test_A_all'])
+        self.assertDictEqual({'test_A_all' : module.unittest_sources}, target_infos[3].unittest_targets)
+        self.assertIn('set_source_files_properties(${SOURCE_DIR}/A/some_test.cpp PROPERTIES COMPILE_DEFINITIONS '
+                      'main=quick_cmake_main_test_A_some)', content)
+        self.assertIn('add_test(NAME test_A_some COMMAND test_A_all --test_filter=test_A_some)', content)
+        self.assertIn('set_tests_properties(test_A_some PROPERTIES LABELS A COST 5)', content)
+        self.assertIn('add_test(NAME test_A_folder_other COMMAND test_A_all --test_filter=test_A_folder_other)', content)
+
+        main_lines = unittest_target.generated_files['unittests/test_A_all_main.cc']
+        self.assertIn('extern "C" int quick_cmake_main_test_A_folder_other(int argc, char** argv);', main_lines)
+        self.assertIn('int quick_cmake_main_test_A_some();', main_lines)
+        self.assertIn('  { "test_A_some", run_quick_cmake_main_test_A_some },', main_lines)
 
     def test_get_file_info_dir_key(self):
         cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
@@ -202,5 +493,44 @@ class TestCMakeGenerator(unittest.TestCase):
         for module_name in cmake_generator_.cached_post_order:
             self.assertTrue(cmake_generator_._generate_module(cmake_generator_._cmake_modules[module_name]))
 
+    def test_parse_modules_in_thread_pool(self):
+        scan_jobs = GConfig.SCAN_JOBS
+        contents = []
+        try:
+            for jobs in [1, 4]:
+                GConfig.SCAN_JOBS = jobs
+                cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+                cmake_generator_._parse_cmake_info()
+                contents.append([ cmake_generator_._generate_module(cmake_generator_._cmake_modules[name]) \
+                                  for name in cmake_generator_.cached_post_order ])
+        finally:
+            GConfig.SCAN_JOBS = scan_jobs
+        self.assertListEqual(contents[0], contents[1])
+
+    def test_write_cmake_files(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        output_dir = GConfig.OUTPUT_DIR
+        with tempfile.TemporaryDirectory() as temp_dir:
+            GConfig.OUTPUT_DIR = temp_dir
+            try:
+                cmake_generator_._write_cmake_files(['project(test)'], {'A': ['# A'], 'B': ['# B']})
+                modules_dir = cmake_generator_.modules_dir()
+                self.assertListEqual(['A.cmake', 'B.cmake'], sorted(os.listdir(modules_dir)))
+                os.utime(path.join(modules_dir, 'A.cmake'), ns=(0, 0))
+
+                # only changed fragment is written, removed module is deleted
+                cmake_generator_._write_cmake_files(['project(test)'], {'A': ['# A'], 'C': ['# C']})
+                self.assertListEqual(['A.cmake', 'C.cmake'], sorted(os.listdir(modules_dir)))
+                self.assertEqual(0, os.stat(path.join(modules_dir, 'A.cmake')).st_mtime_ns)
+            finally:
+                GConfig.OUTPUT_DIR = output_dir
+
+    def test_generate_module_includes(self):
+        cmake_generator_ = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        includes = cmake_generator_._generate_module_includes()
+        self.assertEqual(len(cmake_generator_.cached_post_order) + 1, len(includes))
+        self.assertEqual('include(${CMAKE_CURRENT_SOURCE_DIR}/modules/D.cmake)', 
+                         includes[cmake_generator_.cached_post_order.index('D')])
+
 if __name__ == '__main__':
     unittest.main()
@@ -37,6 +37,16 @@ class Config:
         # TODO(xiaojianli):Change default value of platform relative to the sytem
         self.platform = self.Platform.X64
 
+    def description(self):
+        ''' Readable description of config, such as DEBUG|X64|LINUX '''
+        values = []
+        for enum_object, value in [(self.Configuration, self.configuration),
+                                   (self.Platform, self.platform),
+                                   (self.System, self.system)]:
+            names = [ k for k, v in vars(enum_object).items() if v == value ]
+            values.append(names[0] if names else str(value))
+        return '|'.join(values)
+
     def set_custom_flags(self, flags_str):
         self.custom_flags_str = flags_str
         self.custom_flags = utils.parse_flags(flags_str)
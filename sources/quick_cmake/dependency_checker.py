@@ -0,0 +1,88 @@
+import os
+from os import path
+
+import include_scanner
+
+class DependencyReport:
+    ''' Dependencies of modules which do not match their includes
+    Attributes:
+        undeclared: map {module --> map {included module --> (including file, included file)}}, the module includes
+            headers of other modules which are not its direct dependencies. One include is kept as an example.
+        unused: map {module --> set of direct dependencies whose headers are never included}
+        indirect: map {module --> set of modules}, the undeclared modules which are depended on indirectly
+    '''
+    def __init__(self):
+        self.undeclared = {}
+        self.unused = {}
+        self.indirect = {}
+
+    def is_clean(self):
+        return not self.undeclared and not self.unused
+
+    def summary(self, sources_dir):
+        ''' Return lines of the report, paths are relative to sources_dir '''
+        lines = []
+        for module in sorted(self.undeclared):
+            for included_module, (source_file, header_file) in sorted(self.undeclared[module].items()):
+                indirect = ' (depended on indirectly)' if included_module in self.indirect.get(module, ()) else ''
+                lines.append('{} includes headers of {}, but it is not in dependencies{}: {} includes {}'.format(
+                    module, included_module, indirect, path.relpath(source_file, sources_dir),
+                    path.relpath(header_file, sources_dir)))
+        for module in sorted(self.unused):
+            lines.append('{} does not include any header of its dependencies: {}'.format(
+                module, ','.join(sorted(self.unused[module]))))
+        return lines
+
+def check_dependencies(sources_dir, module_includes, module_include_dirs, direct_dependencies, dependencies):
+    ''' Build a file level include graph of modules, and compare the modules each module includes with its
+        dependencies.
+    Args:
+        module_includes: map {module --> map {file --> list of (header, is_angled)}}, files are relative to sources_dir
+        module_include_dirs: map {module --> absolute include dirs besides sources_dir and the dir of module}
+        direct_dependencies: map {module --> set of modules in the dependencies of its build file}
+        dependencies: map {module --> set of modules it depends on directly or indirectly}
+    Return:
+        DependencyReport
+    '''
+    sources_dir = path.normpath(path.abspath(sources_dir))
+    graph = include_scanner.IncludeGraph()
+    for module, file_includes in module_includes.items():
+        include_dirs = [sources_dir, path.join(sources_dir, module)] + list(module_include_dirs.get(module, []))
+        for source_file, includes in file_includes.items():
+            graph.add_file(path.join(sources_dir, source_file), includes, include_dirs)
+
+    report = DependencyReport()
+    sources_prefix = path.join(sources_dir, '')
+    # header file --> owner module, headers are included by many files
+    owners = {}
+    for module, file_includes in module_includes.items():
+        used_modules = set()
+        for source_file in file_includes:
+            source_file = path.normpath(path.join(sources_dir, source_file))
+            for header_file in sorted(graph.edges.get(source_file, ())):
+                if header_file not in owners:
+                    owners[header_file] = _get_owner_module(header_file, sources_prefix, module_includes)
+                owner = owners[header_file]
+                if owner is None or owner == module:
+                    continue
+                used_modules.add(owner)
+                if owner not in direct_dependencies.get(module, ()):
+                    report.undeclared.setdefault(module, {}).setdefault(owner, (source_file, header_file))
+                    if owner in dependencies.get(module, ()):
+                        report.indirect.setdefault(module, set()).add(owner)
+        unused = set(direct_dependencies.get(module, ())) - used_modules
+        if unused:
+            report.unused[module] = unused
+    return report
+
+def _get_owner_module(file_path, sources_prefix, modules):
+    ''' Return the module which file_path is in, None if it is not in any module.
+    Args:
+        sources_prefix: normalized absolute sources dir ending with a separator, file_path is normalized too
+    '''
+    if not file_path.startswith(sources_prefix):
+        return None
+    parts = file_path[len(sources_prefix):].split(os.sep, 1)
+    if len(parts) > 1 and parts[0] in modules:
+        return parts[0]
+    return None
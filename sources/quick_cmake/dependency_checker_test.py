@@ -0,0 +1,60 @@
+from os import path
+import tempfile
+import unittest
+
+import dependency_checker
+import include_scanner
+import utils
+
+class TestDependencyChecker(unittest.TestCase):
+    def test_check_dependencies(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sources_dir = path.join(temp_dir, 'sources')
+            third_party_include = path.join(temp_dir, 'third_parties', 'party', 'include')
+            files = { 'A/a.cc' : '#include "a.h"\n#include "B/b.h"\n#include <party.h>\n#include <vector>\n',
+                      'A/a.h' : '#include "C/c.h"\n',
+                      'B/b.h' : '#include "D/d.h"\n',
+                      'C/c.h' : '',
+                      'D/d.h' : '',
+                      'E/e.h' : '' }
+            for f, content in files.items():
+                utils.write_text(content, path.join(sources_dir, f))
+            utils.write_text('', path.join(third_party_include, 'party.h'))
+
+            module_includes = {}
+            for f in files:
+                module = utils.split_path(f)[0]
+                module_includes.setdefault(module, {})[f] = include_scanner.scan_includes(path.join(sources_dir, f))
+            direct_dependencies = { 'A' : {'B', 'E'}, 'B' : {'C', 'D'}, 'C' : set(), 'D' : set(), 'E' : set() }
+            dependencies = { 'A' : {'B', 'C', 'D', 'E'}, 'B' : {'C', 'D'}, 'C' : set(), 'D' : set(), 'E' : set() }
+            report = dependency_checker.check_dependencies(sources_dir, module_includes, { 'A' : [third_party_include] },
+                                                           direct_dependencies, dependencies)
+
+        self.assertFalse(report.is_clean())
+        # A includes C by its header, C is only depended on indirectly
+        self.assertListEqual(['A'], list(report.undeclared.keys()))
+        self.assertListEqual(['C'], list(report.undeclared['A'].keys()))
+        self.assertSetEqual({'C'}, report.indirect['A'])
+        self.assertDictEqual({'A' : {'E'}, 'B' : {'C'}}, report.unused)
+
+        lines = report.summary(sources_dir)
+        self.assertEqual(3, len(lines))
+        self.assertIn('A includes headers of C, but it is not in dependencies (depended on indirectly)', lines[0])
+        self.assertIn('B does not include any header of its dependencies: C', lines)
+
+    def test_include_graph(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            utils.write_text('#include "b.h"\n#include <b.h>\n#include "x.h"\n', path.join(temp_dir, 'dir', 'a.cc'))
+            utils.write_text('', path.join(temp_dir, 'dir', 'b.h'))
+            utils.write_text('', path.join(temp_dir, 'include', 'b.h'))
+            graph = include_scanner.IncludeGraph()
+            source_file = path.join(temp_dir, 'dir', 'a.cc')
+            graph.add_file(source_file, include_scanner.scan_includes(source_file), [path.join(temp_dir, 'include')])
+        # quoted header is searched in the dir of the including file first
+        self.assertSetEqual({ path.normpath(path.join(temp_dir, 'dir', 'b.h')),
+                              path.normpath(path.join(temp_dir, 'include', 'b.h')) },
+                            graph.edges[path.normpath(source_file)])
+        self.assertListEqual(['x.h'], graph.unresolved[path.normpath(source_file)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import glog
+import json
+import os
+from os import path
+import threading
+import time
+
+from gconfig import GConfig
+from source_scanner import DirEntries
+import utils
+
+INDEX_VERSION = 1
+
+# A dir modified within this time before it was listed may be modified again without changing its mtime,
+# since the timestamp granularity of some file systems is coarse.
+RACY_INTERVAL_NS = 2 * 1000 * 1000 * 1000
+
+class DirectoryIndex:
+    ''' Persistent index of dirs, maps each dir to its mtime and its classified entries. A dir is listed again
+        only if its mtime changes.
+        A cached listing is not trusted if the mtime of the dir is close to or later than the time it was listed,
+        so modifications within the timestamp granularity, and mtimes in the future because of clock skew, always
+        cause the dir to be listed again.
+    '''
+    def __init__(self, index_file):
+        self._index_file = index_file
+        self._lock = threading.Lock()
+        self._entries = {} # abs dir --> [mtime, list time, DirEntries]
+        self._visited = set()
+        self._load()
+
+    def get(self, list_dir, scan_func):
+        ''' Get DirEntries of list_dir from index, or list it by scan_func if the index is out of date.
+        Args:
+            scan_func: function to list a dir, return DirEntries, or None if the dir can not be listed
+        '''
+        key = path.abspath(list_dir)
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            self._visited.add(key)
+            cached = self._entries.get(key)
+        if cached and cached[0] == mtime and mtime < cached[1] - RACY_INTERVAL_NS:
+            return cached[2]
+
+        list_time = time.time_ns()
+        entries = scan_func(list_dir)
+        if entries is not None:
+            with self._lock:
+                self._entries[key] = [mtime, list_time, entries]
+        return entries
+
+    def invalidate(self, list_dir = None):
+        ''' Remove list_dir from index, or remove all dirs if list_dir is None '''
+        with self._lock:
+            if list_dir is None:
+                self._entries = {}
+            else:
+                self._entries.pop(path.abspath(list_dir), None)
+
+    def save(self):
+        ''' Save dirs visited in this run. Write to a temporary file and then replace, so the index file is
+            never partially written.
+        '''
+        with self._lock:
+            entries = { k : [v[0], v[1], vars(v[2])] for k, v in self._entries.items() if k in self._visited }
+        content = json.dumps({ 'version' : INDEX_VERSION, 'filters' : self._get_filters(), 'entries' : entries })
+        temp_file = '{}.{}.tmp'.format(self._index_file, os.getpid())
+        utils.write_text(content, temp_file)
+        os.replace(temp_file, self._index_file)
+
+    def _load(self):
+        if not path.exists(self._index_file):
+            return
+        try:
+            with open(self._index_file, 'r') as f:
+                content = json.load(f)
+            if content.get('version') != INDEX_VERSION or content.get('filters') != self._get_filters():
+                glog.info('Directory index %s is out of date, ignore it', self._index_file)
+                return
+            for k, v in content['entries'].items():
+                entries = DirEntries()
+                entries.__dict__.update(v[2])
+                self._entries[k] = [v[0], v[1], entries]
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            glog.warn('Directory index %s is broken, ignore it', self._index_file)
+            self._entries = {}
+
+    def _get_filters(self):
+        return [GConfig.SOURCES_FILTER, GConfig.UNITTEST_SOURCES_FILTTER]
@@ -0,0 +1,86 @@
+import os
+from os import path
+import tempfile
+import unittest
+
+from directory_index import DirectoryIndex
+from source_scanner import SourceScanner
+import utils
+
+class TestDirectoryIndex(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self._index_file = path.join(self._temp_dir.name, 'cache', 'directory_index.json')
+        self._list_dir = path.join(self._temp_dir.name, 'module')
+        utils.write_text('', path.join(self._list_dir, 'a.cc'))
+        utils.write_text('', path.join(self._list_dir, 'build.py'))
+        self._scan_count = 0
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _scan_dir(self, list_dir):
+        self._scan_count += 1
+        return SourceScanner().scan_dir(list_dir)
+
+    def _set_old_mtime(self, mtime_ns = 1000 * 1000 * 1000):
+        os.utime(self._list_dir, ns=(mtime_ns, mtime_ns))
+
+    def test_get(self):
+        self._set_old_mtime()
+        index = DirectoryIndex(self._index_file)
+        entries = index.get(self._list_dir, self._scan_dir)
+        self.assertListEqual(['a.cc'], entries.sources)
+        self.assertTrue(entries.has_build_file)
+        self.assertIs(entries, index.get(self._list_dir, self._scan_dir))
+        self.assertEqual(1, self._scan_count)
+
+        # mtime changed
+        utils.write_text('', path.join(self._list_dir, 'b.cc'))
+        self._set_old_mtime(2 * 1000 * 1000 * 1000)
+        self.assertListEqual(['a.cc', 'b.cc'], sorted(index.get(self._list_dir, self._scan_dir).sources))
+        self.assertEqual(2, self._scan_count)
+
+        # explicit invalidation
+        index.invalidate(self._list_dir)
+        index.get(self._list_dir, self._scan_dir)
+        self.assertEqual(3, self._scan_count)
+        index.invalidate()
+        index.get(self._list_dir, self._scan_dir)
+        self.assertEqual(4, self._scan_count)
+
+        self.assertIsNone(index.get(path.join(self._list_dir, 'not_exists'), self._scan_dir))
+
+    def test_racy_mtime(self):
+        # the dir is just modified, or its mtime is in the future, it can not be trusted
+        index = DirectoryIndex(self._index_file)
+        index.get(self._list_dir, self._scan_dir)
+        index.get(self._list_dir, self._scan_dir)
+        self.assertEqual(2, self._scan_count)
+
+        future_ns = (os.stat(self._list_dir).st_mtime_ns + 3600 * 1000 * 1000 * 1000)
+        self._set_old_mtime(future_ns)
+        index.get(self._list_dir, self._scan_dir)
+        index.get(self._list_dir, self._scan_dir)
+        self.assertEqual(4, self._scan_count)
+
+    def test_save_and_load(self):
+        self._set_old_mtime()
+        index = DirectoryIndex(self._index_file)
+        index.get(self._list_dir, self._scan_dir)
+        index.save()
+        self.assertListEqual(['directory_index.json'], os.listdir(path.dirname(self._index_file)))
+
+        index = DirectoryIndex(self._index_file)
+        entries = index.get(self._list_dir, self._scan_dir)
+        self.assertEqual(1, self._scan_count)
+        self.assertListEqual(['a.cc'], entries.sources)
+        self.assertTrue(entries.has_build_file)
+
+        # broken index file is ignored
+        utils.write_text('{"version": 1, "filters"', self._index_file)
+        DirectoryIndex(self._index_file).get(self._list_dir, self._scan_dir)
+        self.assertEqual(2, self._scan_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import fnmatch
+import glob
+import os
+from os import path
+import re
+import threading
+
+# the same magic characters as glob
+_MAGIC_PATTERN = re.compile('[*?[]')
+
+class FileMatcher:
+    ''' Glob with cache. The names of each dir are listed once, and the result of each (dir, pattern) is kept, so
+        the lib and bin dirs of third parties are not listed again for every config. It is thread safe.
+        Files added after a dir is listed are not found, so a matcher should only live for a run.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = {} # abs dir --> names in the dir, empty if it can not be listed
+        self._matches = {} # path pattern --> matched paths
+
+    def glob(self, pathname):
+        ''' Return the same as glob.glob(pathname), but in a list which must not be modified '''
+        with self._lock:
+            matches = self._matches.get(pathname)
+        if matches is not None:
+            return matches
+
+        glob_dir, pattern = path.split(pathname)
+        if _MAGIC_PATTERN.search(glob_dir) or not pattern:
+            # pattern of dirs, such as lib/*/x.lib, is rare
+            matches = glob.glob(pathname)
+        elif not _MAGIC_PATTERN.search(pattern):
+            matches = [pathname] if path.lexists(pathname) else []
+        else:
+            # glob does not match hidden files unless the pattern starts with a dot
+            names = [ x for x in self._list_dir(glob_dir) if pattern.startswith('.') or not x.startswith('.') ]
+            matches = [ path.join(glob_dir, x) for x in fnmatch.filter(names, pattern) ]
+        with self._lock:
+            self._matches[pathname] = matches
+        return matches
+
+    def _list_dir(self, list_dir):
+        key = path.abspath(list_dir)
+        with self._lock:
+            names = self._names.get(key)
+        if names is None:
+            try:
+                names = os.listdir(key)
+            except OSError:
+                names = []
+            with self._lock:
+                self._names[key] = names
+        return names
@@ -0,0 +1,34 @@
+import glob
+import os
+from os import path
+import tempfile
+import unittest
+from unittest import mock
+
+from file_matcher import FileMatcher
+import utils
+
+class TestFileMatcher(unittest.TestCase):
+    def test_glob(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for f in ['lib/a.lib', 'lib/b.so', 'lib/.hidden.lib', 'lib/x64/c.lib', 'bin/d.dll']:
+                utils.write_text('', path.join(temp_dir, f))
+            matcher = FileMatcher()
+            for pattern in ['lib/*.*', 'lib/*.lib', 'lib/.*', 'lib/a.lib', 'lib/not_exists.lib', 'lib/*',
+                            'lib/x64/*.lib', 'lib/*/*.lib', 'not_exists/*.lib', 'lib/[ab].*']:
+                pathname = path.join(temp_dir, pattern)
+                self.assertListEqual(sorted(glob.glob(pathname)), sorted(matcher.glob(pathname)), pattern)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            utils.write_text('', path.join(temp_dir, 'lib', 'a.lib'))
+            matcher = FileMatcher()
+            with mock.patch('os.listdir', wraps=os.listdir) as listdir:
+                for i in range(2):
+                    # each config matches the same dirs of third parties
+                    result = utils.match_files(temp_dir, ['lib'], ['*.lib', '*.*'], glob_func=matcher.glob)
+                    self.assertSetEqual({path.join(temp_dir, 'lib', 'a.lib')}, result)
+                self.assertEqual(1, listdir.call_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -31,3 +31,50 @@ class GConfig:
     CUSTOM_FLAGS = ''
 
     OUTPUT_DIR = ''
+
+    # number of processes to run build scripts, run in current process if it is not greater than 1
+    JOBS = 1
+
+    # number of threads to scan the sources of modules, 0 means decided by the thread pool, 1 means no thread pool
+    SCAN_JOBS = 0
+
+    # number of unittest binaries run at the same time by the unittest custom targets, 0 means the number of cpus
+    TEST_JOBS = 0
+
+    # seconds a unittest binary can run before it is killed, 0 means no timeout
+    TEST_TIMEOUT = 0
+
+    # if register unit tests to ctest
+    CTEST = False
+
+    # if scan includes of modules and report the dependencies which do not match them
+    CHECK_DEPENDENCIES = False
+
+    # if link all unit tests of a module into a single binary
+    SINGLE_TEST_BINARY = False
+
+    # if compile sources of modules in unity batches, and the number of sources in a batch
+    UNITY = False
+    UNITY_BATCH_SIZE = 8
+
+    # if precompile the headers included by at least PCH_THRESHOLD of the sources of each module,
+    # at most PCH_MAX_HEADERS headers of a module
+    PCH = False
+    PCH_THRESHOLD = 0.5
+    PCH_MAX_HEADERS = 10
+
+    # launcher of compilers, such as ccache. auto means ccache or sccache if it is installed, none means no launcher
+    COMPILER_LAUNCHER = 'auto'
+
+    # generator of cmake, auto means Ninja Multi-Config if ninja is installed, otherwise the default of cmake
+    GENERATOR = 'auto'
+    # parallel jobs of ninja pools, 0 means it is not limited and the pool is not defined
+    LINK_JOBS = 2
+    COMPILE_JOBS = 0
+    HEAVY_COMPILE_JOBS = 2
+
+    # how binaries of third parties are staged to the binary dir, see binary_stager.STAGE_MODES and CHECK_MODES
+    STAGE_MODE = 'copy'
+    STAGE_CHECK = 'mtime'
+    # if stage binaries of third parties by a build step, instead of when generating
+    STAGE_AT_BUILD = False
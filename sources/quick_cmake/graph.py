@@ -0,0 +1,86 @@
+import glog
+import itertools
+
+# search state of nodes
+_VISITING = 1
+_VISITED = 2
+
+_END = object()
+
+def post_order(graph, starts = None):
+    ''' Post order of a directed graph by an iterative depth first search, children are before their parents.
+        It costs O(V+E) besides sorting the children. A cycle fails the glog check with the full cycle path.
+    Args:
+        graph: map {node --> iterable of children}. Children are visited in sorted order, so the result is stable
+        starts: nodes to start the search, in order. Default to all nodes, in the order of graph
+    Return:
+        list of nodes
+    '''
+    result = []
+    states = {}
+    for start in (graph if starts is None else starts):
+        if start in states:
+            continue
+        states[start] = _VISITING
+        stack = [(start, iter(sorted(graph[start])))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, _END)
+            if child is _END:
+                stack.pop()
+                states[node] = _VISITED
+                result.append(node)
+                continue
+            glog.check(child in graph, '{} depends on {}, which is not defined'.format(node, child))
+            state = states.get(child)
+            if state is None:
+                states[child] = _VISITING
+                stack.append((child, iter(sorted(graph[child]))))
+            elif state == _VISITING:
+                nodes = [ n for n, c in stack ]
+                cycle = nodes[nodes.index(child):] + [child]
+                glog.check(False, 'Dependency cycle: ' + ' -> '.join([ str(n) for n in cycle ]))
+    return result
+
+class IdMap:
+    ''' Dense integer ids of names. A set of names is represented by a bitset of their ids, which is a python int,
+        so that unions of large sets are cheap.
+    '''
+    def __init__(self, names = ()):
+        self.names = []
+        self._ids = {}
+        for name in names:
+            self.id(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, name):
+        ''' Return id of name, a new id is assigned if name is not in the map '''
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self._ids[name] = name_id
+            self.names.append(name)
+        return name_id
+
+    def to_bits(self, names):
+        bits = 0
+        for name in names:
+            bits |= 1 << self.id(name)
+        return bits
+
+    def to_set(self, bits):
+        ''' Return set of names whose ids are in bits '''
+        binary = bin(bits)[:1:-1]
+        count = binary.count('1')
+        if count * 16 < len(binary):
+            # few bits, find them in the reversed binary string
+            result = set()
+            index = binary.find('1')
+            while index >= 0:
+                result.add(self.names[index])
+                index = binary.find('1', index + 1)
+            return result
+        # bytes of the binary string, zero for unset bits, so that compress filters names in C
+        return set(itertools.compress(self.names, binary.encode('ascii').replace(b'0', b'\0')))
@@ -0,0 +1,42 @@
+import glog
+import unittest
+
+import graph as graph_utils
+
+class TestGraph(unittest.TestCase):
+    def test_post_order(self):
+        graph = { 'A' : {'C', 'B'}, 'B' : {'D'}, 'C' : {'D'}, 'D' : set(), 'E' : set() }
+        self.assertListEqual(['D', 'B', 'C', 'A', 'E'], graph_utils.post_order(graph))
+        self.assertListEqual(['E', 'D', 'B', 'C', 'A'], graph_utils.post_order(graph, ['E', 'A']))
+        self.assertListEqual(['D', 'C'], graph_utils.post_order(graph, ['C']))
+
+    def test_cycle(self):
+        graph = { 'A' : ['B'], 'B' : ['C'], 'C' : ['D', 'B'], 'D' : [] }
+        with self.assertRaises(glog.FailedCheckException) as context:
+            graph_utils.post_order(graph)
+        self.assertIn('B -> C -> B', str(context.exception))
+
+        with self.assertRaises(glog.FailedCheckException) as context:
+            graph_utils.post_order({ 'A' : ['A'] })
+        self.assertIn('A -> A', str(context.exception))
+
+    def test_undefined(self):
+        with self.assertRaises(glog.FailedCheckException) as context:
+            graph_utils.post_order({ 'A' : ['B'] })
+        self.assertIn('A depends on B', str(context.exception))
+
+    def test_id_map(self):
+        id_map = graph_utils.IdMap(['A', 'B'])
+        self.assertEqual(1, id_map.id('B'))
+        self.assertEqual(2, id_map.id('C'))
+        self.assertEqual(3, len(id_map))
+        self.assertEqual(0b101, id_map.to_bits(['C', 'A']))
+        self.assertSetEqual({'A', 'C'}, id_map.to_set(0b101))
+        self.assertSetEqual(set(), id_map.to_set(0))
+
+        names = [ str(i) for i in range(1000) ]
+        id_map = graph_utils.IdMap(names)
+        self.assertSetEqual(set(names[::3]), id_map.to_set(id_map.to_bits(names[::3])))
+
+if __name__ == '__main__':
+    unittest.main()
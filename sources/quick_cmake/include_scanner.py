@@ -0,0 +1,90 @@
+import collections
+import mmap
+import os
+from os import path
+import re
+
+# '#include <vector>' or '# include "module/header.h"', the include in comments is not excluded
+_INCLUDE_PATTERN = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\r\n]+)[>"]', re.MULTILINE)
+# larger files are mapped instead of read, it saves a copy
+_MMAP_MIN_SIZE = 64 * 1024
+
+def scan_includes(source_file):
+    ''' Return the includes of source_file in order, empty if it can not be read.
+    Return:
+        list of tuple (header, is_angled), is_angled is True for #include <header>
+    '''
+    try:
+        with open(source_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+                return _find_includes(f.read())
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return _find_includes(content)
+    except (OSError, ValueError):
+        return []
+
+def _find_includes(content):
+    # mmap does not support the in operator of bytes
+    if content.find(b'include') < 0:
+        return []
+    return [ (m.group(2).decode('utf-8', 'replace').strip(), m.group(1) == b'<')
+             for m in _INCLUDE_PATTERN.finditer(content) ]
+
+def count_includes(source_files):
+    ''' Count how many files of source_files include each header, a header included twice by a file is counted once.
+    Return:
+        collections.Counter {(header, is_angled) --> number of files}
+    '''
+    counter = collections.Counter()
+    for source_file in source_files:
+        counter.update(set(scan_includes(source_file)))
+    return counter
+
+def select_frequent_includes(counter, file_count, threshold, max_headers, min_files = 2):
+    ''' Select the headers included by at least threshold (0 ~ 1) of file_count files, and at least min_files.
+    Return:
+        list of (header, is_angled), the most frequent first, at most max_headers
+    '''
+    min_count = max(min_files, threshold * file_count)
+    includes = [ (include, count) for include, count in counter.items() if count >= min_count ]
+    includes.sort(key=lambda x: (-x[1], x[0]))
+    return [ include for include, count in includes[:max_headers] ]
+
+class IncludeGraph:
+    ''' File level include graph. A quoted header is searched in the dir of the including file first, and then in
+        the include dirs, the same as compilers. An angled header is only searched in the include dirs.
+    Attributes:
+        edges: map {file --> set of included files}, paths are normalized absolute paths
+        unresolved: map {file --> list of headers not found}, such as system headers
+    '''
+    def __init__(self):
+        self.edges = {}
+        self.unresolved = {}
+        # path --> if it is a file, most headers are included by many files
+        self._is_file_cache = {}
+
+    def add_file(self, source_file, includes, include_dirs):
+        ''' Add source_file and the files it includes.
+        Args:
+            includes: list of (header, is_angled), returned by scan_includes
+            include_dirs: absolute dirs to search headers in
+        '''
+        source_file = path.normpath(path.abspath(source_file))
+        included_files = self.edges.setdefault(source_file, set())
+        source_dir = path.dirname(source_file)
+        for header, is_angled in includes:
+            search_dirs = include_dirs if is_angled else [source_dir] + list(include_dirs)
+            for search_dir in search_dirs:
+                header_file = path.normpath(path.join(search_dir, header))
+                if self._is_file(header_file):
+                    included_files.add(header_file)
+                    break
+            else:
+                self.unresolved.setdefault(source_file, []).append(header)
+
+    def _is_file(self, file_path):
+        is_file = self._is_file_cache.get(file_path)
+        if is_file is None:
+            is_file = path.isfile(file_path)
+            self._is_file_cache[file_path] = is_file
+        return is_file
@@ -0,0 +1,46 @@
+from os import path
+import tempfile
+import unittest
+
+import include_scanner
+import utils
+
+class TestIncludeScanner(unittest.TestCase):
+    def test_scan_includes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_file = path.join(temp_dir, 'a.cc')
+            utils.write_text('#include <vector>\n  #  include "A/a.h"\r\n#include<map>\n#define X 1\n'
+                             'int a = 0; // #include <string>\n', source_file)
+            self.assertListEqual([('vector', True), ('A/a.h', False), ('map', True)],
+                                 include_scanner.scan_includes(source_file))
+            self.assertListEqual([], include_scanner.scan_includes(path.join(temp_dir, 'not_exists.cc')))
+
+            # large files are mapped
+            large_file = path.join(temp_dir, 'large.cc')
+            utils.write_text('#include "large.h"\n' + '// padding\n' * 10000 + '#include <map>\n', large_file)
+            self.assertListEqual([('large.h', False), ('map', True)], include_scanner.scan_includes(large_file))
+
+    def test_select_frequent_includes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            contents = ['#include <vector>\n#include <vector>\n#include "a.h"\n',
+                        '#include <vector>\n#include <map>\n#include "a.h"\n',
+                        '#include <vector>\n#include <string>\n',
+                        '#include <map>\n']
+            source_files = []
+            for i, content in enumerate(contents):
+                source_files.append(path.join(temp_dir, '{}.cc'.format(i)))
+                utils.write_text(content, source_files[-1])
+
+            counter = include_scanner.count_includes(source_files)
+            self.assertEqual(3, counter[('vector', True)])
+            self.assertEqual(1, counter[('string', True)])
+
+            self.assertListEqual([('vector', True), ('a.h', False), ('map', True)],
+                                 include_scanner.select_frequent_includes(counter, len(source_files), 0.5, 10))
+            self.assertListEqual([('vector', True)],
+                                 include_scanner.select_frequent_includes(counter, len(source_files), 0.5, 1))
+            # a header included by only one file is never selected
+            self.assertNotIn(('string', True), include_scanner.select_frequent_includes(counter, len(source_files), 0, 10))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,21 @@
 
 import click
 import glog
+from os import path
+import sys
 
+import binary_stager
 from build_model import BuildModel
+from build_script_loader import BuildScriptLoader
 from cmake_generator import CMakeGenerator
 import config
 from gconfig import GConfig
+from manifest import Manifest
 from path_manager import PathManager
+import profiler
+import test_runner
+import test_selection
+from watch import WatchSession
 
 def _parse_member(value, str):
     result = getattr(value, str, None)
@@ -14,12 +23,114 @@ def _parse_member(value, str):
     glog.check(result != None, 'Parameter \'{}\' should be one of {}'.format(str, object_attributes))
     return result
 
-def _run_unittests(unittests):
+def _run_unittests(unittests, test_jobs, test_timeout, junit_xml):
     executable_files = unittests.split(',')
     print('Begin to run unit files:', '\n'.join(executable_files))
-    for ut_file in executable_files:
-        returncode = subprocess.run([ut_file]).returncode
-        assert 0 == returncode, ut_file + 'run error!'
+    runner = test_runner.TestRunner(test_jobs, test_timeout)
+    results = runner.run(executable_files)
+    print('\n'.join(test_runner.summary(results, runner.duration)))
+    if junit_xml:
+        test_runner.write_junit_xml(results, junit_xml, path.splitext(path.basename(junit_xml))[0])
+    if not all(r.is_passed() for r in results):
+        sys.exit(1)
+
+def _stage_binaries(plan_file, stage_mode, stage_check):
+    print(binary_stager.stage_plan(plan_file, stage_mode, stage_check).summary())
+
+def _write_profile(workspace):
+    trace_file = path.join(workspace, GConfig.OUTPUT_DIR, 'quick_cmake_trace.json')
+    profiler.get().write_trace(trace_file)
+    print('\n'.join(profiler.get().summary()))
+    glog.info('Write trace to file:' + trace_file)
+
+def _run_affected_unittests(path_manager, build_model, cmake_generator, changed_files, only_generate):
+    changed_modules, changed_third_parties = test_selection.get_changed_owners(path_manager, changed_files)
+    affected_modules = build_model.get_dependent_modules(changed_modules, changed_third_parties)
+    targets = cmake_generator.get_unittest_targets(affected_modules)
+    glog.info('Affected modules: %s', ','.join(sorted(affected_modules)))
+    print('Affected unittest targets:', ' '.join(targets))
+    if not targets or only_generate:
+        return
+    is_built = cmake_generator.build_targets(targets)
+    cmake_generator.print_launcher_stats()
+    if not is_built:
+        sys.exit(1)
+
+def _check_dependencies(path_manager, cmake_generator):
+    with profiler.span('check dependencies', 'phase'):
+        report = cmake_generator.check_dependencies()
+    for line in report.summary(path_manager.sources_dir()):
+        print(line)
+    if report.is_clean():
+        glog.info('Dependencies of modules match their includes')
+
+def _generate(configs, workspace, only_generate, force, clear_cache, watch, watch_debounce, pre_build, post_build,
+              module, changed_files):
+    # create path manager instance
+    is_generating = not pre_build and not post_build
+    with profiler.span('discover modules', 'phase'):
+        pmg = PathManager(workspace, use_directory_index=is_generating, clear_cache=is_generating and clear_cache)
+
+    if is_generating:
+        options = dict(click.get_current_context().params)
+        options.pop('force')
+        options.pop('clear_cache')
+        options.pop('watch')
+        options.pop('watch_debounce')
+        options.pop('profile')
+        options.pop('check_dependencies')
+        options.pop('junit_xml')
+        options.pop('changed_files')
+        options.pop('diff_range')
+        manifest = Manifest(pmg, options)
+        is_up_to_date = not force and not watch and manifest.is_up_to_date()
+        if is_up_to_date and not GConfig.STAGE_AT_BUILD:
+            # binaries of third parties may be updated in place, which does not change the inputs of the manifest
+            plan_file = path.join(pmg.cache_dir(), binary_stager.PLAN_FILE_NAME)
+            if path.isfile(plan_file):
+                glog.info(binary_stager.stage_plan(plan_file, GConfig.STAGE_MODE, GConfig.STAGE_CHECK).summary())
+        if is_up_to_date and changed_files is None and not GConfig.CHECK_DEPENDENCIES:
+            glog.info('Nothing changed since last run, skip. Use --force to regenerate.')
+            return
+
+    with profiler.span('run build files', 'phase'):
+        build_model = BuildModel(configs, BuildScriptLoader(path.join(pmg.cache_dir(), 'build_scripts')))
+        build_model.import_modules(pmg.module_map)
+        build_model.import_third_parties(pmg.third_party_map)
+        build_model.import_default_third_parties(pmg.default_third_party_map)
+    with profiler.span('parse build model', 'phase'):
+        build_model.parse()
+
+    if is_generating:
+        if not build_model.modules()[0]:
+            glog.warn('There is not modules, skip!')
+            return
+        def on_generated(path_manager, cmake_generator):
+            if not only_generate:
+                with profiler.span('run cmake', 'phase'):
+                    cmake_generator.exe_cmake()
+                cmake_generator.print_launcher_stats()
+            path_manager.directory_index().save()
+            Manifest(path_manager, options).save()
+
+        cmake_generator = CMakeGenerator(configs, build_model, pmg)
+        if not is_up_to_date:
+            cmake_generator.generate()
+            on_generated(pmg, cmake_generator)
+        if GConfig.CHECK_DEPENDENCIES:
+            _check_dependencies(pmg, cmake_generator)
+        if changed_files is not None:
+            _run_affected_unittests(pmg, build_model, cmake_generator, changed_files, only_generate)
+        if watch:
+            WatchSession(configs, pmg, build_model, cmake_generator, watch_debounce).run(on_generated)
+    else:
+        glog.check(module, 'module should not be empty!')
+        modules = build_model.modules()[0]
+        glog.check(module in modules)
+        if pre_build and modules[module].pre_build:
+            modules[module].pre_build()
+        if post_build and modules[module].post_build:
+            modules[module].post_build()
 
 @click.command()
 @click.option('--configuration', default='DEBUG,RELEASE', help='values can be:DEBUG,RELEASE')
@@ -31,6 +142,14 @@ def _run_unittests(unittests):
 @click.option('--only_generate', is_flag=True, help='Only generate CMakeListst.txt, but not execute cmake to update')
 @click.option('--compile_options', default='', help='Add compile options, use `add_compile_options` in cmake.')
 @click.option('--compile_definitions', default='', help='Add compile definitions, use `add_compile_difinitions` in cmake.')
+@click.option('--force', is_flag=True, help='Regenerate even if nothing changed since the last run')
+@click.option('--clear_cache', is_flag=True, help='Remove files cached by previous runs, such as the directory index')
+@click.option('--jobs', default=1, help='Number of processes to run build.py files')
+@click.option('--scan_jobs', default=0, help='Number of threads to scan module sources, 0 means auto, 1 means serial')
+@click.option('--watch', is_flag=True, help='Keep running, generate again for changed modules when files change')
+@click.option('--watch_debounce', default=0.3, help='Seconds without changes to wait before generating in watch mode')
+@click.option('--profile', is_flag=True, help='Write a chrome trace of the time spent on each phase, build file and module to the output dir')
+@click.option('--check_dependencies', is_flag=True, help='Report modules which include headers of modules not in their dependencies, and dependencies never included')
 
 # todo: support custom flags in the quick cmake
 @click.option('--custom_flags', default='', help='custom_flags, access by config.custom_flags_str and config.custom_flags (dict)')
@@ -40,14 +159,49 @@ def _run_unittests(unittests):
 @click.option('--post_build', is_flag=True, help='trigger post build event')
 @click.option('--module', help='The module to trigger pre/post build event')
 
+# for unity build
+@click.option('--unity', is_flag=True, help='Compile sources of each module in unity (jumbo) batches')
+@click.option('--unity_batch_size', default=8, help='Number of sources in a unity batch')
+
+# for precompiled headers
+@click.option('--pch', is_flag=True, help='Precompile the headers included by most sources of each module')
+@click.option('--pch_threshold', default=0.5, help='Precompile a header if it is included by at least this ratio of the sources of module')
+@click.option('--pch_max_headers', default=10, help='Max number of precompiled headers of each module')
+
+@click.option('--compiler_launcher', default='auto', help='Compiler launcher such as ccache or sccache, auto means ccache or sccache if it is installed, none means no launcher')
+
+# for generator and ninja job pools
+@click.option('--generator', default='auto', help='Generator of cmake, auto means Ninja Multi-Config if ninja is installed, otherwise the default generator of cmake')
+@click.option('--link_jobs', default=2, help='Number of link jobs run at the same time by ninja, 0 means not limited')
+@click.option('--compile_jobs', default=0, help='Number of compile jobs run at the same time by ninja, 0 means not limited')
+@click.option('--heavy_compile_jobs', default=2, help='Number of compile jobs of heavy_compile modules run at the same time by ninja, 0 means not limited')
+
+# for staging binaries of third parties
+@click.option('--stage_mode', default='copy', help='How binaries of third parties are staged to the binary dir: copy, hardlink or symlink, they are copied if they can not be linked. A linked binary shares its content with the file in third parties')
+@click.option('--stage_check', default='mtime', help='How a staged binary is compared with its source to find the stale ones: size, mtime (size and mtime) or hash (size and content)')
+@click.option('--stage_at_build', is_flag=True, help='Stage binaries of third parties by a build step, instead of when generating')
+@click.option('--stage_binaries', default='', help='Stage the binaries in this plan file, it is run by the build step')
+
 # for run all unittests
 @click.option('--unittests', default='', help='unittest binaries:xx,xxxx,xx')
-def main(configuration, platform, std, output_dir, disable_unittest, workspace, only_generate, 
-         compile_options, compile_definitions, custom_flags,
+@click.option('--test_jobs', default=0, help='Number of unittest binaries run at the same time, 0 means the number of cpus')
+@click.option('--test_timeout', default=0.0, help='Seconds a unittest binary can run before it is killed, 0 means no timeout')
+@click.option('--ctest', is_flag=True, help='Register unittests to ctest, so they can be run by ctest -j')
+@click.option('--single_test_binary', is_flag=True, help='Link all unittests of a module into a single binary test_[module]_all')
+@click.option('--junit_xml', default='', help='Write the results of unittests as a JUnit XML report to this file')
 
-         pre_build, post_build, module, unittests):
+# for running unittests of the modules affected by changes
+@click.option('--changed_files', default='', help='Build and run unittests of modules affected by these files:xx,xxxx,xx')
+@click.option('--diff_range', default='', help='Build and run unittests of modules affected by files changed in git diff range, such as origin/main...HEAD')
+def main(configuration, platform, std, output_dir, disable_unittest, workspace, only_generate, 
+         compile_options, compile_definitions, force, clear_cache, jobs, scan_jobs, watch, watch_debounce, profile, check_dependencies, custom_flags,
+         unity, unity_batch_size, pch, pch_threshold, pch_max_headers, compiler_launcher,
+         generator, link_jobs, compile_jobs, heavy_compile_jobs, stage_mode, stage_check, stage_at_build, stage_binaries,
+         pre_build, post_build, module, unittests, test_jobs, test_timeout, ctest, single_test_binary, junit_xml, changed_files, diff_range):
     if unittests != '':
-        return _run_unittests(unittests)
+        return _run_unittests(unittests, test_jobs, test_timeout, junit_xml)
+    if stage_binaries != '':
+        return _stage_binaries(stage_binaries, stage_mode, stage_check)
 
     glog.check_eq(std[0:3],'c++')
     GConfig.STD = int(std[3:])
@@ -56,6 +210,26 @@ def main(configuration, platform, std, output_dir, disable_unittest, workspace,
     GConfig.COMPILE_OPTIONS=compile_options
     GConfig.COMPILE_DEFINITIONS = compile_definitions
     GConfig.CUSTOM_FLAGS = custom_flags
+    GConfig.JOBS = jobs
+    GConfig.SCAN_JOBS = scan_jobs
+    GConfig.TEST_JOBS = test_jobs
+    GConfig.TEST_TIMEOUT = test_timeout
+    GConfig.CTEST = ctest
+    GConfig.CHECK_DEPENDENCIES = check_dependencies
+    GConfig.SINGLE_TEST_BINARY = single_test_binary
+    GConfig.UNITY = unity
+    GConfig.UNITY_BATCH_SIZE = unity_batch_size
+    GConfig.PCH = pch
+    GConfig.PCH_THRESHOLD = pch_threshold
+    GConfig.PCH_MAX_HEADERS = pch_max_headers
+    GConfig.COMPILER_LAUNCHER = compiler_launcher
+    GConfig.GENERATOR = generator
+    GConfig.LINK_JOBS = link_jobs
+    GConfig.COMPILE_JOBS = compile_jobs
+    GConfig.HEAVY_COMPILE_JOBS = heavy_compile_jobs
+    GConfig.STAGE_MODE = stage_mode
+    GConfig.STAGE_CHECK = stage_check
+    GConfig.STAGE_AT_BUILD = stage_at_build
 
     v_configurations = configuration.split(',')
     v_platforms = platform.split(',')
@@ -71,31 +245,21 @@ def main(configuration, platform, std, output_dir, disable_unittest, workspace,
             v_config.set_custom_flags(GConfig.CUSTOM_FLAGS)
             configs.append(v_config)
 
-    # create path manager instance
-    pmg = PathManager(workspace)
+    # None if unittests of affected modules are not required
+    test_changed_files = None
+    if changed_files or diff_range:
+        test_changed_files = [ path.abspath(f) for f in changed_files.split(',') if f ]
+        if diff_range:
+            test_changed_files.extend(test_selection.get_git_changed_files(workspace, diff_range))
 
-    build_model = BuildModel(configs)
-    build_model.import_modules(pmg.module_map)
-    build_model.import_third_parties(pmg.third_party_map)
-    build_model.import_default_third_parties(pmg.default_third_party_map)
-    build_model.parse()
-
-    if not pre_build and not post_build:
-        if not build_model.modules()[0]:
-            glog.warn('There is not modules, skip!')
-            return
-        cmake_generator = CMakeGenerator(configs, build_model, pmg)
-        cmake_generator.generate()
-        if not only_generate:
-            cmake_generator.exe_cmake()
-    else:
-        glog.check(module, 'module should not be empty!')
-        modules = build_model.modules()[0]
-        glog.check(module in modules)
-        if pre_build and modules[module].pre_build:
-            modules[module].pre_build()
-        if post_build and modules[module].post_build:
-            modules[module].post_build()
+    if profile:
+        profiler.enable()
+    try:
+        _generate(configs, workspace, only_generate, force, clear_cache, watch, watch_debounce, pre_build, post_build,
+                  module, test_changed_files)
+    finally:
+        if profile:
+            _write_profile(workspace)
 
 if __name__ == '__main__':
     main()
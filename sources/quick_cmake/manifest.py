@@ -0,0 +1,122 @@
+import glog
+import hashlib
+import json
+import os
+from os import path
+import platform
+import sys
+
+from gconfig import GConfig
+import utils
+
+MANIFEST_VERSION = 1
+
+class Manifest:
+    ''' Records the inputs of a generation run, so that a run whose inputs did not change can be skipped.
+    The inputs are:
+        build files: contents of every build.py for modules and third parties
+        directories: mtime and listing of every directory under sources and third_parties
+        source files: mtime and size of every file under sources with GConfig.PCH, since the precompiled headers
+            depend on the contents of sources, which do not change the mtimes of directories
+        options: command line options of the run
+        environment: python version, system and the quick cmake scripts themselves
+    '''
+    def __init__(self, path_manager, options):
+        self._path_manager = path_manager
+        self._options = options
+
+    def manifest_file(self):
+        return path.join(self._path_manager.cache_dir(), 'manifest.json')
+
+    def compute(self):
+        ''' Compute manifest for current inputs
+        Return:
+            dict, json serializable
+        '''
+        result = {}
+        result['version'] = MANIFEST_VERSION
+        result['python'] = sys.version
+        result['system'] = platform.system()
+        result['quick_cmake'] = self._hash_files(self._quick_cmake_files())
+        result['options'] = { k : str(v) for k, v in sorted(self._options.items()) }
+        build_files = {}
+        build_files.update(self._path_manager.module_map)
+        build_files.update(self._path_manager.third_party_map)
+        result['build_files'] = { path.relpath(f, self._path_manager.workspace()) : self._hash_files([f]) \
+                                  for f in sorted(build_files.values()) }
+        directories = {}
+        source_files = {} if GConfig.PCH else None
+        self._collect_directories(self._path_manager.sources_dir(), directories, source_files)
+        self._collect_directories(self._path_manager.third_parties_dir(), directories)
+        result['directories'] = directories
+        if source_files is not None:
+            result['source_files'] = source_files
+        return result
+
+    def load(self):
+        ''' Load the manifest of the last run, return None if it is not exists or broken '''
+        manifest_file = self.manifest_file()
+        if not path.exists(manifest_file):
+            return None
+        try:
+            with open(manifest_file, 'r') as f:
+                return json.load(f)
+        except ValueError:
+            glog.warn('Manifest file is broken, ignore it: %s', manifest_file)
+            return None
+
+    def is_up_to_date(self):
+        ''' Return True if the output files exists and the inputs are the same as the last run '''
+        cmake_file = path.join(self._path_manager.project_files_dir(), 'CMakeLists.txt')
+        if not path.exists(cmake_file):
+            return False
+        last_manifest = self.load()
+        if last_manifest is None:
+            return False
+        current_manifest = self.compute()
+        for key, value in current_manifest.items():
+            if last_manifest.get(key) != value:
+                glog.info('Manifest value \'%s\' changed since last run', key)
+                return False
+        return len(last_manifest) == len(current_manifest)
+
+    def save(self):
+        utils.write_text(json.dumps(self.compute(), indent=1, sort_keys=True), self.manifest_file())
+
+    def _quick_cmake_files(self):
+        script_dir = path.dirname(path.abspath(__file__))
+        return [ path.join(script_dir, f) for f in sorted(os.listdir(script_dir)) \
+                 if f.endswith('.py') and not f.endswith('_test.py') ]
+
+    def _hash_files(self, files):
+        sha1 = hashlib.sha1()
+        for file in files:
+            with open(file, 'rb') as f:
+                sha1.update(f.read())
+        return sha1.hexdigest()
+
+    def _collect_directories(self, parse_dir, directories, files = None):
+        ''' Collect mtime and listing for parse_dir and all the sub directories of it.
+        Args:
+            directories: output, map { relative dir --> [mtime, listing hash] }
+            files: output if it is not None, map { relative file --> [mtime, size] }
+        '''
+        if not path.isdir(parse_dir):
+            return
+        stack = [parse_dir]
+        while stack:
+            cur_dir = stack.pop()
+            names = []
+            with os.scandir(cur_dir) as it:
+                for entry in it:
+                    names.append(entry.name)
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif files is not None and entry.is_file():
+                        stat = entry.stat()
+                        rel_file = path.relpath(entry.path, self._path_manager.workspace()).replace('\\', '/')
+                        files[rel_file] = [stat.st_mtime_ns, stat.st_size]
+            names.sort()
+            listing_hash = hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()
+            rel_dir = path.relpath(cur_dir, self._path_manager.workspace()).replace('\\', '/')
+            directories[rel_dir] = [os.stat(cur_dir).st_mtime_ns, listing_hash]
@@ -0,0 +1,89 @@
+import os
+from os import path
+import shutil
+import tempfile
+import unittest
+
+from gconfig import GConfig
+from manifest import Manifest
+from path_manager import PathManager
+import utils
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._workspace = path.join(self._temp_dir, 'workspace')
+        shutil.copytree(path.join(path.dirname(__file__), 'test'), self._workspace)
+        self._output_dir = GConfig.OUTPUT_DIR
+        GConfig.OUTPUT_DIR = 'project_files'
+
+    def tearDown(self):
+        GConfig.OUTPUT_DIR = self._output_dir
+        shutil.rmtree(self._temp_dir)
+
+    def test_is_up_to_date(self):
+        pmg = PathManager(self._workspace)
+        options = {'configuration' : 'DEBUG,RELEASE'}
+        manifest = Manifest(pmg, options)
+        # no output yet
+        self.assertFalse(manifest.is_up_to_date())
+
+        utils.write_text('', path.join(pmg.project_files_dir(), 'CMakeLists.txt'))
+        self.assertFalse(manifest.is_up_to_date())
+        manifest.save()
+        self.assertTrue(manifest.is_up_to_date())
+
+        # options changed
+        self.assertFalse(Manifest(pmg, {'configuration' : 'DEBUG'}).is_up_to_date())
+
+        # build file changed
+        with open(pmg.module_map['B'], 'a') as f:
+            f.write('\n')
+        self.assertFalse(manifest.is_up_to_date())
+        manifest.save()
+        self.assertTrue(manifest.is_up_to_date())
+
+        # source file added
+        utils.write_text('', path.join(pmg.sources_dir(), 'A', 'folder', 'new.cc'))
+        self.assertFalse(manifest.is_up_to_date())
+        manifest.save()
+
+        # output removed
+        os.remove(path.join(pmg.project_files_dir(), 'CMakeLists.txt'))
+        self.assertFalse(manifest.is_up_to_date())
+
+    def test_pch(self):
+        pmg = PathManager(self._workspace)
+        manifest = Manifest(pmg, {'pch' : True})
+        utils.write_text('', path.join(pmg.project_files_dir(), 'CMakeLists.txt'))
+        source_file = path.join(pmg.sources_dir(), 'A', 'test.cpp')
+        pch = GConfig.PCH
+        GConfig.PCH = True
+        try:
+            manifest.save()
+            self.assertTrue(manifest.is_up_to_date())
+            # precompiled headers depend on the includes of sources, the edit in place does not change the dir
+            dir_mtime = os.stat(path.dirname(source_file)).st_mtime_ns
+            utils.write_text('#include <map>\n', source_file)
+            os.utime(path.dirname(source_file), ns=(dir_mtime, dir_mtime))
+            self.assertFalse(manifest.is_up_to_date())
+            manifest.save()
+            self.assertTrue(manifest.is_up_to_date())
+        finally:
+            GConfig.PCH = pch
+        # without pch, contents of sources are not inputs
+        utils.write_text('#include <vector>\n', source_file)
+        manifest.save()
+        utils.write_text('#include <string>\n', source_file)
+        self.assertTrue(manifest.is_up_to_date())
+
+    def test_broken_manifest(self):
+        pmg = PathManager(self._workspace)
+        manifest = Manifest(pmg, {})
+        utils.write_text('', path.join(pmg.project_files_dir(), 'CMakeLists.txt'))
+        utils.write_text('{ broken', manifest.manifest_file())
+        self.assertIsNone(manifest.load())
+        self.assertFalse(manifest.is_up_to_date())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,30 @@
 import glog
 import os
 from os import path
+import shutil
 
+from directory_index import DirectoryIndex
+from file_matcher import FileMatcher
 from gconfig import GConfig
+from source_scanner import SourceScanner
 
 
 class PathManager:
-    def __init__(self, workspace):
+    ''' Paths of the workspace
+    Args:
+        use_directory_index: keep a directory index in the cache dir, so unchanged dirs are not listed again
+        clear_cache: remove the cache dir before parsing
+    '''
+    def __init__(self, workspace, use_directory_index = False, clear_cache = False):
         self._workspace = workspace
+        if clear_cache and path.exists(self.cache_dir()):
+            glog.info('Remove cache dir ' + self.cache_dir())
+            shutil.rmtree(self.cache_dir())
+        self._directory_index = None
+        if use_directory_index:
+            self._directory_index = DirectoryIndex(path.join(self.cache_dir(), 'directory_index.json'))
+        # lib and bin dirs of third parties are matched for every config
+        self._file_matcher = FileMatcher()
         self._module_map = self._parse_modules()
         self._third_party_map, self._default_third_party_map = self._parse_third_parties()
         
@@ -27,12 +44,24 @@ class PathManager:
     def project_files_dir(self):
         return path.join(self._workspace, GConfig.OUTPUT_DIR)
 
+    def cache_dir(self):
+        ''' Dir for files that quick cmake keeps between runs '''
+        return path.join(self.project_files_dir(), '.quick_cmake')
+
     def binary_dirs(self):
         return path.join(self._workspace, 'bin')
 
     def library_dirs(self):
         return path.join(self._workspace, 'lib')
 
+    def directory_index(self):
+        ''' Return DirectoryIndex, or None if it is not used '''
+        return self._directory_index
+
+    def file_matcher(self):
+        ''' Return FileMatcher shared by all configs of the run '''
+        return self._file_matcher
+
     @property
     def module_map(self):
         return self._module_map
@@ -78,6 +107,17 @@ class PathManager:
             return None
 
         results = {}
+        if self._directory_index is not None:
+            scanner = SourceScanner(self._directory_index)
+            entries = scanner.list_dir(parse_dir)
+            for dir in entries.dirs:
+                sub_entries = scanner.list_dir(path.join(parse_dir, dir))
+                if sub_entries is not None and sub_entries.has_build_file:
+                    results[dir] = str(path.join(parse_dir, dir, 'build.py'))
+                elif empty_modules is not None:
+                    empty_modules[dir] = str(path.join(parse_dir, dir))
+            return results
+
         for subdir, dirs, files in os.walk(parse_dir):
             for dir in dirs:
                 build_file = path.join(subdir, dir, 'build.py')
@@ -1,7 +1,11 @@
 
 from  os import path
+import shutil
+import tempfile
 import unittest
 
+from gconfig import GConfig
+
 from path_manager import PathManager
 
 class TestPathManager(unittest.TestCase):
@@ -27,6 +31,26 @@ class TestPathManager(unittest.TestCase):
             expected_default_third_result[t] = path.join(workspace, 'third_parties', t)
         self.assertDictEqual(pmg.default_third_party_map, expected_default_third_result)
 
+    def test_parse_build_file_with_directory_index(self):
+        workspace = path.join(path.dirname(__file__), 'test')
+        pmg = PathManager(workspace)
+        output_dir = GConfig.OUTPUT_DIR
+        temp_dir = tempfile.mkdtemp()
+        GConfig.OUTPUT_DIR = temp_dir
+        try:
+            for i in range(2):
+                index_pmg = PathManager(workspace, use_directory_index=True)
+                self.assertDictEqual(pmg.module_map, index_pmg.module_map)
+                self.assertDictEqual(pmg.third_party_map, index_pmg.third_party_map)
+                self.assertDictEqual(pmg.default_third_party_map, index_pmg.default_third_party_map)
+                index_pmg.directory_index().save()
+            self.assertTrue(path.exists(path.join(index_pmg.cache_dir(), 'directory_index.json')))
+
+            PathManager(workspace, clear_cache=True)
+            self.assertFalse(path.exists(index_pmg.cache_dir()))
+        finally:
+            GConfig.OUTPUT_DIR = output_dir
+            shutil.rmtree(temp_dir)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,108 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+import utils
+
+class Span:
+    ''' A recorded span of time
+    Attributes:
+        begin and end: wall clock time in nanoseconds, so that spans of worker processes are comparable
+        pid and tid: process and thread which records the span
+        args: map of extra values shown in the trace
+    '''
+    def __init__(self, name, category, begin, end, args = None):
+        self.name = name
+        self.category = category
+        self.begin = begin
+        self.end = end
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.args = args if args else {}
+
+    def duration(self):
+        ''' Return duration in seconds '''
+        return (self.end - self.begin) / 1e9
+
+class Profiler:
+    ''' Record spans of time, write them as a Chrome trace (chrome://tracing or https://ui.perfetto.dev), and
+        summarize the slowest ones. It is thread safe.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = []
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        begin = time.time_ns()
+        try:
+            yield
+        finally:
+            self.add_spans([Span(name, category, begin, time.time_ns(), args)])
+
+    def add_spans(self, spans):
+        ''' Add spans, such as the spans recorded by worker processes '''
+        with self._lock:
+            self._spans.extend(spans)
+
+    def spans(self, category = None):
+        with self._lock:
+            return [ s for s in self._spans if category is None or s.category == category ]
+
+    def write_trace(self, trace_file):
+        events = []
+        for s in sorted(self.spans(), key=lambda x: x.begin):
+            events.append({ 'name' : s.name, 'cat' : s.category, 'ph' : 'X', 'ts' : s.begin / 1000,
+                            'dur' : (s.end - s.begin) / 1000, 'pid' : s.pid, 'tid' : s.tid, 'args' : s.args })
+        utils.write_text(json.dumps({ 'traceEvents' : events, 'displayTimeUnit' : 'ms' }), trace_file)
+
+    def summary(self, top = 10):
+        ''' Return lines of summary tables: time of each phase, the slowest build scripts and modules '''
+        lines = ['{:<40}{:>12}'.format('phase', 'time(s)')]
+        for s in self.spans('phase'):
+            lines.append('{:<40}{:>12.4f}'.format(s.name, s.duration()))
+
+        # build script of each config is a span, sum them
+        build_scripts = {}
+        for s in self.spans('build_script'):
+            build_scripts[s.name] = build_scripts.get(s.name, 0) + s.duration()
+        lines.append('')
+        lines.append('{:<40}{:>12}'.format('slowest build scripts', 'time(s)'))
+        for name, cost in sorted(build_scripts.items(), key=lambda x: -x[1])[:top]:
+            lines.append('{:<40}{:>12.4f}'.format(name, cost))
+
+        modules = {}
+        for i, category in enumerate(['scan', 'generate']):
+            for s in self.spans(category):
+                modules.setdefault(s.name, [0, 0])[i] += s.duration()
+        lines.append('')
+        lines.append('{:<40}{:>12}{:>12}{:>12}'.format('slowest modules', 'scan(s)', 'generate(s)', 'total(s)'))
+        for name, costs in sorted(modules.items(), key=lambda x: -sum(x[1]))[:top]:
+            lines.append('{:<40}{:>12.4f}{:>12.4f}{:>12.4f}'.format(name, costs[0], costs[1], sum(costs)))
+        return lines
+
+# profiler of current process, None if profiling is disabled
+_profiler = None
+
+def enable():
+    ''' Enable profiling in current process, return the profiler '''
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+def disable():
+    global _profiler
+    _profiler = None
+
+def get():
+    ''' Return the profiler, or None if profiling is disabled '''
+    return _profiler
+
+def span(name, category, **args):
+    ''' Record a span by the profiler if profiling is enabled, use it in a with statement '''
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.span(name, category, **args)
@@ -0,0 +1,70 @@
+import json
+from os import path
+import tempfile
+import time
+import unittest
+
+from build_model import BuildModel
+from config import Config
+from gconfig import GConfig
+from path_manager import PathManager
+import profiler
+
+class TestProfiler(unittest.TestCase):
+    def test_span(self):
+        p = profiler.Profiler()
+        with p.span('phase1', 'phase'):
+            with p.span('A', 'scan', config='DEBUG'):
+                time.sleep(0.01)
+        spans = p.spans()
+        self.assertListEqual(['A', 'phase1'], [ s.name for s in spans ])
+        self.assertGreaterEqual(spans[0].duration(), 0.01)
+        self.assertGreaterEqual(spans[1].duration(), spans[0].duration())
+        self.assertDictEqual({'config' : 'DEBUG'}, spans[0].args)
+        self.assertListEqual(['phase1'], [ s.name for s in p.spans('phase') ])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            trace_file = path.join(temp_dir, 'trace.json')
+            p.write_trace(trace_file)
+            with open(trace_file, 'r') as f:
+                events = json.load(f)['traceEvents']
+            # sorted by begin time
+            self.assertListEqual(['phase1', 'A'], [ e['name'] for e in events ])
+            self.assertTrue(all(e['ph'] == 'X' for e in events))
+
+    def test_summary(self):
+        p = profiler.Profiler()
+        p.add_spans([profiler.Span('sources/A', 'build_script', 0, 1000),
+                     profiler.Span('sources/B', 'build_script', 0, 3000),
+                     profiler.Span('sources/A', 'build_script', 0, 1000),
+                     profiler.Span('A', 'scan', 0, 1000),
+                     profiler.Span('B', 'generate', 0, 500)])
+        lines = p.summary()
+        names = [ l.split()[0] for l in lines if l.strip() ]
+        self.assertLess(names.index('sources/B'), names.index('sources/A'))
+        self.assertLess(names.index('A'), names.index('B'))
+
+    def test_disabled(self):
+        self.assertIsNone(profiler.get())
+        with profiler.span('A', 'phase'):
+            pass
+
+    def test_build_scripts_in_worker_processes(self):
+        configs = [Config(), Config()]
+        configs[0].configuration = configs[0].Configuration.DEBUG
+        pmg = PathManager(path.join(path.dirname(__file__), 'test'))
+        jobs = GConfig.JOBS
+        GConfig.JOBS = 2
+        try:
+            p = profiler.enable()
+            BuildModel(configs).import_modules(pmg.module_map)
+        finally:
+            GConfig.JOBS = jobs
+            profiler.disable()
+        spans = p.spans('build_script')
+        self.assertEqual(len(pmg.module_map) * len(configs), len(spans))
+        self.assertSetEqual({ 'sources/' + m for m in pmg.module_map }, { s.name for s in spans })
+        self.assertSetEqual({ c.description() for c in configs }, { s.args['config'] for s in spans })
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import glog
+import os
+from os import path
+
+from gconfig import GConfig
+
+class DirEntries:
+    ''' Classified entries of a dir
+    Attributes:
+        dirs: sub dirs, in the order of os.scandir
+        linked_dirs: sub dirs which are symbolic links, they are not walked into, the same as os.walk
+        sources: source and head files, match GConfig.SOURCES_FILTER. They are ordered by filter first and then
+            by os.scandir, the same as globing each filter. Files whose name ends with _test are excluded.
+        unittests: unit test files, match GConfig.UNITTEST_SOURCES_FILTTER, ordered like sources.
+        has_build_file: if there is a build.py in the dir
+    '''
+    def __init__(self):
+        self.dirs = []
+        self.linked_dirs = []
+        self.sources = []
+        self.unittests = []
+        self.has_build_file = False
+
+class SourceScanner:
+    ''' Classify the entries of a dir in a single os.scandir pass, instead of globing each filter.
+    Attributes:
+        directory_index: if it is not None, dirs whose mtime does not change are not listed again
+    '''
+    def __init__(self, directory_index = None):
+        self._directory_index = directory_index
+        self._source_suffixes = self._get_suffixes(GConfig.SOURCES_FILTER)
+        self._unittest_suffixes = self._get_suffixes(GConfig.UNITTEST_SOURCES_FILTTER)
+
+    def scan_dir(self, scan_dir):
+        ''' Return DirEntries of scan_dir, or None if it can not be listed '''
+        entries = DirEntries()
+        # file names for each filter
+        sources = [ [] for x in self._source_suffixes ]
+        unittests = [ [] for x in self._unittest_suffixes ]
+        try:
+            with os.scandir(scan_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    if entry.is_dir():
+                        entries.dirs.append(name)
+                        if entry.is_symlink():
+                            entries.linked_dirs.append(name)
+                        continue
+                    if name == 'build.py':
+                        entries.has_build_file = True
+                    # hidden files are ignored by glob
+                    if name[0] == '.':
+                        continue
+                    match_name = path.normcase(name)
+                    for i in range(len(self._source_suffixes)):
+                        if match_name.endswith(self._source_suffixes[i]):
+                            sources[i].append(name)
+                    for i in range(len(self._unittest_suffixes)):
+                        if match_name.endswith(self._unittest_suffixes[i]):
+                            unittests[i].append(name)
+        except OSError:
+            return None
+
+        for names in sources:
+            entries.sources.extend([ name for name in names if not path.splitext(name)[0].endswith('_test') ])
+        for names in unittests:
+            entries.unittests.extend(names)
+        return entries
+
+    def list_dir(self, list_dir):
+        ''' Return DirEntries of list_dir, from the directory index if it is up to date '''
+        if self._directory_index is None:
+            return self.scan_dir(list_dir)
+        return self._directory_index.get(list_dir, self.scan_dir)
+
+    def walk(self, top):
+        ''' Walk the dirs under top, the same order as os.walk.
+        Return:
+            generator of tuple (dir, DirEntries)
+        '''
+        stack = [top]
+        while stack:
+            cur_dir = stack.pop()
+            entries = self.list_dir(cur_dir)
+            if entries is None:
+                continue
+            yield cur_dir, entries
+            stack.extend([ path.join(cur_dir, d) for d in reversed(entries.dirs) if d not in entries.linked_dirs ])
+
+    def _get_suffixes(self, filters):
+        suffixes = []
+        for file_filter in filters:
+            glog.check(file_filter.startswith('*') and not any(c in file_filter[1:] for c in '*?['),
+                       'Only support filter in the form of *suffix: ' + file_filter)
+            suffixes.append(path.normcase(file_filter[1:]))
+        return suffixes
@@ -0,0 +1,48 @@
+import glob
+from os import path
+import tempfile
+import unittest
+
+from gconfig import GConfig
+from source_scanner import SourceScanner
+import utils
+
+class TestSourceScanner(unittest.TestCase):
+    def test_scan_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = ['a.cc', 'a.h', 'b.cpp', 'b_test.cpp', 'c_test.h', 'd.hpp', 'e.c++', 'f.txt', '.hidden.cc',
+                     'g.cxx', 'g_test.cc', 'build.py', 'h.inl']
+            for f in files:
+                utils.write_text('', path.join(temp_dir, f))
+            utils.write_text('', path.join(temp_dir, 'sub_dir', 'x.cc'))
+
+            entries = SourceScanner().scan_dir(temp_dir)
+            self.assertListEqual(['sub_dir'], entries.dirs)
+
+            # the same as globing each filter
+            expected_sources = []
+            for extension in GConfig.SOURCES_FILTER:
+                for f in glob.glob(path.join(temp_dir, extension)):
+                    if not path.splitext(f)[0].endswith('_test'):
+                        expected_sources.append(path.basename(f))
+            self.assertListEqual(expected_sources, entries.sources)
+
+            expected_unittests = []
+            for extension in GConfig.UNITTEST_SOURCES_FILTTER:
+                expected_unittests.extend([ path.basename(f) for f in glob.glob(path.join(temp_dir, extension)) ])
+            self.assertListEqual(expected_unittests, entries.unittests)
+            self.assertSetEqual({'b_test.cpp', 'g_test.cc'}, set(entries.unittests))
+
+            self.assertIsNone(SourceScanner().scan_dir(path.join(temp_dir, 'not_exists')))
+
+    def test_walk(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            workspace = path.join(temp_dir, 'A')
+            utils.write_text('', path.join(workspace, 'a.cc'))
+            utils.write_text('', path.join(workspace, 'folder', 'b.cc'))
+            walk_dirs = [ d for d, entries in SourceScanner().walk(workspace) ]
+            self.assertListEqual([workspace, path.join(workspace, 'folder')], walk_dirs)
+            self.assertListEqual([], list(SourceScanner().walk(path.join(workspace, 'not_exists'))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+from concurrent import futures
+import os
+from os import path
+import subprocess
+import threading
+import time
+from xml.etree import ElementTree
+
+import utils
+
+class TestResult:
+    ''' Result of running a unit test binary
+    Attributes:
+        returncode: return code of the binary, None if it timed out or can not be started
+        duration: seconds
+        output: stdout and stderr of the binary
+        error: message if the binary timed out or can not be started
+    '''
+    def __init__(self, test_file):
+        self.test_file = test_file
+        self.returncode = None
+        self.duration = 0
+        self.output = ''
+        self.error = ''
+
+    def name(self):
+        return path.basename(self.test_file)
+
+    def is_passed(self):
+        return self.returncode == 0
+
+class TestRunner:
+    ''' Run unit test binaries concurrently, the output of each binary is captured.
+    Args:
+        jobs: number of binaries run at the same time, 0 means the number of cpus
+        timeout: seconds a binary can run before it is killed, 0 means no timeout
+    Attributes:
+        duration: wall clock seconds of the last run
+    '''
+    def __init__(self, jobs = 0, timeout = 0):
+        self._jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self._timeout = timeout if timeout > 0 else None
+        self._print_lock = threading.Lock()
+        self.duration = 0
+
+    def run(self, test_files):
+        ''' Run test files, return list of TestResult in the order of test_files '''
+        begin = time.perf_counter()
+        with futures.ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            results = list(executor.map(self._run_test, test_files))
+        self.duration = time.perf_counter() - begin
+        return results
+
+    def _run_test(self, test_file):
+        result = TestResult(test_file)
+        begin = time.perf_counter()
+        try:
+            process = subprocess.run([test_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     timeout=self._timeout)
+            result.returncode = process.returncode
+            result.output = process.stdout.decode('utf-8', 'replace')
+        except subprocess.TimeoutExpired as e:
+            result.error = 'Timeout after {} seconds'.format(self._timeout)
+            result.output = (e.output or b'').decode('utf-8', 'replace')
+        except OSError as e:
+            result.error = 'Can not run: {}'.format(e)
+        result.duration = time.perf_counter() - begin
+
+        with self._print_lock:
+            status = 'PASS' if result.is_passed() else 'FAIL'
+            print('[{}] {} ({:.2f}s)'.format(status, test_file, result.duration), flush=True)
+        return result
+
+def summary(results, duration):
+    ''' Return lines of summary, the output of failed tests are included
+    Args:
+        duration: wall clock seconds of running the tests, the durations of tests add up to more than it since
+            they run concurrently
+    '''
+    lines = []
+    failed_results = [ r for r in results if not r.is_passed() ]
+    for result in failed_results:
+        lines.append('=' * 20 + ' {} '.format(result.test_file) + '=' * 20)
+        if result.output:
+            lines.append(result.output.rstrip('\n'))
+        lines.append(result.error if result.error else 'Return code: {}'.format(result.returncode))
+    lines.append('Run {} unit tests in {:.2f}s (total test time {:.2f}s), passed: {}, failed: {}'.format(
+        len(results), duration, sum([ r.duration for r in results ]), len(results) - len(failed_results),
+        len(failed_results)))
+    for result in failed_results:
+        lines.append('    failed: ' + result.test_file)
+    return lines
+
+def write_junit_xml(results, xml_file, suite_name = 'unittests'):
+    ''' Write results as a JUnit XML report '''
+    failures = [ r for r in results if r.returncode not in (0, None) ]
+    errors = [ r for r in results if r.returncode is None ]
+    suite = ElementTree.Element('testsuite', name=suite_name, tests=str(len(results)),
+                                failures=str(len(failures)), errors=str(len(errors)),
+                                time='{:.3f}'.format(sum([ r.duration for r in results ])))
+    for result in results:
+        case = ElementTree.SubElement(suite, 'testcase', name=result.name(),
+                                      classname=path.basename(path.dirname(path.abspath(result.test_file))),
+                                      time='{:.3f}'.format(result.duration))
+        if result.returncode is None:
+            ElementTree.SubElement(case, 'error', message=result.error)
+        elif result.returncode != 0:
+            ElementTree.SubElement(case, 'failure', message='Return code: {}'.format(result.returncode))
+        ElementTree.SubElement(case, 'system-out').text = result.output
+    utils.write_text(ElementTree.tostring(suite, encoding='unicode'), path.abspath(xml_file))
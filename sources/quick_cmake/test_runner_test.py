@@ -0,0 +1,68 @@
+import os
+from os import path
+import tempfile
+import time
+import unittest
+from xml.etree import ElementTree
+
+import test_runner
+import utils
+
+@unittest.skipIf(os.name == 'nt', 'unit tests are shell scripts')
+class TestTestRunner(unittest.TestCase):
+    def _write_test(self, temp_dir, name, script):
+        test_file = path.join(temp_dir, name)
+        utils.write_text('#!/bin/sh\n' + script + '\n', test_file)
+        os.chmod(test_file, 0o755)
+        return test_file
+
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_files = [ self._write_test(temp_dir, 'pass_test', 'echo pass'),
+                           self._write_test(temp_dir, 'fail_test', 'echo fail; exit 3'),
+                           self._write_test(temp_dir, 'timeout_test', 'echo begin; sleep 10'),
+                           path.join(temp_dir, 'not_exists') ]
+            runner = test_runner.TestRunner(jobs=4, timeout=1)
+            results = runner.run(test_files)
+            self.assertListEqual(test_files, [ r.test_file for r in results ])
+            self.assertListEqual([0, 3, None, None], [ r.returncode for r in results ])
+            self.assertEqual('pass\n', results[0].output)
+            self.assertEqual('fail\n', results[1].output)
+            self.assertIn('Timeout', results[2].error)
+            self.assertLess(results[2].duration, 5)
+            self.assertIn('Can not run', results[3].error)
+
+            lines = test_runner.summary(results, runner.duration)
+            self.assertIn('passed: 1, failed: 3', lines[-4])
+            self.assertIn('in {:.2f}s '.format(runner.duration), lines[-4])
+            self.assertNotIn('pass\n', '\n'.join(lines))
+
+            xml_file = path.join(temp_dir, 'result.xml')
+            test_runner.write_junit_xml(results, xml_file, 'suite')
+            suite = ElementTree.parse(xml_file).getroot()
+            self.assertEqual('suite', suite.get('name'))
+            self.assertEqual('4', suite.get('tests'))
+            self.assertEqual('1', suite.get('failures'))
+            self.assertEqual('2', suite.get('errors'))
+            cases = suite.findall('testcase')
+            self.assertIsNone(cases[0].find('failure'))
+            self.assertIsNotNone(cases[1].find('failure'))
+            self.assertIsNotNone(cases[2].find('error'))
+            self.assertEqual('fail\n', cases[1].find('system-out').text)
+
+    def test_run_concurrently(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_files = [ self._write_test(temp_dir, 'test_{}'.format(i), 'sleep 0.5') for i in range(4) ]
+            begin = time.perf_counter()
+            runner = test_runner.TestRunner(jobs=4)
+            results = runner.run(test_files)
+            self.assertTrue(all(r.is_passed() for r in results))
+            # 2 seconds if they run one by one
+            self.assertLess(time.perf_counter() - begin, 1.5)
+            # the summary reports the wall clock time, not the sum of test durations
+            self.assertLess(runner.duration, sum([ r.duration for r in results ]))
+            self.assertIn('in {:.2f}s (total test time {:.2f}s)'.format(
+                runner.duration, sum([ r.duration for r in results ])), test_runner.summary(results, runner.duration)[-1])
+
+if __name__ == '__main__':
+    unittest.main()
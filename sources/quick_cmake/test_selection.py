@@ -0,0 +1,43 @@
+import glog
+from os import path
+import subprocess
+
+import utils
+
+def get_git_changed_files(workspace, diff_range):
+    ''' Return absolute paths of files changed in diff_range of git, such as origin/main...HEAD.
+        Only files under workspace are returned.
+    '''
+    run_args = ['git', 'diff', '--name-only', '--relative', diff_range, '--']
+    process = subprocess.run(run_args, cwd=workspace, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    glog.check_eq(0, process.returncode, 'Run {} failed: {}'.format(' '.join(run_args),
+                                                                   process.stderr.decode('utf-8', 'replace')))
+    files = process.stdout.decode('utf-8').splitlines()
+    return [ path.abspath(path.join(workspace, f)) for f in files if f ]
+
+def _get_owner(changed_file, owner_dir, names):
+    ''' Return the name of the dir under owner_dir which changed_file is in, None if the name is not in names '''
+    parts = utils.split_path(path.relpath(path.abspath(changed_file), path.abspath(owner_dir)))
+    if len(parts) > 1 and parts[0] in names:
+        return parts[0]
+    return None
+
+def get_changed_owners(path_manager, changed_files):
+    ''' Map changed files to the modules and third parties they belong to, other files are ignored.
+    Return:
+        tuple (set of module names, set of third party names)
+    '''
+    modules = set()
+    third_parties = set()
+    # default third parties do not have build files, but they are used by modules too
+    third_party_names = set(path_manager.third_party_map) | set(path_manager.default_third_party_map)
+    for changed_file in changed_files:
+        module = _get_owner(changed_file, path_manager.sources_dir(), path_manager.module_map)
+        third_party = _get_owner(changed_file, path_manager.third_parties_dir(), third_party_names)
+        if module:
+            modules.add(module)
+        elif third_party:
+            third_parties.add(third_party)
+        else:
+            glog.info('%s does not belong to any module or third party, ignore it', changed_file)
+    return modules, third_parties
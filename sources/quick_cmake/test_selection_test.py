@@ -0,0 +1,44 @@
+from os import path
+import subprocess
+import tempfile
+import unittest
+
+from path_manager import PathManager
+import test_selection
+import utils
+
+class TestTestSelection(unittest.TestCase):
+    def test_get_changed_owners(self):
+        workspace = path.join(path.dirname(__file__), 'test')
+        pmg = PathManager(workspace)
+        changed_files = [ path.join(workspace, 'sources', 'A', 'folder', 'test.cc'),
+                          path.join(workspace, 'sources', 'D', 'build.py'),
+                          path.join(workspace, 'sources', 'removed_module', 'a.cc'),
+                          path.join(workspace, 'third_parties', 'third_party1', 'include', 'a.h'),
+                          path.join(workspace, 'third_parties', 'default_party', 'include', 'a.h'),
+                          path.join(workspace, 'ReadMe.md') ]
+        modules, third_parties = test_selection.get_changed_owners(pmg, changed_files)
+        self.assertSetEqual({'A', 'D'}, modules)
+        self.assertSetEqual({'third_party1', 'default_party'}, third_parties)
+
+    def test_get_git_changed_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            def git(*args):
+                subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@test', *args], cwd=temp_dir,
+                               check=True, stdout=subprocess.DEVNULL)
+            git('init', '-q')
+            utils.write_text('a', path.join(temp_dir, 'workspace', 'sources', 'A', 'a.cc'))
+            utils.write_text('b', path.join(temp_dir, 'other', 'b.cc'))
+            git('add', '.')
+            git('commit', '-q', '-m', 'first')
+            utils.write_text('aa', path.join(temp_dir, 'workspace', 'sources', 'A', 'a.cc'))
+            utils.write_text('bb', path.join(temp_dir, 'other', 'b.cc'))
+            git('commit', '-q', '-a', '-m', 'second')
+
+            workspace = path.join(temp_dir, 'workspace')
+            changed_files = test_selection.get_git_changed_files(workspace, 'HEAD~1')
+            # files out of the workspace are not included
+            self.assertListEqual([path.join(path.abspath(workspace), 'sources', 'A', 'a.cc')], changed_files)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,6 @@ import glob
 import glog
 import os
 from os import path
-import shutil
 
 def set_to_sorted_list(value):
     result = list(value)
@@ -19,13 +18,27 @@ def write_text(content, file_path):
 
     with open(file_path, 'w') as f:
         f.write(content)
+
+def write_text_if_changed(content, file_path):
+    ''' Write text content to file only if the content of the file is different, so that the mtime of
+        an unchanged file is kept.
+    Return:
+        bool : True if the file is written
+    '''
+    if path.isfile(file_path):
+        with open(file_path, 'r') as f:
+            if f.read() == content:
+                return False
+    write_text(content, file_path)
+    return True
   
-def match_files(workspace, dirs, files, relative_dir = ''):
+def match_files(workspace, dirs, files, relative_dir = '', glob_func = glob.glob):
     ''' mathc files that give by files under the dirs 
     Args:
         workspace: workspace about the dirs. will combine the value in the dirs if it is not a 
             absolute path
         relative_dir: return the result relative path to the relative dir
+        glob_func: function the same as glob.glob, such as FileMatcher.glob which caches the results
     Return:
         set : return path with files relative to the relative dir
     '''
@@ -35,10 +48,14 @@ def match_files(workspace, dirs, files, relative_dir = ''):
         if not path.isabs(check_dir):
             check_dir = path.join(workspace, dir)
         
+        # relpath is slow, the dir is converted once and the files are joined to it
+        rel_check_dir = path.relpath(check_dir, relative_dir) if not path.isabs(dir) and relative_dir else None
+        prefix = path.join(check_dir, '')
         for file in files:
-            file_list = glob.glob(path.join(check_dir, file))
-            if not path.isabs(dir) and relative_dir:
-                file_list = [ path.relpath(f, relative_dir) for f in file_list ]
+            file_list = glob_func(path.join(check_dir, file))
+            if rel_check_dir is not None:
+                file_list = [ path.normpath(path.join(rel_check_dir, f[len(prefix):])) if f.startswith(prefix) \
+                              else path.relpath(f, relative_dir) for f in file_list ]
             result.update(set(file_list))
     return result
 
@@ -55,16 +72,6 @@ def split_path(path_value):
     result.reverse()
     return result
 
-def copy_files(files, dist_dir, is_overwrite=False):
-    # make dir
-    if not path.exists(dist_dir):
-        os.makedirs(dist_dir)
-    for file in files:
-        new_dist = path.join(dist_dir, path.basename(file))
-        if is_overwrite or not path.exists(new_dist):
-            glog.info('Copy file {} --> {}'.format(file, new_dist))
-            shutil.copyfile(file, new_dist)
-
 def containers_format(containers, format_str):
     format_result = ''
     for it in containers:
@@ -1,5 +1,7 @@
 
+import os
 from os import path
+import tempfile
 import unittest
 
 import utils
@@ -41,5 +43,16 @@ class UtilsTest(unittest.TestCase):
             'next_value':'3.0'},
             result)
 
+    def test_write_text_if_changed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = path.join(temp_dir, 'sub_dir', 'file.txt')
+            self.assertTrue(utils.write_text_if_changed('content', file_path))
+            os.utime(file_path, ns=(0, 0))
+            self.assertFalse(utils.write_text_if_changed('content', file_path))
+            self.assertEqual(0, os.stat(file_path).st_mtime_ns)
+            self.assertTrue(utils.write_text_if_changed('new content', file_path))
+            with open(file_path, 'r') as f:
+                self.assertEqual('new content', f.read())
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,264 @@
+import ctypes
+import ctypes.util
+import glog
+import os
+from os import path
+import select
+import struct
+import sys
+import time
+import traceback
+
+from build_model import BuildModel
+from build_script_loader import BuildScriptLoader
+from cmake_generator import CMakeGenerator
+from gconfig import GConfig
+from path_manager import PathManager
+import utils
+
+# inotify masks, reference to sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+IN_LISTING_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+BUILD_FILE = 'build.py'
+
+class InotifyWatcher:
+    ''' Watch dirs recursively by inotify, only available on linux.
+        Changes of dir listings and writes of build files are reported, writes of other files are only reported
+        with watch_files, such as with GConfig.PCH, which generates by the contents of sources.
+    '''
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, dirs, watch_files = False):
+        self._watch_files = watch_files
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._watch_dirs = {} # watch descriptor --> dir
+        self._roots = list(dirs)
+        for root in self._roots:
+            self._add_watch_recursive(root)
+
+    @staticmethod
+    def is_available():
+        if not sys.platform.startswith('linux'):
+            return False
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            return False
+        try:
+            return hasattr(ctypes.CDLL(libc_name), 'inotify_init1')
+        except (OSError, TypeError, AttributeError):
+            return False
+
+    def close(self):
+        os.close(self._fd)
+
+    def read_changes(self, timeout):
+        ''' Wait at most timeout seconds for changes.
+        Return:
+            set of changed paths, empty if there is no change
+        '''
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changes = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, name_len = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # events are lost, report the roots to regenerate all
+                changes.update(self._roots)
+                continue
+            if mask & IN_IGNORED:
+                self._watch_dirs.pop(wd, None)
+                continue
+            watch_dir = self._watch_dirs.get(wd)
+            if watch_dir is None:
+                continue
+            changed_path = path.join(watch_dir, name) if name else watch_dir
+            if mask & IN_LISTING_MASK or name == BUILD_FILE or (self._watch_files and mask & IN_CLOSE_WRITE):
+                changes.add(changed_path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_watch_recursive(changed_path)
+        return changes
+
+    def _add_watch_recursive(self, root):
+        for subdir, dirs, files in os.walk(root):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(subdir), IN_WATCH_MASK)
+            if wd >= 0:
+                self._watch_dirs[wd] = subdir
+
+class PollingWatcher:
+    ''' Watch dirs recursively by polling the mtimes of dirs and build files, or all files with watch_files, used if
+        inotify is not available.
+    '''
+    def __init__(self, dirs, interval = 1.0, watch_files = False):
+        self._dirs = list(dirs)
+        self._watch_files = watch_files
+        self._interval = interval
+        self._snapshot = self._take_snapshot()
+
+    def close(self):
+        pass
+
+    def read_changes(self, timeout):
+        ''' Wait at most timeout seconds for changes.
+        Return:
+            set of changed paths, empty if there is no change
+        '''
+        end_time = time.monotonic() + timeout
+        while True:
+            snapshot = self._take_snapshot()
+            changes = set(snapshot.keys()) ^ set(self._snapshot.keys())
+            changes.update([ k for k, v in snapshot.items() if k in self._snapshot and self._snapshot[k] != v ])
+            self._snapshot = snapshot
+            if changes or time.monotonic() >= end_time:
+                return changes
+            time.sleep(max(0, min(self._interval, end_time - time.monotonic())))
+
+    def _take_snapshot(self):
+        ''' Return map {path --> mtime} for every dir and build file, or every file with watch_files '''
+        snapshot = {}
+        for root in self._dirs:
+            for subdir, dirs, files in os.walk(root):
+                try:
+                    snapshot[subdir] = os.stat(subdir).st_mtime_ns
+                    watched_files = files if self._watch_files else [ f for f in files if f == BUILD_FILE ]
+                    for f in watched_files:
+                        snapshot[path.join(subdir, f)] = os.stat(path.join(subdir, f)).st_mtime_ns
+                except OSError:
+                    continue
+        return snapshot
+
+def create_watcher(dirs, watch_files = False):
+    if InotifyWatcher.is_available():
+        try:
+            return InotifyWatcher(dirs, watch_files)
+        except OSError as e:
+            glog.warn('Can not use inotify, use polling instead: %s', e)
+    return PollingWatcher(dirs, watch_files=watch_files)
+
+class WatchSession:
+    ''' Keep the build model and cmake generator in memory, generate again when files change.
+        Only modules whose build files or source dirs change, and modules depending on them, are generated again.
+        Changes of the module list or third parties cause a full generation.
+    '''
+    def __init__(self, configs, path_manager, build_model, cmake_generator, debounce = 0.3):
+        self._configs = configs
+        self._path_manager = path_manager
+        self._build_model = build_model
+        self._cmake_generator = cmake_generator
+        self._debounce = debounce
+        # the last generation failed, the state in memory may be partially updated
+        self._is_broken = False
+
+    def run(self, on_generated = None):
+        ''' Watch until interrupted
+        Args:
+            on_generated: called with path manager and cmake generator after cmake files are written
+        '''
+        watch_dirs = [ d for d in [self._path_manager.sources_dir(), self._path_manager.third_parties_dir()] \
+                       if path.isdir(d) ]
+        # precompiled headers are selected by the includes of sources, so writes of sources are watched too
+        watcher = create_watcher(watch_dirs, GConfig.PCH)
+        glog.info('Watching %s, press Ctrl+C to stop', ','.join(watch_dirs))
+        try:
+            while True:
+                changes = self.wait_for_changes(watcher)
+                try:
+                    if self.handle_changes(changes) and on_generated:
+                        on_generated(self._path_manager, self._cmake_generator)
+                except Exception:
+                    # such as errors in build files, keep watching and generate all after next change
+                    glog.error('Generate failed:\n%s', traceback.format_exc())
+                    self._is_broken = True
+        except KeyboardInterrupt:
+            glog.info('Stop watching')
+        finally:
+            watcher.close()
+
+    def wait_for_changes(self, watcher):
+        ''' Block until there are changes, then collect changes until there is no change in the debounce time. '''
+        changes = set()
+        while not changes:
+            changes = watcher.read_changes(1.0)
+        while True:
+            more_changes = watcher.read_changes(self._debounce)
+            if not more_changes:
+                return changes
+            changes.update(more_changes)
+
+    def handle_changes(self, changes):
+        ''' Generate again for changed paths.
+        Return:
+            bool: if any cmake file is written
+        '''
+        glog.info('Changed: %s', ','.join(sorted(changes)))
+        if self._is_broken:
+            return self._regenerate()
+        sources_dir = path.abspath(self._path_manager.sources_dir())
+        module_map = self._path_manager.module_map
+        changed_build_files = {}
+        dirty_modules = set()
+        for changed_path in changes:
+            rel_path = path.relpath(path.abspath(changed_path), sources_dir)
+            parts = utils.split_path(rel_path)
+            if rel_path == '.' or parts[0] == '..':
+                # sources dir itself or third parties
+                return self._regenerate()
+            module_name = parts[0]
+            if len(parts) == 1 or module_name not in module_map:
+                # module is added or removed
+                return self._regenerate()
+            if len(parts) == 2 and parts[1] == BUILD_FILE:
+                if not path.exists(module_map[module_name]):
+                    return self._regenerate()
+                changed_build_files[module_name] = module_map[module_name]
+            dirty_modules.add(module_name)
+
+        if changed_build_files:
+            self._build_model.reload_modules(changed_build_files)
+            self._build_model.parse()
+        is_written = self._cmake_generator.update(self._build_model, dirty_modules)
+        self._save()
+        return is_written
+
+    def _regenerate(self):
+        glog.info('Modules or third parties changed, generate all')
+        self._path_manager = PathManager(self._path_manager.workspace(), use_directory_index=True)
+        # build files may change, use a new loader
+        self._build_model = BuildModel(self._configs, BuildScriptLoader(self._build_model.loader().cache_dir))
+        self._build_model.import_modules(self._path_manager.module_map)
+        self._build_model.import_third_parties(self._path_manager.third_party_map)
+        self._build_model.import_default_third_parties(self._path_manager.default_third_party_map)
+        self._build_model.parse()
+        self._cmake_generator = CMakeGenerator(self._configs, self._build_model, self._path_manager)
+        is_written = self._cmake_generator.generate()
+        self._is_broken = False
+        self._save()
+        return is_written
+
+    def _save(self):
+        if self._path_manager.directory_index() is not None:
+            self._path_manager.directory_index().save()
@@ -0,0 +1,123 @@
+import os
+from os import path
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from build_model import BuildModel
+from cmake_generator import CMakeGenerator
+from config import Config
+from gconfig import GConfig
+from path_manager import PathManager
+import utils
+import watch
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.mkdtemp()
+        self._workspace = path.join(self._temp_dir, 'workspace')
+        shutil.copytree(path.join(path.dirname(__file__), 'test'), self._workspace)
+        self._output_dir = GConfig.OUTPUT_DIR
+        GConfig.OUTPUT_DIR = 'project_files'
+        # binaries of third parties are copied relative to current dir
+        self._cwd = os.getcwd()
+        os.chdir(self._workspace)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        GConfig.OUTPUT_DIR = self._output_dir
+        shutil.rmtree(self._temp_dir)
+
+    def _assert_watcher(self, watcher):
+        sources_dir = path.join(self._workspace, 'sources')
+        self.assertSetEqual(set(), watcher.read_changes(0.01))
+
+        # writes of source files are not reported
+        utils.write_text('// changed', path.join(sources_dir, 'A', 'test.cpp'))
+        new_file = path.join(sources_dir, 'A', 'folder', 'new.cc')
+        utils.write_text('', new_file)
+        os.utime(path.join(sources_dir, 'A', 'folder'), ns=(0, 0))
+        changes = watcher.read_changes(1.0)
+        self.assertTrue(changes)
+        self.assertTrue(changes <= {new_file, path.join(sources_dir, 'A', 'folder')})
+
+        build_file = path.join(sources_dir, 'B', 'build.py')
+        with open(build_file, 'a') as f:
+            f.write('\n')
+        os.utime(build_file, ns=(0, 0))
+        self.assertSetEqual({build_file}, watcher.read_changes(1.0))
+        watcher.close()
+
+    def test_polling_watcher(self):
+        self._assert_watcher(watch.PollingWatcher([path.join(self._workspace, 'sources')], 0.01))
+
+    @unittest.skipUnless(watch.InotifyWatcher.is_available(), 'inotify is not available')
+    def test_inotify_watcher(self):
+        self._assert_watcher(watch.InotifyWatcher([path.join(self._workspace, 'sources')]))
+
+    def test_watch_files(self):
+        sources_dir = path.join(self._workspace, 'sources')
+        source_file = path.join(sources_dir, 'A', 'test.cpp')
+        create_watchers = [ lambda: watch.PollingWatcher([sources_dir], 0.01, watch_files=True) ]
+        if watch.InotifyWatcher.is_available():
+            create_watchers.append(lambda: watch.InotifyWatcher([sources_dir], watch_files=True))
+        for create_watcher in create_watchers:
+            watcher = create_watcher()
+            self.assertSetEqual(set(), watcher.read_changes(0.01))
+            # writes of sources are reported, precompiled headers depend on their includes
+            utils.write_text('#include <map>\n', source_file)
+            os.utime(source_file, ns=(0, 0))
+            self.assertSetEqual({source_file}, watcher.read_changes(1.0))
+            watcher.close()
+
+    def test_create_watcher(self):
+        sources_dir = path.join(self._workspace, 'sources')
+        # libc is not found on windows
+        with mock.patch('ctypes.util.find_library', return_value=None):
+            self.assertFalse(watch.InotifyWatcher.is_available())
+            self.assertIsInstance(watch.create_watcher([sources_dir]), watch.PollingWatcher)
+        with mock.patch.object(watch.sys, 'platform', 'win32'):
+            self.assertIsInstance(watch.create_watcher([sources_dir]), watch.PollingWatcher)
+
+    def test_handle_changes(self):
+        configs = [ Config() for i in range(2) ]
+        configs[0].configuration = Config().Configuration.DEBUG
+        configs[1].configuration = Config().Configuration.RELEASE
+        pmg = PathManager('.', use_directory_index=True)
+        build_model = BuildModel(configs)
+        build_model.import_modules(pmg.module_map)
+        build_model.import_third_parties(pmg.third_party_map)
+        build_model.import_default_third_parties(pmg.default_third_party_map)
+        build_model.parse()
+        cmake_generator = CMakeGenerator(configs, build_model, pmg)
+        self.assertTrue(cmake_generator.generate())
+        modules_dir = cmake_generator.modules_dir()
+        for f in os.listdir(modules_dir):
+            os.utime(path.join(modules_dir, f), ns=(0, 0))
+
+        session = watch.WatchSession(configs, pmg, build_model, cmake_generator)
+        # nothing changed for the cmake files
+        self.assertFalse(session.handle_changes({path.join(pmg.sources_dir(), 'A', 'test.cpp')}))
+
+        # B does not depend on D anymore, B and A which depends on B are generated again
+        build_file = pmg.module_map['B']
+        utils.write_text('class B:\n    def __init__(self, config):\n        self.output = config.Output.STATIC_LIB\n',
+                         build_file)
+        self.assertTrue(session.handle_changes({build_file}))
+        self.assertNotIn('D', build_model.modules()[0]['B'].dependencies)
+        self.assertIn('D', build_model.modules()[0]['A'].dependencies)
+        mtimes = { f : os.stat(path.join(modules_dir, f)).st_mtime_ns for f in os.listdir(modules_dir) }
+        self.assertNotEqual(0, mtimes['B.cmake'])
+        self.assertEqual(0, mtimes['C.cmake'])
+        self.assertEqual(0, mtimes['D.cmake'])
+
+        # new module
+        utils.write_text('class E:\n    def __init__(self, config):\n        self.output = config.Output.STATIC_LIB\n',
+                         path.join(pmg.sources_dir(), 'E', 'build.py'))
+        utils.write_text('', path.join(pmg.sources_dir(), 'E', 'e.cc'))
+        self.assertTrue(session.handle_changes({path.join(pmg.sources_dir(), 'E')}))
+        self.assertIn('E.cmake', os.listdir(modules_dir))
+
+if __name__ == '__main__':
+    unittest.main()